@@ -0,0 +1,105 @@
+"""Schéma initial (tables créées jusqu'ici par create_all)
+
+Les bases existantes ont déjà ces tables : elles ne sont créées que si
+elles manquent, ce qui permet d'adopter Alembic sans « stamp » manuel.
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-12-01
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _create_table(name, *columns, **kw):
+    if not sa.inspect(op.get_bind()).has_table(name):
+        op.create_table(name, *columns, **kw)
+        op.create_index(f"ix_{name}_id", name, ["id"])
+
+
+def upgrade():
+    _create_table(
+        "navires",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("imo", sa.String(50), nullable=False, unique=True),
+        sa.Column("nom", sa.String(255), nullable=False),
+        sa.Column("pavillon", sa.String(100)),
+        sa.Column("annee_construction", sa.Integer()),
+        sa.Column("tonnage", sa.Float()),
+        sa.Column("type", sa.String(100)),
+        sa.Column("dernier_port", sa.String(100)),
+        sa.Column("prochaine_destination", sa.String(100)),
+        sa.Column("statut_actuel", sa.String(100)),
+        sa.Column("autres", sa.Text()),
+    )
+    _create_table(
+        "ports",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("nom", sa.String(100), nullable=False, unique=True),
+        sa.Column("pays", sa.String(100)),
+        sa.Column("ville", sa.String(100)),
+        sa.Column("capacite", sa.Float()),
+        sa.Column("type", sa.String(100)),
+        sa.Column("coordonnees", sa.String(255)),
+        sa.Column("responsable", sa.String(255)),
+    )
+    _create_table(
+        "marchandises",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("nom", sa.String(255), nullable=False),
+        sa.Column("type", sa.String(100)),
+        sa.Column("poids", sa.Float(), nullable=False),
+        sa.Column("volume", sa.Float(), nullable=False),
+        sa.Column("navire_id", sa.Integer(), nullable=False),
+        sa.Column("tracking_number", sa.String(100), nullable=False, unique=True),
+    )
+    _create_table(
+        "manifests",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("numero_manifest", sa.String(255), nullable=False, unique=True),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("navire_imo", sa.String(50), nullable=False),
+        sa.Column("port_depart_nom", sa.String(100), nullable=False),
+        sa.Column("port_arrivee_nom", sa.String(100), nullable=False),
+    )
+    checklist = [
+        "certificat_securite", "certificat_classe", "certificat_pollution",
+        "brevets_marins", "certificats_medicaux", "journal_bord", "papiers_douaniers",
+        "gilets_combinaisons", "radeaux_canots", "extincteurs", "alarmes_detecteurs",
+        "systeme_incendie", "normes_antipollution", "conditions_vie",
+    ]
+    _create_table(
+        "inspections",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("navire_imo", sa.String(50), nullable=False),
+        sa.Column("port_nom", sa.String(100), nullable=False),
+        sa.Column("inspecteur", sa.String(255), nullable=False),
+        sa.Column("rapport", sa.Text()),
+        *[sa.Column(name, sa.String(20), nullable=False) for name in checklist],
+        sa.Column("observations", sa.Text()),
+    )
+    _create_table(
+        "declarations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("navire_nom", sa.String(), nullable=False),
+        sa.Column("navire_imo", sa.String(), nullable=False),
+        sa.Column("port", sa.String(), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("destination", sa.String()),
+        sa.Column("marchandises", sa.String()),
+        sa.Column("securite", sa.String()),
+        sa.Column("sante", sa.String()),
+        sa.Column("fichier_pdf", sa.String(), nullable=False),
+    )
+
+
+def downgrade():
+    for name in ["declarations", "inspections", "manifests", "marchandises", "ports", "navires"]:
+        op.drop_table(name)
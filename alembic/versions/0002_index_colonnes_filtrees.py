@@ -0,0 +1,36 @@
+"""Index sur les colonnes filtrées par les pages et les statistiques
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-12-01
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (nom, table, colonnes) — doit rester aligné sur app/models.py
+INDEXES = [
+    ("ix_marchandises_navire_id", "marchandises", ["navire_id"]),
+    ("ix_navires_statut_actuel", "navires", ["statut_actuel"]),
+    ("ix_inspections_date", "inspections", ["date"]),
+    ("ix_inspections_inspecteur", "inspections", ["inspecteur"]),
+    ("ix_inspections_navire_imo_date", "inspections", ["navire_imo", "date"]),
+    ("ix_inspections_port_nom_date", "inspections", ["port_nom", "date"]),
+    ("ix_declarations_date", "declarations", ["date"]),
+    ("ix_declarations_navire_imo_date", "declarations", ["navire_imo", "date"]),
+    ("ix_manifests_navire_imo", "manifests", ["navire_imo"]),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        # if_not_exists : bases créées par create_all après l'ajout des index aux modèles
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,29 @@
+"""Index des colonnes de tri et de filtre des pages de liste (pagination par curseur)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-12-01
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_navires_nom", "navires", ["nom"]),
+    ("ix_marchandises_nom", "marchandises", ["nom"]),
+    ("ix_marchandises_poids", "marchandises", ["poids"]),
+    ("ix_marchandises_type", "marchandises", ["type"]),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,33 @@
+"""Clé étrangère marchandises.navire_id → navires.id (ON DELETE CASCADE)
+
+Les marchandises orphelines (navire supprimé avant cette migration, la
+suppression d'un navire ne supprimant pas sa cargaison) sont supprimées
+d'abord : PostgreSQL refuserait la contrainte, SQLite la poserait sur des
+données incohérentes. C'est ce que fera désormais ON DELETE CASCADE.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-12-01
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("DELETE FROM marchandises WHERE navire_id NOT IN (SELECT id FROM navires)")
+
+    # SQLite : la table est recréée (mode batch) avec la contrainte
+    with op.batch_alter_table("marchandises") as batch_op:
+        batch_op.create_foreign_key(
+            "fk_marchandises_navire_id_navires", "navires",
+            ["navire_id"], ["id"], ondelete="CASCADE",
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("marchandises") as batch_op:
+        batch_op.drop_constraint("fk_marchandises_navire_id_navires", type_="foreignkey")
@@ -0,0 +1,50 @@
+"""Tables d'agrégats statistiques (inspections par jour/port/inspecteur, navires par statut)
+
+Les agrégats sont calculés une première fois à partir des tables existantes.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-12-01
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "stats_inspections_jour",
+        sa.Column("date", sa.Date(), primary_key=True),
+        sa.Column("port_nom", sa.String(100), primary_key=True),
+        sa.Column("inspecteur", sa.String(255), primary_key=True),
+        sa.Column("nombre", sa.Integer(), nullable=False),
+    )
+    op.create_index(
+        "ix_stats_inspections_jour_inspecteur", "stats_inspections_jour", ["inspecteur", "nombre"]
+    )
+    op.create_table(
+        "stats_navires_statut",
+        sa.Column("statut", sa.String(100), primary_key=True),
+        sa.Column("nombre", sa.Integer(), nullable=False),
+    )
+
+    op.execute(
+        "INSERT INTO stats_inspections_jour (date, port_nom, inspecteur, nombre) "
+        "SELECT date, port_nom, inspecteur, COUNT(*) FROM inspections "
+        "GROUP BY date, port_nom, inspecteur"
+    )
+    op.execute(
+        "INSERT INTO stats_navires_statut (statut, nombre) "
+        "SELECT COALESCE(statut_actuel, ''), COUNT(*) FROM navires "
+        "GROUP BY COALESCE(statut_actuel, '')"
+    )
+
+
+def downgrade():
+    op.drop_table("stats_navires_statut")
+    op.drop_index("ix_stats_inspections_jour_inspecteur", table_name="stats_inspections_jour")
+    op.drop_table("stats_inspections_jour")
@@ -0,0 +1,74 @@
+"""Recherche plein texte sur les inspections (rapport, observations) et les navires (nom, autres)
+
+SQLite : tables FTS5 à contenu externe, alimentées par triggers et
+reconstruites à partir des lignes existantes. Une migration en mode batch
+qui recrée inspections ou navires doit recréer ces triggers.
+PostgreSQL : index GIN sur l'expression to_tsvector('french', …).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-12-08
+"""
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+# (table source, table FTS, colonnes indexées, index GIN PostgreSQL)
+SEARCH_INDEXES = [
+    ("inspections", "inspections_fts", ["rapport", "observations"], "ix_inspections_recherche"),
+    ("navires", "navires_fts", ["nom", "autres"], "ix_navires_recherche"),
+]
+
+
+def _pg_document(columns):
+    return " || ' ' || ".join(f"coalesce({c}, '')" for c in columns)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for table, fts, columns, pg_index in SEARCH_INDEXES:
+        if dialect == "postgresql":
+            op.execute(
+                f"CREATE INDEX IF NOT EXISTS {pg_index} ON {table} "
+                f"USING gin (to_tsvector('french', {_pg_document(columns)}))"
+            )
+            continue
+        if dialect != "sqlite":
+            continue
+
+        cols = ", ".join(columns)
+        new_values = ", ".join(f"new.{c}" for c in columns)
+        old_values = ", ".join(f"old.{c}" for c in columns)
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{cols}, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        )
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table, fts, columns, pg_index in SEARCH_INDEXES:
+        if dialect == "postgresql":
+            op.execute(f"DROP INDEX IF EXISTS {pg_index}")
+        elif dialect == "sqlite":
+            for suffix in ("ai", "ad", "au"):
+                op.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {fts}")
@@ -0,0 +1,42 @@
+"""Masque de bits des 14 points de contrôle des inspections (inspections.non_conformites)
+
+Colonne ajoutée à côté des colonnes texte, qui restent la source affichée
+(formulaires, fiches PDF, exports). Calculée ici pour les lignes existantes.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-12-10
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+# Même ordre que models.CONTROLES (bit i)
+CONTROLES = [
+    "certificat_securite", "certificat_classe", "certificat_pollution",
+    "brevets_marins", "certificats_medicaux", "journal_bord", "papiers_douaniers",
+    "gilets_combinaisons", "radeaux_canots", "extincteurs", "alarmes_detecteurs",
+    "systeme_incendie", "normes_antipollution", "conditions_vie",
+]
+
+
+def upgrade():
+    # Pas de mode batch : recréer inspections supprimerait les triggers FTS5 (0006)
+    op.add_column(
+        "inspections",
+        sa.Column("non_conformites", sa.Integer(), nullable=False,
+                  server_default=str((1 << len(CONTROLES)) - 1)),
+    )
+    mask = " + ".join(
+        f"CASE WHEN {column} = 'Conforme' THEN 0 ELSE {1 << i} END"
+        for i, column in enumerate(CONTROLES)
+    )
+    op.execute(f"UPDATE inspections SET non_conformites = {mask}")
+
+
+def downgrade():
+    op.drop_column("inspections", "non_conformites")
@@ -0,0 +1,38 @@
+"""Totaux de cargaison par navire (poids, volume, nombre de marchandises)
+
+Calculés une première fois à partir des marchandises existantes.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2025-12-12
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "stats_chargement_navire",
+        sa.Column("navire_id", sa.Integer(), primary_key=True),
+        sa.Column("poids", sa.Float(), nullable=False),
+        sa.Column("volume", sa.Float(), nullable=False),
+        sa.Column("nombre", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["navire_id"], ["navires.id"], ondelete="CASCADE",
+            name="fk_stats_chargement_navire_navire_id_navires",
+        ),
+    )
+    op.execute(
+        "INSERT INTO stats_chargement_navire (navire_id, poids, volume, nombre) "
+        "SELECT navire_id, SUM(poids), SUM(volume), COUNT(*) FROM marchandises "
+        "GROUP BY navire_id"
+    )
+
+
+def downgrade():
+    op.drop_table("stats_chargement_navire")
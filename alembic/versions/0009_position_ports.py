@@ -0,0 +1,42 @@
+"""Position des ports en degrés décimaux (ports.latitude, ports.longitude)
+
+Lue dans la saisie libre ports.coordonnees pour les ports existants ; les
+saisies illisibles restent sans position.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2025-12-15
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.geo import parse_coordinates
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("ports", sa.Column("latitude", sa.Float(), nullable=True))
+    op.add_column("ports", sa.Column("longitude", sa.Float(), nullable=True))
+
+    bind = op.get_bind()
+    positions = [
+        {"id": port_id, "latitude": position[0], "longitude": position[1]}
+        for port_id, coordonnees in bind.execute(
+            sa.text("SELECT id, coordonnees FROM ports WHERE coordonnees IS NOT NULL")
+        )
+        if (position := parse_coordinates(coordonnees))
+    ]
+    if positions:
+        bind.execute(
+            sa.text("UPDATE ports SET latitude = :latitude, longitude = :longitude WHERE id = :id"),
+            positions,
+        )
+
+
+def downgrade():
+    op.drop_column("ports", "longitude")
+    op.drop_column("ports", "latitude")
@@ -0,0 +1,39 @@
+"""File des déclarations générées en arrière-plan (declaration_jobs)
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2025-12-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "declaration_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("type", sa.String(20), nullable=False),
+        sa.Column("statut", sa.String(20), nullable=False),
+        sa.Column("parametres", sa.Text(), nullable=False),
+        sa.Column("tentatives", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("erreur", sa.Text(), nullable=True),
+        sa.Column("declaration_id", sa.Integer(), nullable=True),
+        sa.Column("cree_le", sa.DateTime(), nullable=False),
+        sa.Column("demarre_le", sa.DateTime(), nullable=True),
+        sa.Column("termine_le", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["declaration_id"], ["declarations.id"], ondelete="SET NULL",
+            name="fk_declaration_jobs_declaration_id_declarations",
+        ),
+    )
+    op.create_index("ix_declaration_jobs_statut_id", "declaration_jobs", ["statut", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_declaration_jobs_statut_id", table_name="declaration_jobs")
+    op.drop_table("declaration_jobs")
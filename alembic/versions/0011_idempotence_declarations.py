@@ -0,0 +1,26 @@
+"""Clé d'idempotence des déclarations générées en arrière-plan (declaration_jobs.cle)
+
+Index unique : deux soumissions identiques ne peuvent pas créer deux
+générations, même en parallèle. Les travaux existants restent sans clé.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2025-12-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("declaration_jobs", sa.Column("cle", sa.String(64), nullable=True))
+    op.create_index("uq_declaration_jobs_cle", "declaration_jobs", ["cle"], unique=True)
+
+
+def downgrade():
+    op.drop_index("uq_declaration_jobs_cle", table_name="declaration_jobs")
+    op.drop_column("declaration_jobs", "cle")
@@ -0,0 +1,435 @@
+"""
+Imports en masse depuis un fichier CSV ou JSONL, lu en flux et traité par
+paquets. Les lignes rejetées sont listées dans le rapport final (numéro de
+ligne + motif).
+
+Marchandises (manifeste) : pour chaque paquet, une seule requête vérifie
+les numéros de tracking déjà en base et une seule insertion multi-lignes
+(executemany) enregistre les lignes valides. Les lignes qui dépasseraient
+le tonnage du navire sont rejetées (chargement lu en début de paquet,
+cumulé ligne à ligne) ; les totaux par navire sont mis à jour dans la
+même transaction que l'insertion.
+Colonnes : nom, type, poids, volume, tracking_number et navire_id
+(ou navire_imo pour désigner le navire par son numéro IMO).
+
+Navires (synchronisation du registre) : INSERT … ON CONFLICT (imo) DO UPDATE,
+une transaction par paquet ; les navires identiques à la base ne sont pas
+réécrits. Colonnes : imo, nom et, au choix, les autres champs du navire
+(une colonne absente du fichier n'est pas modifiée).
+
+En ligne de commande :
+    python -m app.bulk_import marchandises manifeste.csv [--format csv|jsonl]
+    python -m app.bulk_import navires registre.jsonl [--format csv|jsonl]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from itertools import islice
+
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import models, rollups
+from app.counters import dashboard_counters, MARCHANDISES_TOTAL, NAVIRES_A_QUAI
+from app.database import dialect_insert
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", "1000"))
+
+FORMATS = ("csv", "jsonl")
+
+
+class ImportReport:
+    def __init__(self):
+        self.lignes = 0
+        self.inserees = 0
+        self.erreurs_total = 0
+        self.erreurs = []   # [(ligne, motif)], tronquée à IMPORT_MAX_REPORTED_ERRORS
+
+    def error(self, line: int, message: str):
+        self.erreurs_total += 1
+        if len(self.erreurs) < IMPORT_MAX_REPORTED_ERRORS:
+            self.erreurs.append({"ligne": line, "erreur": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "lignes": self.lignes,
+            "inserees": self.inserees,
+            "rejetees": self.erreurs_total,
+            "erreurs": self.erreurs,
+            "erreurs_tronquees": self.erreurs_total > len(self.erreurs),
+        }
+
+
+class UpsertReport(ImportReport):
+    def __init__(self):
+        super().__init__()
+        self.mises_a_jour = 0
+        self.inchangees = 0
+
+    def as_dict(self) -> dict:
+        report = super().as_dict()
+        report["mises_a_jour"] = self.mises_a_jour
+        report["inchangees"] = self.inchangees
+        return report
+
+
+def detect_format(filename: str | None) -> str | None:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}.get(ext)
+
+
+def read_records(binary_stream, fmt: str):
+    """Itère sur (numéro de ligne, dict ou message d'erreur) sans charger le fichier."""
+    text = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_no, "JSON invalide"
+                continue
+            yield line_no, record if isinstance(record, dict) else "objet JSON attendu"
+    else:
+        raise ValueError(f"Format inconnu : {fmt} (attendu : {', '.join(FORMATS)})")
+
+
+def _text(record: dict, name: str) -> str | None:
+    value = record.get(name)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def parse_marchandise(record: dict) -> dict:
+    """Ligne du manifeste -> valeurs de colonnes ; lève ValueError si invalide."""
+    row = {"nom": _text(record, "nom"), "type": _text(record, "type"),
+           "tracking_number": _text(record, "tracking_number")}
+    for name in ("nom", "tracking_number"):
+        if not row[name]:
+            raise ValueError(f"{name} manquant")
+    for name in ("poids", "volume"):
+        try:
+            row[name] = float(_text(record, name))
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} invalide : {record.get(name)!r}")
+
+    navire_id, navire_imo = _text(record, "navire_id"), _text(record, "navire_imo")
+    if navire_id:
+        if not navire_id.isdigit():
+            raise ValueError(f"navire_id invalide : {navire_id!r}")
+        row["navire_id"] = int(navire_id)
+    elif navire_imo:
+        row["navire_imo"] = navire_imo
+    else:
+        raise ValueError("navire_id ou navire_imo manquant")
+    return row
+
+
+class _NavireResolver:
+    """Résout et mémorise les navires d'un import (une requête par paquet au plus)."""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.ids = set()
+        self.by_imo = {}
+        self.missing_ids = set()
+        self.missing_imos = set()
+
+    def load(self, rows: list):
+        ids = {r["navire_id"] for r in rows if "navire_id" in r} - self.ids - self.missing_ids
+        if ids:
+            found = set(self.db.scalars(select(models.Navire.id).where(models.Navire.id.in_(ids))))
+            self.ids |= found
+            self.missing_ids |= ids - found
+        imos = {r["navire_imo"] for r in rows if "navire_imo" in r} - self.by_imo.keys() - self.missing_imos
+        if imos:
+            found = dict(self.db.execute(
+                select(models.Navire.imo, models.Navire.id).where(models.Navire.imo.in_(imos))
+            ).all())
+            self.by_imo.update(found)
+            self.ids |= set(found.values())
+            self.missing_imos |= imos - found.keys()
+
+    def resolve(self, row: dict) -> int | None:
+        if "navire_imo" in row:
+            return self.by_imo.get(row.pop("navire_imo"))
+        return row["navire_id"] if row["navire_id"] in self.ids else None
+
+
+def _count_cargo(db: Session, rows: list):
+    """Totaux de chargement : un upsert par navire du paquet."""
+    totals = {}
+    for row in rows:
+        total = totals.setdefault(row["navire_id"], [0.0, 0.0, 0])
+        total[0] += row["poids"]
+        total[1] += row["volume"]
+        total[2] += 1
+    for navire_id, (poids, volume, nombre) in totals.items():
+        rollups.add_cargo(db, navire_id, poids, volume, nombre)
+
+
+def _check_capacity(db: Session, batch: list, report: ImportReport) -> list:
+    """Écarte les lignes qui porteraient le navire au-delà de son tonnage."""
+    N, S = models.Navire, models.StatChargementNavire
+    ids = {row["navire_id"] for _, row in batch}
+    charges = {
+        navire_id: [tonnage, charge]
+        for navire_id, tonnage, charge in db.execute(
+            select(N.id, N.tonnage, func.coalesce(S.poids, 0))
+            .outerjoin(S, S.navire_id == N.id).where(N.id.in_(ids))
+        )
+    }
+    kept = []
+    for line, row in batch:
+        entry = charges[row["navire_id"]]
+        tonnage, charge = entry[0], entry[1] + row["poids"]
+        if rollups.over_capacity(charge, tonnage):
+            report.error(line, f"capacité du navire dépassée ({charge:g} t pour un tonnage de {tonnage:g} t)")
+            continue
+        entry[1] = charge
+        kept.append((line, row))
+    return kept
+
+
+def _insert_batch(db: Session, batch: list, report: ImportReport):
+    """Insertion multi-lignes ; si une ligne est entrée entre-temps, ligne à ligne."""
+    rows = [row for _, row in batch]
+    try:
+        db.execute(insert(models.Marchandise), rows)
+        _count_cargo(db, rows)
+        db.commit()
+        report.inserees += len(rows)
+        return
+    except IntegrityError:
+        db.rollback()
+    for line, row in batch:
+        try:
+            with db.begin_nested():
+                db.execute(insert(models.Marchandise), [row])
+                _count_cargo(db, [row])
+            report.inserees += 1
+        except IntegrityError:
+            report.error(line, f"tracking_number {row['tracking_number']} déjà enregistré")
+    db.commit()
+
+
+def _process_batch(db: Session, chunk: list, seen: set, navires: _NavireResolver,
+                   report: ImportReport):
+    parsed = []
+    for line, record in chunk:
+        if isinstance(record, str):
+            report.error(line, record)
+            continue
+        try:
+            parsed.append((line, parse_marchandise(record)))
+        except ValueError as exc:
+            report.error(line, str(exc))
+
+    # Unicité : une requête pour tout le paquet
+    trackings = {row["tracking_number"] for _, row in parsed}
+    existing = set(db.scalars(
+        select(models.Marchandise.tracking_number)
+        .where(models.Marchandise.tracking_number.in_(trackings))
+    )) if trackings else set()
+    navires.load([row for _, row in parsed])
+
+    batch = []
+    for line, row in parsed:
+        tracking = row["tracking_number"]
+        if tracking in existing:
+            report.error(line, f"tracking_number {tracking} déjà enregistré")
+            continue
+        if tracking in seen:
+            report.error(line, f"tracking_number {tracking} en double dans le fichier")
+            continue
+        navire_id = navires.resolve(row)
+        if navire_id is None:
+            report.error(line, "navire introuvable")
+            continue
+        row["navire_id"] = navire_id
+        seen.add(tracking)
+        batch.append((line, row))
+    if batch:
+        batch = _check_capacity(db, batch, report)
+    if batch:
+        _insert_batch(db, batch, report)
+
+
+def import_marchandises(db: Session, binary_stream, fmt: str,
+                        batch_size: int = IMPORT_BATCH_SIZE) -> ImportReport:
+    """Importe un manifeste en flux ; chaque paquet est validé en base séparément."""
+    report = ImportReport()
+    records = read_records(binary_stream, fmt)
+    seen = set()
+    navires = _NavireResolver(db)
+    try:
+        while chunk := list(islice(records, batch_size)):
+            report.lignes += len(chunk)
+            _process_batch(db, chunk, seen, navires, report)
+    finally:
+        if report.inserees:
+            dashboard_counters.invalidate(MARCHANDISES_TOTAL)
+    return report
+
+
+# -------------------------
+# Navires : upsert par IMO
+# -------------------------
+
+NAVIRE_TEXT_FIELDS = ("nom", "pavillon", "type", "dernier_port", "prochaine_destination",
+                      "statut_actuel", "autres")
+
+
+def parse_navire(record: dict) -> dict:
+    """Ligne du registre -> colonnes présentes dans le fichier ; lève ValueError si invalide."""
+    row = {"imo": _text(record, "imo")}
+    if not row["imo"]:
+        raise ValueError("imo manquant")
+    for name in NAVIRE_TEXT_FIELDS:
+        if name in record:
+            row[name] = _text(record, name)
+    if "nom" in row and not row["nom"]:
+        raise ValueError("nom vide")
+    for name, cast in (("annee_construction", int), ("tonnage", float)):
+        if name in record:
+            value = _text(record, name)
+            try:
+                row[name] = cast(value) if value is not None else None
+            except ValueError:
+                raise ValueError(f"{name} invalide : {record.get(name)!r}")
+    return row
+
+
+def _upsert_navires(db: Session, rows: list):
+    """INSERT … ON CONFLICT (imo) DO UPDATE, uniquement si une valeur change."""
+    # Les lignes d'un même VALUES doivent porter les mêmes colonnes
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    table = models.Navire.__table__
+    for columns, group in groups.items():
+        stmt = dialect_insert(db, models.Navire).values(group)
+        updated = [name for name in columns if name != "imo"]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["imo"],
+            set_={name: stmt.excluded[name] for name in updated},
+            where=or_(*[table.c[name].is_distinct_from(stmt.excluded[name]) for name in updated]),
+        )
+        db.execute(stmt)
+
+
+def _process_navires(db: Session, chunk: list, report: UpsertReport) -> bool:
+    """Traite un paquet dans une transaction ; renvoie True si un statut a changé."""
+    parsed = {}
+    for line, record in chunk:
+        if isinstance(record, str):
+            report.error(line, record)
+            continue
+        try:
+            row = parse_navire(record)
+        except ValueError as exc:
+            report.error(line, str(exc))
+            continue
+        if row["imo"] in parsed:
+            # Un même IMO ne peut être mis à jour deux fois par la même requête
+            previous_line, _ = parsed.pop(row["imo"])
+            report.error(previous_line, f"imo {row['imo']} repris plus loin dans le fichier")
+        parsed[row["imo"]] = (line, row)
+    if not parsed:
+        return False
+
+    existing = {
+        navire.imo: navire for navire in
+        db.query(models.Navire).filter(models.Navire.imo.in_(parsed.keys()))
+    }
+    rows, statuts = [], {}
+    for imo, (line, row) in parsed.items():
+        navire = existing.get(imo)
+        if navire is None:
+            if not row.get("nom"):
+                report.error(line, "nom manquant pour un nouveau navire")
+                continue
+            report.inserees += 1
+            statuts[row.get("statut_actuel") or ""] = statuts.get(row.get("statut_actuel") or "", 0) + 1
+        elif all(getattr(navire, name) == value for name, value in row.items()):
+            report.inchangees += 1
+            continue
+        else:
+            report.mises_a_jour += 1
+            if "statut_actuel" in row and (row["statut_actuel"] or "") != (navire.statut_actuel or ""):
+                old, new = navire.statut_actuel or "", row["statut_actuel"] or ""
+                statuts[old] = statuts.get(old, 0) - 1
+                statuts[new] = statuts.get(new, 0) + 1
+            # La ligne proposée doit respecter NOT NULL avant même le ON CONFLICT
+            row.setdefault("nom", navire.nom)
+        rows.append(row)
+    db.expunge_all()
+
+    if rows:
+        _upsert_navires(db, rows)
+        for statut, delta in statuts.items():
+            if delta:
+                rollups.count_navire(db, statut, delta)
+    db.commit()
+    return any(statuts.values())
+
+
+def upsert_navires(db: Session, binary_stream, fmt: str,
+                   batch_size: int = IMPORT_BATCH_SIZE) -> UpsertReport:
+    """Synchronise le registre des navires (clé : IMO)."""
+    report = UpsertReport()
+    records = read_records(binary_stream, fmt)
+    statut_changed = False
+    try:
+        while chunk := list(islice(records, batch_size)):
+            report.lignes += len(chunk)
+            statut_changed |= _process_navires(db, chunk, report)
+    finally:
+        if statut_changed:
+            dashboard_counters.invalidate(NAVIRES_A_QUAI)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import en masse MarineGab")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("marchandises", "importe un manifeste de marchandises (CSV ou JSONL)"),
+                            ("navires", "synchronise le registre des navires par IMO (CSV ou JSONL)")):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument("fichier")
+        cmd.add_argument("--format", choices=FORMATS)
+        cmd.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.fichier)
+    if not fmt:
+        parser.error("format non reconnu, préciser --format")
+    run = import_marchandises if args.command == "marchandises" else upsert_navires
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        with open(args.fichier, "rb") as f:
+            report = run(db, f, fmt, args.batch_size)
+    finally:
+        db.close()
+    print(json.dumps(report.as_dict(), ensure_ascii=False, indent=2))
+    if report.erreurs_total:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
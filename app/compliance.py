@@ -0,0 +1,137 @@
+"""
+Statistiques de conformité des inspections (/stats/conformite).
+
+Chaque inspection porte ses 14 points de contrôle en un entier
+(Inspection.non_conformites, bit i = models.CONTROLES[i] non conforme).
+Les inspections de la période sont lues une fois (mois, port, navire,
+masque) puis tout est calculé en NumPy : dépliage des bits en matrice
+n × 14, puis taux de non-conformité par point pour chaque dimension
+(port, pavillon, navire, mois) avec un bincount par dimension.
+
+Le calcul lit toutes les inspections de la période : il n'est fait qu'à
+la demande de /stats/conformite (route synchrone, pool de threads), la page
+/stats restant sur les tables d'agrégats.
+
+Recalcul des masques (après un import direct en base, par exemple) :
+    python -m app.compliance backfill
+"""
+import argparse
+
+import numpy as np
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+
+from app import models
+
+# Libellés des points de contrôle (ordre de models.CONTROLES)
+LIBELLES = (
+    "Certificat sécurité", "Certificat de classe", "Certificat pollution",
+    "Brevets marins", "Certificats médicaux", "Journal de bord", "Papiers douaniers",
+    "Gilets & combinaisons", "Radeaux & canots", "Extincteurs", "Alarmes & détecteurs",
+    "Système anti-incendie", "Normes antipollution", "Conditions de vie",
+)
+DIMENSIONS = ("port", "pavillon", "navire", "mois")
+
+_BITS = np.arange(len(models.CONTROLES), dtype=np.uint16)
+
+
+def mask_expression():
+    """Masque calculé en SQL à partir des colonnes texte."""
+    I = models.Inspection
+    return sum(
+        case((getattr(I, column) == models.CONFORME, 0), else_=1 << i)
+        for i, column in enumerate(models.CONTROLES)
+    )
+
+
+def backfill(db: Session):
+    db.execute(update(models.Inspection).values(non_conformites=mask_expression()))
+    db.commit()
+
+
+def _month(db: Session):
+    # Mois calculé en base (texte AAAA-MM) : pas de conversion de dates côté Python
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(models.Inspection.date, "YYYY-MM")
+    return func.strftime("%Y-%m", models.Inspection.date)
+
+
+def _factorize(values) -> tuple:
+    """(valeurs distinctes, indice de la valeur pour chaque ligne)."""
+    codes = {}
+    inverse = np.fromiter((codes.setdefault(v, len(codes)) for v in values),
+                          dtype=np.intp, count=len(values))
+    return list(codes), inverse
+
+
+def _group(values: list, inverse: np.ndarray, bits: np.ndarray) -> list:
+    """Inspections et taux de non-conformité par point, pour chaque valeur de clé."""
+    k, n_items = len(values), bits.shape[1]
+    inspections = np.bincount(inverse, minlength=k)
+    # Une seule passe : chaque bit à 1 compte dans la case (clé, point)
+    cells = (inverse[:, None] * n_items + _BITS)[bits]
+    non_conformes = np.bincount(cells, minlength=k * n_items).reshape(k, n_items)
+    taux = non_conformes / np.maximum(inspections, 1)[:, None]
+
+    return [
+        {
+            "cle": values[g],
+            "inspections": int(inspections[g]),
+            "taux_moyen": round(float(taux[g].mean()), 4),
+            "taux": [round(float(t), 4) for t in taux[g]],
+        }
+        for g in np.argsort(-inspections, kind="stable")
+    ]
+
+
+def analyse(db: Session, d1, d2) -> dict:
+    """
+    Taux de non-conformité (0..1) par point de contrôle : global et par
+    port / pavillon / navire / mois (groupes triés par nombre d'inspections,
+    les mois dans l'ordre chronologique).
+    """
+    I, N = models.Inspection, models.Navire
+    rows = db.execute(
+        select(_month(db), I.port_nom, I.navire_imo, I.non_conformites)
+        .where(I.date.between(d1, d2))
+    ).all()
+    mois, ports, imos, masks = zip(*rows) if rows else ((),) * 4
+
+    masks = np.fromiter(masks, dtype=np.uint16, count=len(masks))
+    bits = ((masks[:, None] >> _BITS) & 1).astype(bool)   # n × 14
+    keys = {"port": _factorize(ports), "navire": _factorize(imos), "mois": _factorize(mois)}
+
+    # Pavillon : un par navire distinct, hérité par ses inspections
+    imo_values, imo_inverse = keys["navire"]
+    pavillons = dict(db.execute(select(N.imo, N.pavillon)).all())
+    pavillon_values, pavillon_of_imo = _factorize([pavillons.get(imo) or "N/A" for imo in imo_values])
+    keys["pavillon"] = (pavillon_values, pavillon_of_imo[imo_inverse])
+
+    result = {
+        "inspections": len(masks),
+        "controles": list(LIBELLES),
+        "global": [round(float(t), 4) for t in bits.mean(axis=0)] if len(masks) else [0.0] * len(_BITS),
+    }
+    for dimension in DIMENSIONS:
+        result[dimension] = _group(*keys[dimension], bits)
+    result["mois"].sort(key=lambda groupe: groupe["cle"])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conformité des inspections MarineGab")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("backfill", help="recalcule les masques depuis les colonnes texte")
+    parser.parse_args()
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        backfill(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
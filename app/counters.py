@@ -0,0 +1,176 @@
+"""
+Compteurs du tableau de bord (page d'accueil).
+
+Les trois chiffres de la page d'accueil sont gardés en cache et invalidés
+par les routes d'écriture (navires, inspections, marchandises) : en régime
+établi, la page d'accueil ne touche plus aux tables. Une valeur absente est
+recalculée depuis les tables d'agrégats (app/rollups.py), jamais par un
+COUNT sur les grandes tables.
+
+Deux magasins :
+  - "memory" : propre à chaque processus (défaut, un seul worker) ;
+  - "sqlite" : petit fichier partagé par tous les workers d'une même machine
+               (remplaçant local d'un cache partagé type Redis).
+
+Chaque compteur porte un numéro de génération incrémenté à chaque
+invalidation : une valeur calculée pendant une écriture concurrente n'est
+pas enregistrée, elle serait déjà périmée. Le TTL rattrape les écritures
+faites hors de l'application (scripts, import direct en base).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from app import rollups
+
+# Configuration (surchargeable par variables d'environnement)
+COUNTERS_BACKEND = os.getenv("COUNTERS_BACKEND", "memory")
+COUNTERS_SQLITE_PATH = os.getenv("COUNTERS_SQLITE_PATH", os.path.join("app", "cache", "counters.db"))
+COUNTERS_TTL = float(os.getenv("COUNTERS_TTL", "300"))
+
+# Noms des compteurs
+NAVIRES_A_QUAI = "navires_a_quai"
+INSPECTIONS_MOIS = "inspections_mois"
+MARCHANDISES_TOTAL = "marchandises_total"
+
+
+class MemoryCounterStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}   # nom -> [génération, valeur, expiration]
+
+    def get(self, name: str):
+        """Renvoie (valeur ou None, génération)."""
+        with self._lock:
+            generation, value, expires_at = self._entries.get(name, (0, None, 0))
+            if value is None or expires_at < time.monotonic():
+                return None, generation
+            return value, generation
+
+    def set(self, name: str, value, generation: int, ttl: float):
+        with self._lock:
+            entry = self._entries.setdefault(name, [0, None, 0])
+            if entry[0] == generation:
+                entry[1] = value
+                entry[2] = time.monotonic() + ttl
+
+    def invalidate(self, name: str):
+        with self._lock:
+            entry = self._entries.setdefault(name, [0, None, 0])
+            entry[0] += 1
+            entry[1] = None
+
+
+class SqliteCounterStore:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters ("
+                " name TEXT PRIMARY KEY, generation INTEGER NOT NULL DEFAULT 0,"
+                " value TEXT, expires_at REAL NOT NULL DEFAULT 0)"
+            )
+
+    def _connect(self):
+        # Une connexion par appel : sûr entre threads et entre processus
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def get(self, name: str):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT generation, value, expires_at FROM counters WHERE name = ?", (name,)
+            ).fetchone()
+        if row is None:
+            return None, 0
+        generation, value, expires_at = row
+        if value is None or expires_at < time.time():
+            return None, generation
+        return json.loads(value), generation
+
+    def set(self, name: str, value, generation: int, ttl: float):
+        with self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO counters (name) VALUES (?)", (name,))
+            conn.execute(
+                "UPDATE counters SET value = ?, expires_at = ? WHERE name = ? AND generation = ?",
+                (json.dumps(value), time.time() + ttl, name, generation),
+            )
+
+    def invalidate(self, name: str):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO counters (name, generation) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET generation = generation + 1, value = NULL",
+                (name,),
+            )
+
+
+class DashboardCounters:
+    def __init__(self, store, ttl: float = COUNTERS_TTL):
+        self.store = store
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, name: str, compute, fresh=None):
+        """
+        Valeur en cache, sinon compute() (enregistrée si aucune invalidation
+        n'a eu lieu entre-temps). fresh(valeur) permet d'écarter une valeur
+        encore en cache mais devenue hors sujet (changement de mois).
+        """
+        value, generation = self.store.get(name)
+        if value is not None and (fresh is None or fresh(value)):
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute()
+        self.store.set(name, value, generation, self.ttl)
+        return value
+
+    def invalidate(self, *names: str):
+        """À appeler après le commit de l'écriture."""
+        for name in names:
+            self.store.invalidate(name)
+
+    def stats(self) -> dict:
+        return {"backend": COUNTERS_BACKEND, "hits": self.hits, "misses": self.misses}
+
+
+def create_store():
+    if COUNTERS_BACKEND == "memory":
+        return MemoryCounterStore()
+    if COUNTERS_BACKEND == "sqlite":
+        return SqliteCounterStore(COUNTERS_SQLITE_PATH)
+    raise ValueError(f"COUNTERS_BACKEND inconnu : {COUNTERS_BACKEND}")
+
+
+dashboard_counters = DashboardCounters(create_store())
+
+
+def home_counters(db) -> dict:
+    """Chiffres de la page d'accueil (calculés via les agrégats en cas d'absence)."""
+    today = date.today()
+    debut_mois = date(today.year, today.month, 1)
+    mois = debut_mois.isoformat()
+
+    navires_a_quai = dashboard_counters.get_or_compute(
+        NAVIRES_A_QUAI, lambda: rollups.navires_counts(db)[1]
+    )
+    # Inspections du mois en cours : la valeur mémorise son mois
+    inspections_mois = dashboard_counters.get_or_compute(
+        INSPECTIONS_MOIS,
+        lambda: [mois, rollups.inspections_count(db, debut_mois, date.max)],
+        fresh=lambda value: value[0] == mois,
+    )[1]
+    marchandises_total = dashboard_counters.get_or_compute(
+        MARCHANDISES_TOTAL, lambda: rollups.marchandises_count(db)
+    )
+    return {
+        "navires_a_quai": navires_a_quai,
+        "inspections_mois": inspections_mois,
+        "marchandises_total": marchandises_total,
+    }
@@ -0,0 +1,379 @@
+"""
+Génération des déclarations en arrière-plan.
+
+POST /declarations/arrivee/jobs et /declarations/depart/jobs enregistrent
+un travail et répondent aussitôt (202 + identifiant) ; GET
+/declarations/jobs/{id} donne son état et GET /declarations/jobs/{id}/pdf
+le document une fois prêt. Le rendu ne se fait plus pendant la requête :
+un rendu lent ne fait plus expirer le client, qui ne renvoie plus le
+formulaire.
+
+Les travaux sont des lignes de declaration_jobs, dans la même base que les
+déclarations : la file survit à un redémarrage. DECLARATION_WORKERS threads
+par processus prennent le plus ancien travail en attente par un UPDATE
+conditionnel (un seul worker l'obtient, même entre processus), rendent le
+PDF via pdf_engine, puis enregistrent la déclaration et l'état « terminé »
+dans la même transaction.
+
+Un travail resté « en cours » plus de DECLARATION_JOB_LEASE secondes
+(processus arrêté en plein rendu) est repris ; après DECLARATION_JOB_ATTEMPTS
+tentatives il passe en « échec ». Le nombre de tentatives sert de jeton :
+seul le worker de la dernière tentative peut terminer le travail, un
+worker en retard n'enregistre pas de seconde déclaration.
+
+Soumissions idempotentes : un double clic, un renvoi du formulaire ou une
+nouvelle tentative du client renvoient le travail déjà créé (et son PDF
+s'il est prêt) au lieu d'un nouveau rendu. La clé est celle du client
+(en-tête Idempotency-Key ou champ caché idempotency_key des formulaires,
+valable DECLARATION_IDEMPOTENCY_TTL secondes), à défaut une empreinte du
+type et de tous les champs saisis (valable DECLARATION_DUPLICATE_WINDOW
+secondes). L'index unique declaration_jobs.cle garantit l'unicité en base,
+y compris entre soumissions simultanées ; la clé est libérée à la fin de sa
+fenêtre ou si la génération échoue.
+
+Les routes historiques /declarations/*/download passent par la même file
+(et la même idempotence) puis attendent le PDF : le travail qu'elles
+viennent de créer est rendu dans le thread de la requête, sans attendre
+un worker libre. Moteur PDF saturé : réponse 503 + Retry-After immédiate,
+le travail passe en échec (clé libérée) au lieu de rester en attente.
+
+Workers dans un processus séparé (DECLARATION_WORKERS=0 côté serveur web) :
+    python -m app.declaration_jobs
+Les caches du serveur web (suivi, compteurs, occupation) rattrapent alors
+les déclarations par leur TTL / resynchronisation.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import dialect_insert
+from app.declarations import (
+    ARRIVEE, TITRES, declared, prepare_arrivee, prepare_depart, record,
+)
+from app.pdf_engine import pdf_engine, PdfEngineBusy, PDF_JOB_TIMEOUT
+
+# Configuration (surchargeable par variables d'environnement)
+DECLARATION_WORKERS = int(os.getenv("DECLARATION_WORKERS", "2"))      # 0 = pas de workers dans ce processus
+DECLARATION_POLL = float(os.getenv("DECLARATION_POLL", "2"))
+DECLARATION_JOB_LEASE = float(os.getenv("DECLARATION_JOB_LEASE", "120"))
+DECLARATION_JOB_ATTEMPTS = int(os.getenv("DECLARATION_JOB_ATTEMPTS", "3"))
+DECLARATION_JOB_RETENTION_DAYS = int(os.getenv("DECLARATION_JOB_RETENTION_DAYS", "7"))
+DECLARATION_IDEMPOTENCY_TTL = float(os.getenv("DECLARATION_IDEMPOTENCY_TTL", str(24 * 3600)))
+DECLARATION_DUPLICATE_WINDOW = float(os.getenv("DECLARATION_DUPLICATE_WINDOW", "600"))
+DECLARATION_WAIT_TIMEOUT = float(os.getenv("DECLARATION_WAIT_TIMEOUT", str(PDF_JOB_TIMEOUT + 5)))
+
+EN_ATTENTE = "en attente"
+EN_COURS = "en cours"
+TERMINE = "terminé"
+ECHEC = "échec"
+
+_PURGE_INTERVAL = 3600
+
+# Réveille les attentes de wait() à chaque travail traité dans ce processus
+_finished = threading.Condition()
+
+
+class IdempotencyConflict(Exception):
+    """Clé d'idempotence déjà utilisée pour une déclaration différente."""
+
+
+def _now() -> datetime:
+    # Colonnes DateTime sans fuseau : UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def idempotency_key(type: str, parametres: dict, cle_client: str | None = None) -> str:
+    """Empreinte stockée dans declaration_jobs.cle (clé du client ou contenu)."""
+    if cle_client:
+        source = ["client", cle_client]
+    else:
+        # Tous les champs : deux départs du même jour vers des destinations
+        # différentes sont deux déclarations distinctes
+        source = ["contenu", type] + [
+            f"{field}={str(parametres[field] or '').strip()}" for field in sorted(parametres)
+        ]
+    return hashlib.sha256("\x1f".join(source).encode()).hexdigest()
+
+
+def submit(db: Session, type: str, parametres: dict, cle_client: str | None = None) -> tuple:
+    """
+    (travail, créé) : enregistre un travail en attente et réveille les workers
+    du processus, ou renvoie le travail déjà soumis avec la même clé.
+    :raises IdempotencyConflict: clé du client réutilisée pour une autre déclaration
+    """
+    J = models.DeclarationJob
+    cle = idempotency_key(type, parametres, cle_client)
+    now = _now()
+    window = DECLARATION_IDEMPOTENCY_TTL if cle_client else DECLARATION_DUPLICATE_WINDOW
+
+    # Clé libérée au-delà de sa fenêtre, ou si la génération a échoué
+    db.execute(
+        update(J).where(J.cle == cle, or_(J.cree_le < now - timedelta(seconds=window), J.statut == ECHEC))
+        .values(cle=None)
+    )
+    # L'index unique départage les soumissions simultanées
+    job_id = db.execute(
+        dialect_insert(db, J).values(
+            type=type,
+            statut=EN_ATTENTE,
+            parametres=json.dumps(parametres, ensure_ascii=False),
+            cle=cle,
+            tentatives=0,
+            cree_le=now,
+        ).on_conflict_do_nothing(index_elements=[J.cle]).returning(J.id)
+    ).scalar()
+    created = job_id is not None
+    job = db.get(J, job_id) if created else db.scalars(select(J).where(J.cle == cle)).one()
+    db.commit()
+
+    if created:
+        declaration_workers.wake()
+    elif cle_client and (job.type != type or json.loads(job.parametres) != parametres):
+        raise IdempotencyConflict(cle_client)
+    return job, created
+
+
+def claim(db: Session, job_id: int | None = None) -> tuple | None:
+    """
+    (id, tentative) du prochain travail pris par ce worker (ou du travail
+    job_id s'il est disponible), None si la file est vide.
+    """
+    J = models.DeclarationJob
+    now = _now()
+    abandoned = and_(J.statut == EN_COURS, J.demarre_le < now - timedelta(seconds=DECLARATION_JOB_LEASE))
+    for condition in (J.statut == EN_ATTENTE, abandoned):
+        if job_id is not None:
+            condition = and_(condition, J.id == job_id)
+        while True:
+            # Lecture seule tant que la file est vide : pas de verrou d'écriture à chaque attente
+            row = db.execute(select(J.id, J.tentatives).where(condition).order_by(J.id).limit(1)).first()
+            if row is None:
+                break
+            claimed_id, tentatives = row
+            fenced = update(J).where(J.id == claimed_id, J.tentatives == tentatives, condition)
+            if tentatives >= DECLARATION_JOB_ATTEMPTS:
+                db.execute(fenced.values(statut=ECHEC, erreur="Génération interrompue à chaque tentative",
+                                         termine_le=now))
+                db.commit()
+                continue
+            claimed = db.execute(
+                fenced.values(statut=EN_COURS, demarre_le=now, tentatives=tentatives + 1)
+            ).rowcount
+            db.commit()
+            if claimed:
+                return claimed_id, tentatives + 1
+            # Pris par un autre worker entre la lecture et la mise à jour
+    db.rollback()
+    return None
+
+
+def _finish(db: Session, job_id: int, attempt: int, **values) -> bool:
+    J = models.DeclarationJob
+    return db.execute(
+        update(J).where(J.id == job_id, J.statut == EN_COURS, J.tentatives == attempt).values(**values)
+    ).rowcount == 1
+
+
+def process(db: Session, job_id: int, attempt: int, requeue_busy: bool = True) -> bool:
+    """
+    Rend et enregistre la déclaration du travail ; False si le moteur PDF est
+    saturé (travail remis en attente). Avec requeue_busy=False (rendu dans
+    une requête), le travail passe en échec et PdfEngineBusy est relevée.
+    """
+    try:
+        job = db.get(models.DeclarationJob, job_id)
+        p = json.loads(job.parametres)
+        date_obj = datetime.strptime(p["date"], "%Y-%m-%d").date()
+        if job.type == ARRIVEE:
+            navire, data, decl = prepare_arrivee(db, p["navire_imo"], p["port"], date_obj, p.get("marchandises"))
+        else:
+            navire, data, decl = prepare_depart(db, p["navire_imo"], p["port"], date_obj,
+                                                p.get("destination"), p["securite"], p.get("sante"))
+        title = TITRES[job.type]
+        db.commit()   # pas de transaction ouverte pendant le rendu
+
+        content = pdf_engine.render(title, data)
+
+        navire_updated = record(db, navire, decl, content)
+        db.flush()
+        if not _finish(db, job_id, attempt, statut=TERMINE, declaration_id=decl.id,
+                       erreur=None, termine_le=_now()):
+            db.rollback()   # repris par un autre worker (bail expiré) : sa tentative fait foi
+            return True
+        db.commit()
+        declared(navire, navire_updated)
+        return True
+    except PdfEngineBusy:
+        db.rollback()
+        if requeue_busy:
+            # File de rendu pleine : remis en attente, sans compter de tentative
+            _finish(db, job_id, attempt, statut=EN_ATTENTE, tentatives=attempt - 1)
+            db.commit()
+            return False
+        # Requête refusée (503) : pas de travail laissé en attente, la clé est
+        # libérée pour la nouvelle soumission du client
+        _finish(db, job_id, attempt, statut=ECHEC, erreur="Moteur PDF saturé", termine_le=_now())
+        db.commit()
+        raise
+    except Exception as exc:
+        db.rollback()
+        failed = attempt >= DECLARATION_JOB_ATTEMPTS
+        _finish(db, job_id, attempt, statut=ECHEC if failed else EN_ATTENTE,
+                erreur=f"{type(exc).__name__}: {exc}", termine_le=_now() if failed else None)
+        db.commit()
+        return True
+    finally:
+        with _finished:
+            _finished.notify_all()
+
+
+def wait(db: Session, job_id: int, timeout: float = DECLARATION_WAIT_TIMEOUT) -> models.DeclarationJob:
+    """
+    Attend la fin du travail (terminé ou échec) et le renvoie ; toujours en
+    cours au bout de timeout secondes, il est renvoyé tel quel. Un travail
+    en attente est rendu dans le thread appelant.
+    :raises PdfEngineBusy: moteur PDF saturé, le travail passe en échec
+    """
+    J = models.DeclarationJob
+    deadline = time.monotonic() + timeout
+    while True:
+        db.rollback()   # nouvelle transaction : voit les commits des autres workers
+        job = db.get(J, job_id)
+        if job is None or job.statut in (TERMINE, ECHEC):
+            return job
+        if job.statut == EN_ATTENTE:
+            # Y compris un travail remis en attente par un worker refusé par le moteur
+            claimed = claim(db, job_id)
+            if claimed is not None:
+                process(db, *claimed, requeue_busy=False)
+                continue
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return job
+        # Relecture au plus tard toutes les 0,5 s (workers d'autres processus)
+        with _finished:
+            _finished.wait(min(remaining, 0.5))
+
+
+def purge(db: Session, retention_days: int = DECLARATION_JOB_RETENTION_DAYS):
+    """Supprime les travaux terminés ou en échec depuis plus de retention_days jours."""
+    J = models.DeclarationJob
+    db.execute(delete(J).where(J.statut.in_((TERMINE, ECHEC)),
+                               J.termine_le < _now() - timedelta(days=retention_days)))
+    db.commit()
+
+
+async def status(db: AsyncSession, job_id: int) -> dict | None:
+    """État du travail (dict sérialisable en JSON), None s'il n'existe pas."""
+    J = models.DeclarationJob
+    job = await db.get(J, job_id)
+    if job is None:
+        return None
+    result = {
+        "id": job.id,
+        "type": job.type,
+        "statut": job.statut,
+        "tentatives": job.tentatives,
+        "erreur": job.erreur,
+        "cree_le": job.cree_le.isoformat(),
+        "termine_le": job.termine_le.isoformat() if job.termine_le else None,
+        "declaration_id": job.declaration_id,
+        "pdf": f"/declarations/jobs/{job.id}/pdf" if job.statut == TERMINE else None,
+    }
+    if job.statut == EN_ATTENTE:
+        # Rang dans la file (index statut, id)
+        result["position"] = 1 + await db.scalar(
+            select(func.count()).select_from(J).where(J.statut == EN_ATTENTE, J.id < job.id)
+        )
+    return result
+
+
+class DeclarationWorkers:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._threads = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._next_purge = 0.0
+
+    def start(self, session_factory):
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, args=(session_factory,),
+                             name=f"declarations-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 5):
+        # Un rendu en cours au-delà du délai est repris après DECLARATION_JOB_LEASE
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self, session_factory):
+        while not self._stop.is_set():
+            try:
+                worked = self.run_once(session_factory)
+            except Exception:
+                worked = False   # base indisponible : nouvel essai au prochain cycle
+            if not worked:
+                self._wake.wait(DECLARATION_POLL)
+                self._wake.clear()
+
+    def run_once(self, session_factory) -> bool:
+        """Traite un travail ; False s'il n'y avait rien à faire (ou moteur PDF saturé)."""
+        db = session_factory()
+        try:
+            claimed = claim(db)
+            if claimed is not None:
+                return process(db, *claimed)
+            if time.monotonic() >= self._next_purge:
+                self._next_purge = time.monotonic() + _PURGE_INTERVAL
+                purge(db)
+            return False
+        finally:
+            db.close()
+
+
+declaration_workers = DeclarationWorkers(DECLARATION_WORKERS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Workers de génération des déclarations MarineGab")
+    parser.add_argument("--workers", type=int, default=max(DECLARATION_WORKERS, 1))
+    args = parser.parse_args()
+
+    from app.database import SessionLocal
+
+    workers = DeclarationWorkers(args.workers)
+    workers.start(SessionLocal)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        workers.stop()
+        pdf_engine.shutdown()
+
+
+if __name__ == "__main__":
+    main()
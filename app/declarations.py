@@ -0,0 +1,126 @@
+"""
+Déclarations d'arrivée et autorisations de départ : contenu du PDF et
+enregistrement de la déclaration.
+
+Utilisé par app/declaration_jobs.py, seul chemin d'enregistrement des
+déclarations (routes /jobs comme routes /download) : chaque soumission
+passe par la file et son contrôle d'idempotence.
+"""
+from datetime import date
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+
+from app import models, rollups
+from app.counters import dashboard_counters, NAVIRES_A_QUAI
+from app.occupancy import occupancy_board, STATUT_A_QUAI, STATUT_EN_MER
+from app.storage import document_storage
+from app.tracking import tracking_cache
+
+ARRIVEE = "Arrivée"
+DEPART = "Départ"
+TITRES = {ARRIVEE: "Déclaration d’arrivée", DEPART: "Autorisation de départ"}
+
+
+def prepare_arrivee(db: Session, navire_imo: str, port: str, date_obj: date,
+                    marchandises: str | None = None) -> tuple:
+    """(navire ou None, lignes du PDF, déclaration à enregistrer)."""
+    navire = db.query(models.Navire).options(
+        selectinload(models.Navire.marchandises)
+    ).filter(models.Navire.imo == navire_imo).first()
+    marchandises_list = navire.marchandises if navire else []
+
+    data = [["Champ", "Valeur"]]
+    data.append(["Nom du navire", navire.nom if navire else navire_imo])
+    data.append(["Port d’arrivée", port])
+    data.append(["Date d’arrivée", date_obj.strftime("%Y-%m-%d")])
+
+    marchandises_text = None
+    if marchandises_list:
+        marchandises_text = "; ".join([f"{m.nom} ({m.poids}t)" for m in marchandises_list])
+        for m in marchandises_list:
+            data.append([f"Marchandise ({m.tracking_number})", f"{m.nom} — {m.poids}t / {m.volume}m³"])
+    elif marchandises:
+        marchandises_text = marchandises
+        data.append(["Marchandises (manuel)", marchandises])
+
+    decl = models.Declaration(
+        type=ARRIVEE,
+        navire_nom=navire.nom if navire else navire_imo,
+        navire_imo=navire_imo,
+        port=port,
+        date=date_obj,
+        marchandises=marchandises_text,
+    )
+    return navire, data, decl
+
+
+def prepare_depart(db: Session, navire_imo: str, port: str, date_obj: date,
+                   destination: str | None, securite: str, sante: str | None) -> tuple:
+    """(navire ou None, lignes du PDF, déclaration à enregistrer)."""
+    navire = db.query(models.Navire).filter(models.Navire.imo == navire_imo).first()
+
+    data = [["Champ", "Valeur"]]
+    data.append(["Nom du navire", navire.nom if navire else navire_imo])
+    data.append(["Port de départ", port])
+    data.append(["Date de départ", date_obj.strftime("%Y-%m-%d")])
+    if destination:
+        data.append(["Destination", destination])
+    data.append(["Niveau de sécurité", securite])
+    if sante:
+        data.append(["Déclaration de santé", sante])
+
+    decl = models.Declaration(
+        type=DEPART,
+        navire_nom=navire.nom if navire else navire_imo,
+        navire_imo=navire_imo,
+        port=port,
+        date=date_obj,
+        destination=destination,
+        securite=securite,
+        sante=sante,
+    )
+    return navire, data, decl
+
+
+def apply_declaration(db: Session, navire: models.Navire, decl: models.Declaration) -> bool:
+    """
+    Statut du navire d'après sa déclaration : à quai au port d'arrivée, en mer
+    après un départ. Sans effet si une déclaration plus récente existe déjà.
+    """
+    latest = db.query(func.max(models.Declaration.date)).filter(
+        models.Declaration.navire_imo == navire.imo
+    ).scalar()
+    if latest and decl.date < latest:
+        return False
+    statut = STATUT_A_QUAI if decl.type == ARRIVEE else STATUT_EN_MER
+    rollups.move_navire(db, navire.statut_actuel, statut)
+    navire.statut_actuel = statut
+    navire.dernier_port = decl.port
+    if decl.destination:
+        navire.prochaine_destination = decl.destination
+    return True
+
+
+def record(db: Session, navire: models.Navire | None, decl: models.Declaration, content: bytes) -> bool:
+    """
+    Archive le PDF (stockage dédupliqué par contenu) et ajoute la déclaration
+    à la session, sans commit. Renvoie True si le statut du navire a changé.
+    """
+    decl.fichier_pdf = document_storage.put(content)
+    navire_updated = navire is not None and apply_declaration(db, navire, decl)
+    db.add(decl)
+    return navire_updated
+
+
+def declared(navire: models.Navire | None, navire_updated: bool):
+    # Après commit : suivi des marchandises, compteurs et occupation des ports
+    tracking_cache.clear()
+    if navire_updated:
+        dashboard_counters.invalidate(NAVIRES_A_QUAI)
+        occupancy_board.set_navire(navire.id, navire.nom, navire.imo, navire.statut_actuel, navire.dernier_port)
+
+
+def declaration_filename(decl: models.Declaration) -> str:
+    prefix = "declaration_arrivee" if decl.type == ARRIVEE else "autorisation_depart"
+    return f"{prefix}_{decl.id}.pdf"
@@ -0,0 +1,32 @@
+from app import models
+
+# Titres des fiches (participent à la clé du cache PDF)
+INSPECTION_TITLE = "MarineGab — Fiche inspection"
+
+
+def inspection_fiche_data(inspection: models.Inspection) -> list:
+    """
+    Lignes [label, valeur] de la fiche inspection (téléchargement unitaire et export ZIP).
+    """
+    return [
+        ["Date", inspection.date],
+        ["Navire IMO", inspection.navire_imo],
+        ["Port", inspection.port_nom],
+        ["Inspecteur", inspection.inspecteur],
+        ["Rapport", inspection.rapport or "N/A"],
+        ["Certificat sécurité", inspection.certificat_securite],
+        ["Certificat de classe", inspection.certificat_classe],
+        ["Certificat pollution", inspection.certificat_pollution],
+        ["Brevets marins", inspection.brevets_marins],
+        ["Certificats médicaux", inspection.certificats_medicaux],
+        ["Journal de bord", inspection.journal_bord],
+        ["Papiers douaniers", inspection.papiers_douaniers],
+        ["Gilets & combinaisons", inspection.gilets_combinaisons],
+        ["Radeaux & canots", inspection.radeaux_canots],
+        ["Extincteurs", inspection.extincteurs],
+        ["Alarmes & détecteurs", inspection.alarmes_detecteurs],
+        ["Système anti-incendie", inspection.systeme_incendie],
+        ["Normes antipollution", inspection.normes_antipollution],
+        ["Conditions de vie", inspection.conditions_vie],
+        ["Observations", inspection.observations or "Aucune"],
+    ]
@@ -0,0 +1,264 @@
+"""
+Position des ports : /ports/proches (ports les plus proches d'un point ou
+d'un port) et /ports/distances (matrice de distances port à port).
+
+Ports.coordonnees reste la saisie libre ; elle est lue ici en latitude /
+longitude (colonnes ports.latitude / ports.longitude) à chaque ajout ou
+modification de port. Formats acceptés :
+    0.3924, 9.4536          -0.7193 8.7815          0,3924 ; 9,4536
+    0°23'33"N 9°27'13"E     N 0°23.5' E 9°27'       9.45E 0.39N (O = ouest)
+Avec des lettres d'hémisphère, il en faut une par axe (N/S et E/W/O).
+
+Les positions sont tenues en mémoire dans des tableaux NumPy contigus
+(identifiant, latitude, longitude, vecteur unitaire x, y, z), mis à jour en
+place par les routes d'écriture des ports : pas de reconstruction complète
+à chaque modification. Une requête « k plus proches » est un seul produit
+matrice × vecteur (le plus grand produit scalaire est le plus proche sur la
+sphère), np.argpartition isole les k premiers et la haversine n'est
+calculée que pour eux : quelques dizaines de microsecondes pour des
+milliers de ports, sans arbre ni grille à maintenir.
+
+L'index est propre au processus : resynchronisé depuis la base toutes les
+PORT_INDEX_RESYNC secondes (autres workers, écritures hors application).
+"""
+import asyncio
+import os
+import re
+import threading
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models
+
+# Configuration (surchargeable par variables d'environnement)
+PORT_INDEX_RESYNC = float(os.getenv("PORT_INDEX_RESYNC", "300"))
+NEAREST_DEFAULT = 5
+NEAREST_MAX = 100
+MATRIX_MAX_PORTS = 500
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_NM = 1.852
+UNITES = {"km": 1.0, "nm": 1 / KM_PER_NM}
+
+# -------------------------
+# Lecture des coordonnées saisies
+# -------------------------
+
+# Degrés, minutes ('), secondes (" ou '') ; la partie décimale est sur le dernier terme
+_DMS = (
+    r"([-+]?\d+(?:\.\d+)?)\s*°?\s*"
+    r"(?:(\d+(?:\.\d+)?)\s*['′]\s*)?"
+    r"(?:(\d+(?:\.\d+)?)\s*(?:\"|″|'')\s*)?"
+)
+_PREFIX = re.compile(r"\b([NSEWO])\s*" + _DMS)
+_SUFFIX = re.compile(_DMS + r"([NSEWO](?![A-Z]))?")
+_WEST_SOUTH = ("S", "W", "O")
+_AXES = {"N": "lat", "S": "lat", "E": "lon", "W": "lon", "O": "lon"}
+
+
+def parse_coordinates(text: str | None) -> tuple | None:
+    """(latitude, longitude) en degrés décimaux, None si la saisie n'est pas lisible."""
+    s = (text or "").strip().upper()
+    if not s:
+        return None
+    if ";" in s:
+        s = s.replace(",", ".")   # virgule décimale : « 0,39 ; 9,45 »
+    prefixed = s[0] in "NSEWO"
+    parts = []
+    for m in (_PREFIX if prefixed else _SUFFIX).finditer(s):
+        if prefixed:
+            hemisphere, degrees, minutes, seconds = m.groups()
+        else:
+            degrees, minutes, seconds, hemisphere = m.groups()
+        value = abs(float(degrees)) + float(minutes or 0) / 60 + float(seconds or 0) / 3600
+        if degrees.startswith("-") or hemisphere in _WEST_SOUTH:
+            value = -value
+        parts.append((value, hemisphere))
+    if len(parts) != 2:
+        return None
+
+    (lat, h1), (lon, h2) = parts
+    if h1 or h2:
+        # Lettres d'hémisphère : une N/S et une E/W/O, sinon saisie ambiguë
+        if {_AXES.get(h1), _AXES.get(h2)} != {"lat", "lon"}:
+            return None
+        if _AXES[h1] == "lon":
+            (lat, h1), (lon, h2) = (lon, h2), (lat, h1)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def apply_coordinates(port: models.Port):
+    """Renseigne port.latitude / port.longitude depuis port.coordonnees."""
+    position = parse_coordinates(port.coordonnees)
+    port.latitude, port.longitude = position if position else (None, None)
+
+
+# -------------------------
+# Distances
+# -------------------------
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distance orthodromique en km ; degrés, scalaires ou tableaux (diffusion NumPy)."""
+    lat1, lon1, lat2, lon2 = (np.radians(v) for v in (lat1, lon1, lat2, lon2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+
+def _unit_vector(latitude: float, longitude: float) -> np.ndarray:
+    lat, lon = np.radians(latitude), np.radians(longitude)
+    return np.array((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+class PortIndex:
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._size = 0
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._lat = np.empty(capacity)   # radians
+        self._lon = np.empty(capacity)   # radians
+        self._xyz = np.empty((capacity, 3))   # vecteur unitaire
+        self._noms = [None] * capacity
+        self._slots = {}                 # id du port -> position dans les tableaux
+        self.loaded = False
+
+    # -------------------------
+    # Mises à jour (appelées après commit)
+    # -------------------------
+
+    def load(self, db: Session):
+        """(Re)construit l'index depuis ports.latitude / ports.longitude."""
+        P = models.Port
+        rows = db.execute(
+            select(P.id, P.nom, P.latitude, P.longitude)
+            .where(P.latitude.is_not(None), P.longitude.is_not(None))
+        ).all()
+        with self._lock:
+            self._size = 0
+            self._slots = {}
+            for port_id, nom, lat, lon in rows:
+                self._set(port_id, nom, lat, lon)
+            self.loaded = True
+
+    def set_port(self, port_id: int, nom: str, latitude: float | None, longitude: float | None):
+        with self._lock:
+            if latitude is None or longitude is None:
+                self._remove(port_id)
+            else:
+                self._set(port_id, nom, latitude, longitude)
+
+    def remove_port(self, port_id: int):
+        with self._lock:
+            self._remove(port_id)
+
+    def _set(self, port_id, nom, lat, lon):
+        slot = self._slots.get(port_id)
+        if slot is None:
+            if self._size == len(self._ids):
+                self._grow()
+            slot = self._slots[port_id] = self._size
+            self._size += 1
+        self._ids[slot], self._lat[slot], self._lon[slot] = port_id, np.radians(lat), np.radians(lon)
+        self._xyz[slot] = _unit_vector(lat, lon)
+        self._noms[slot] = nom
+
+    def _remove(self, port_id):
+        # Le dernier élément prend la place libérée : les tableaux restent contigus
+        slot = self._slots.pop(port_id, None)
+        if slot is None:
+            return
+        last = self._size - 1
+        if slot != last:
+            for array in (self._ids, self._lat, self._lon, self._xyz):
+                array[slot] = array[last]
+            self._noms[slot] = self._noms[last]
+            self._slots[int(self._ids[slot])] = slot
+        self._noms[last] = None
+        self._size = last
+
+    def _grow(self):
+        capacity = 2 * len(self._ids)
+        self._ids, self._lat, self._lon = (
+            np.resize(array, capacity) for array in (self._ids, self._lat, self._lon)
+        )
+        self._xyz = np.resize(self._xyz, (capacity, 3))
+        self._noms.extend([None] * (capacity - len(self._noms)))
+
+    # -------------------------
+    # Lecture
+    # -------------------------
+
+    def __len__(self):
+        return self._size
+
+    def position(self, port_id: int) -> tuple | None:
+        """(latitude, longitude) en degrés d'un port indexé."""
+        with self._lock:
+            slot = self._slots.get(port_id)
+            if slot is None:
+                return None
+            return float(np.degrees(self._lat[slot])), float(np.degrees(self._lon[slot]))
+
+    def nearest(self, latitude: float, longitude: float, k: int = NEAREST_DEFAULT,
+                exclude: int | None = None) -> list:
+        """Les k ports les plus proches : [(id, nom, distance en km)], du plus proche au plus lointain."""
+        with self._lock:
+            n = self._size
+            # Éloignement croissant = produit scalaire décroissant
+            far = -(self._xyz[:n] @ _unit_vector(latitude, longitude))
+            if exclude is not None and exclude in self._slots:
+                far[self._slots[exclude]] = np.inf
+                n -= 1
+            k = min(k, n)
+            if k <= 0:
+                return []
+            # Tri partiel : seuls les k candidats retenus sont mesurés et triés
+            best = np.argpartition(far, k - 1)[:k] if k < len(far) else np.arange(len(far))
+            distances = haversine_km(latitude, longitude,
+                                     np.degrees(self._lat[best]), np.degrees(self._lon[best]))
+            order = np.argsort(distances, kind="stable")
+            return [
+                (int(self._ids[best[i]]), self._noms[best[i]], float(distances[i]))
+                for i in order
+            ]
+
+    def distance_matrix(self, port_ids: list | None = None) -> tuple:
+        """
+        (ports [(id, nom)], matrice n × n des distances en km, ids sans position).
+        Sans liste d'ids : tous les ports indexés.
+        """
+        with self._lock:
+            if port_ids is None:
+                slots = np.arange(self._size)
+                missing = []
+            else:
+                slots = np.fromiter((self._slots[i] for i in port_ids if i in self._slots), dtype=np.intp)
+                missing = [i for i in port_ids if i not in self._slots]
+            lat, lon = np.degrees(self._lat[slots]), np.degrees(self._lon[slots])
+            ports = [(int(self._ids[s]), self._noms[s]) for s in slots]
+        return ports, haversine_km(lat[:, None], lon[:, None], lat[None, :], lon[None, :]), missing
+
+    # -------------------------
+    # Resynchronisation
+    # -------------------------
+
+    async def resync_forever(self, session_factory):
+        while True:
+            await asyncio.sleep(PORT_INDEX_RESYNC)
+            try:
+                await asyncio.to_thread(self.reload, session_factory)
+            except Exception:
+                pass   # base indisponible : nouvel essai au prochain cycle
+
+    def reload(self, session_factory):
+        db = session_factory()
+        try:
+            self.load(db)
+        finally:
+            db.close()
+
+
+port_index = PortIndex()
@@ -1,47 +1,118 @@
-from fastapi import FastAPI, Request, Depends, Form
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
+from fastapi import FastAPI, Request, Depends, Form, File, UploadFile
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
+from contextlib import asynccontextmanager
+from markupsafe import escape
+import asyncio
+import json
 import uuid
-import os
 from datetime import date, datetime
+from urllib.parse import quote
+
+from app import compliance, models, rollups
+from app.database import get_db, get_async_db, async_engine, run_migrations, SessionLocal
+from app.pdf_cache import pdf_cache
+from app.pdf_utils import get_renderer
+from app.fiches import INSPECTION_TITLE, inspection_fiche_data
+from app.zip_export import stream_inspections_zip
+from app.reports import render_cargo_manifest
+from app.search import search_all, SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT
+from app.tracking import track, tracking_cache
+from app.occupancy import occupancy_board
+from app.declarations import ARRIVEE, DEPART, declaration_filename
+from app.declaration_jobs import (
+    declaration_workers, submit as submit_declaration, status as declaration_job_status,
+    wait as wait_declaration, IdempotencyConflict, TERMINE, ECHEC,
+)
+from app.geo import apply_coordinates, port_index, NEAREST_DEFAULT, NEAREST_MAX, MATRIX_MAX_PORTS, UNITES
+from app.table_export import EXPORTS, FORMATS as EXPORT_FORMATS, build_export_query, stream_table
+from app.bulk_import import detect_format, import_marchandises, upsert_navires, FORMATS
+from app.storage import load_declaration_pdf
+from app.pagination import paginate, parse_date
+from app.counters import (
+    dashboard_counters, home_counters, NAVIRES_A_QUAI, INSPECTIONS_MOIS, MARCHANDISES_TOTAL,
+)
+from app.pdf_engine import pdf_engine, PdfEngineBusy, PdfEngineTimeout, PDF_RETRY_AFTER
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ➜ Styles et logo PDF préparés une seule fois
+    get_renderer()
+    # ➜ Occupation des ports en mémoire, resynchronisée périodiquement
+    occupancy_board.attach(asyncio.get_running_loop())
+    await asyncio.to_thread(occupancy_board.reload, SessionLocal)
+    resync = asyncio.create_task(occupancy_board.resync_forever(SessionLocal))
+    # ➜ Index des positions des ports (ports proches, distances)
+    await asyncio.to_thread(port_index.reload, SessionLocal)
+    resync_ports = asyncio.create_task(port_index.resync_forever(SessionLocal))
+    # ➜ Workers de génération des déclarations (reprennent la file laissée en base)
+    declaration_workers.start(SessionLocal)
+    yield
+    resync.cancel()
+    resync_ports.cancel()
+    await asyncio.to_thread(declaration_workers.stop)
+    # ➜ Arrêt du pool de rendu PDF et des connexions asynchrones
+    pdf_engine.shutdown()
+    await async_engine.dispose()
 
-from app import models
-from app.database import engine, get_db
-from app.pdf_utils import build_pdf
 
 # Initialisation
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 templates = Jinja2Templates(directory="app/templates")
 
 # ➜ Monter les fichiers statiques
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
-# ➜ Création des tables
-models.Base.metadata.create_all(bind=engine)
+# ➜ Schéma de la base (migrations Alembic)
+run_migrations()
 
-from datetime import date
 
-@app.get("/", response_class=HTMLResponse)
-def home(request: Request, db: Session = Depends(get_db)):
-    # Navires à quai
-    navires_a_quai = db.query(models.Navire).filter(models.Navire.statut_actuel == "à quai").count()
+@app.exception_handler(PdfEngineBusy)
+def pdf_engine_busy_handler(request: Request, exc: PdfEngineBusy):
+    return HTMLResponse(
+        content="<h3>Trop de documents en cours de génération, réessayez dans quelques secondes.</h3>",
+        status_code=503,
+        headers={"Retry-After": str(PDF_RETRY_AFTER)},
+    )
+
+@app.exception_handler(IdempotencyConflict)
+def idempotency_conflict_handler(request: Request, exc: IdempotencyConflict):
+    message = "Clé d'idempotence déjà utilisée pour une autre déclaration"
+    if wants_json(request, None):
+        return JSONResponse({"detail": message}, status_code=422)
+    return HTMLResponse(content=f"<h3>{message}.</h3>", status_code=422)
 
-    # Inspections du mois en cours (du 1er au jour courant)
-    today = date.today()
-    debut_mois = date(today.year, today.month, 1)
-    inspections_mois = db.query(models.Inspection).filter(models.Inspection.date >= debut_mois).count()
+@app.exception_handler(PdfEngineTimeout)
+def pdf_engine_timeout_handler(request: Request, exc: PdfEngineTimeout):
+    return HTMLResponse(content="<h3>La génération du document a expiré.</h3>", status_code=504)
 
-    # Marchandises totales
-    marchandises_total = db.query(models.Marchandise).count()
 
+def wants_json(request: Request, format: str | None) -> bool:
+    # ?format=json ou Accept: application/json
+    return format == "json" or (
+        format is None and "application/json" in request.headers.get("accept", "")
+    )
+
+def pdf_response(content: bytes, filename: str) -> Response:
+    return Response(
+        content=content,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+from datetime import date
+
+@app.get("/", response_class=HTMLResponse)
+def home(request: Request, db: Session = Depends(get_db)):
+    # Navires à quai, inspections du mois, marchandises totales (compteurs en cache)
     return templates.TemplateResponse("index.html", {
         "request": request,
-        "navires_a_quai": navires_a_quai,
-        "inspections_mois": inspections_mois,
-        "marchandises_total": marchandises_total
+        **home_counters(db),
     })
 
 # -------------------------
@@ -49,9 +120,32 @@ def home(request: Request, db: Session = Depends(get_db)):
 # -------------------------
 
 @app.get("/navires", response_class=HTMLResponse)
-def list_navires(request: Request, db: Session = Depends(get_db)):
-    navires = db.query(models.Navire).all()
-    return templates.TemplateResponse("navires.html", {"request": request, "navires": navires})
+async def list_navires(
+    request: Request,
+    statut: str | None = None,
+    pavillon: str | None = None,
+    sort: str | None = None,
+    order: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    query = select(models.Navire)
+    if statut:
+        query = query.where(models.Navire.statut_actuel == statut)
+    if pavillon:
+        query = query.where(models.Navire.pavillon == pavillon)
+    page = await paginate(
+        request, db, query,
+        {"nom": models.Navire.nom, "imo": models.Navire.imo, "id": models.Navire.id},
+        models.Navire.id, "nom", sort, order, cursor, limit,
+    )
+    return templates.TemplateResponse("navires.html", {
+        "request": request,
+        "navires": page.items,
+        "page": page,
+        "filtres": {"statut": statut or "", "pavillon": pavillon or ""},
+    })
 
 @app.post("/navires/add")
 def add_navire(
@@ -80,17 +174,43 @@ def add_navire(
         autres=autres,
     )
     db.add(navire)
+    rollups.count_navire(db, statut_actuel, +1)
     db.commit()
+    dashboard_counters.invalidate(NAVIRES_A_QUAI)
+    occupancy_board.set_navire(navire.id, nom, imo, statut_actuel, dernier_port)
     return RedirectResponse(url="/navires", status_code=303)
 
 @app.post("/navires/{navire_id}/delete")
 def delete_navire(navire_id: int, db: Session = Depends(get_db)):
     navire = db.query(models.Navire).filter(models.Navire.id == navire_id).first()
     if navire:
+        rollups.count_navire(db, navire.statut_actuel, -1)
         db.delete(navire)
         db.commit()
+        # Les marchandises du navire partent avec lui (ON DELETE CASCADE)
+        dashboard_counters.invalidate(NAVIRES_A_QUAI, MARCHANDISES_TOTAL)
+        tracking_cache.clear()
+        occupancy_board.remove_navire(navire_id)
     return RedirectResponse(url="/navires", status_code=303)
 
+@app.post("/navires/import")
+def import_navires_upload(
+    fichier: UploadFile = File(...),
+    format: str = Form(None),
+    db: Session = Depends(get_db),
+):
+    # Synchronisation du registre : upsert par IMO, navires inchangés ignorés
+    fmt = format or detect_format(fichier.filename)
+    if fmt not in FORMATS:
+        return HTMLResponse(
+            content="<h3>Erreur : format de fichier non reconnu (CSV ou JSONL).</h3>",
+            status_code=400
+        )
+    report = upsert_navires(db, fichier.file, fmt)
+    tracking_cache.clear()
+    occupancy_board.load(db)
+    return report.as_dict()
+
 @app.get("/navires/{navire_id}/edit", response_class=HTMLResponse)
 def edit_navire(navire_id: int, request: Request, db: Session = Depends(get_db)):
     navire = db.query(models.Navire).filter(models.Navire.id == navire_id).first()
@@ -115,6 +235,7 @@ def update_navire(
 ):
     navire = db.query(models.Navire).filter(models.Navire.id == navire_id).first()
     if navire:
+        rollups.move_navire(db, navire.statut_actuel, statut_actuel)
         navire.nom = nom
         navire.imo = imo
         navire.pavillon = pavillon
@@ -126,11 +247,25 @@ def update_navire(
         navire.statut_actuel = statut_actuel
         navire.autres = autres
         db.commit()
+        dashboard_counters.invalidate(NAVIRES_A_QUAI)
+        tracking_cache.clear()
+        occupancy_board.set_navire(navire.id, nom, imo, statut_actuel, dernier_port)
     return RedirectResponse(url="/navires", status_code=303)
 
+@app.get("/navires/chargement", response_class=HTMLResponse)
+async def fleet_load(request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Chargement de la flotte : une ligne d'agrégat par navire
+    flotte = await db.run_sync(rollups.chargement_flotte)
+    return templates.TemplateResponse("navires_chargement.html", {"request": request, "flotte": flotte})
+
 @app.get("/navires/{navire_id}", response_class=HTMLResponse)
-def navire_detail(navire_id: int, request: Request, db: Session = Depends(get_db)):
-    navire = db.query(models.Navire).filter(models.Navire.id == navire_id).first()
+async def navire_detail(navire_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Inspections et déclarations chargées en une requête chacune (selectin)
+    navire = await db.scalar(select(models.Navire).options(
+        selectinload(models.Navire.inspections),
+        selectinload(models.Navire.declarations),
+        selectinload(models.Navire.chargement),
+    ).where(models.Navire.id == navire_id))
     if not navire:
         return HTMLResponse(content="<h1>Navire introuvable</h1>", status_code=404)
     return templates.TemplateResponse("navire_detail.html", {"request": request, "navire": navire})
@@ -141,8 +276,6 @@ def download_navire(navire_id: int, db: Session = Depends(get_db)):
     if not navire:
         return HTMLResponse(content="<h1>Navire introuvable</h1>", status_code=404)
 
-    file_path = f"navire_{navire.id}.pdf"
-
     # 🔹 Inclure tous les champs du formulaire
     data = [
         ["Nom", navire.nom],
@@ -157,19 +290,135 @@ def download_navire(navire_id: int, db: Session = Depends(get_db)):
         ["Autres informations", navire.autres or "N/A"],
     ]
 
-    # Génération PDF via utilitaire
-    build_pdf(file_path, "MarineGab — Fiche navire", data)
+    # Génération PDF via utilitaire (servie depuis le cache si la fiche n'a pas changé)
+    content = pdf_cache.get_or_render("MarineGab — Fiche navire", data, pdf_engine.render)
 
-    return FileResponse(path=file_path, filename=file_path, media_type="application/pdf")
+    return pdf_response(content, f"navire_{navire.id}.pdf")
+
+@app.get("/navires/{navire_id}/manifeste")
+def download_cargo_manifest(navire_id: int):
+    # Rendu multipage exécuté (et alimenté depuis la base) dans le pool PDF
+    content = pdf_engine.run(render_cargo_manifest, navire_id)
+    if content is None:
+        return HTMLResponse(content="<h1>Navire introuvable</h1>", status_code=404)
+    return pdf_response(content, f"manifeste_cargaison_navire_{navire_id}.pdf")
 
 # -------------------------
 # PORTS
 # -------------------------
 
 @app.get("/ports", response_class=HTMLResponse)
-def list_ports(request: Request, db: Session = Depends(get_db)):
-    ports = db.query(models.Port).all()
-    return templates.TemplateResponse("ports.html", {"request": request, "ports": ports})
+async def list_ports(
+    request: Request,
+    pays: str | None = None,
+    type: str | None = None,
+    sort: str | None = None,
+    order: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    query = select(models.Port)
+    if pays:
+        query = query.where(models.Port.pays == pays)
+    if type:
+        query = query.where(models.Port.type == type)
+    page = await paginate(
+        request, db, query,
+        {"nom": models.Port.nom, "id": models.Port.id},
+        models.Port.id, "nom", sort, order, cursor, limit,
+    )
+    return templates.TemplateResponse("ports.html", {
+        "request": request,
+        "ports": page.items,
+        "page": page,
+        "filtres": {"pays": pays or "", "type": type or ""},
+    })
+
+@app.get("/ports/occupation", response_class=HTMLResponse)
+async def ports_occupation(request: Request, db: AsyncSession = Depends(get_async_db)):
+    # État initial rendu côté serveur, mises à jour par le flux SSE
+    if not occupancy_board.loaded:
+        await db.run_sync(occupancy_board.load)
+    version, payload = occupancy_board.snapshot()
+    return templates.TemplateResponse("ports_occupation.html", {
+        "request": request,
+        "occupation": json.loads(payload),
+    })
+
+@app.get("/ports/occupation/flux")
+async def ports_occupation_stream(db: AsyncSession = Depends(get_async_db)):
+    # Server-Sent Events : une diffusion par changement, pour tous les navigateurs
+    if not occupancy_board.loaded:
+        await db.run_sync(occupancy_board.load)
+    return StreamingResponse(
+        occupancy_board.events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/ports/proches")
+async def nearest_ports(
+    lat: float | None = None,
+    lon: float | None = None,
+    port_id: int | None = None,
+    k: int = NEAREST_DEFAULT,
+    unite: str = "km",
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Ports les plus proches d'une position (lat, lon) ou d'un port (port_id, exclu du résultat)
+    if not port_index.loaded:
+        await db.run_sync(port_index.load)
+    if unite not in UNITES:
+        return JSONResponse({"detail": "Unité inconnue (km ou nm)"}, status_code=400)
+    if port_id is not None:
+        position = port_index.position(port_id)
+        if position is None:
+            return JSONResponse({"detail": "Port introuvable ou sans coordonnées"}, status_code=404)
+        lat, lon = position
+    elif lat is None or lon is None:
+        return JSONResponse({"detail": "Indiquer lat et lon, ou port_id"}, status_code=400)
+    elif not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return JSONResponse({"detail": "Position hors limites"}, status_code=400)
+
+    facteur = UNITES[unite]
+    proches = port_index.nearest(lat, lon, max(1, min(k, NEAREST_MAX)), exclude=port_id)
+    return {
+        "position": {"lat": lat, "lon": lon},
+        "unite": unite,
+        "ports": [
+            {"id": pid, "nom": nom, "distance": round(distance * facteur, 1)}
+            for pid, nom, distance in proches
+        ],
+    }
+
+@app.get("/ports/distances")
+async def ports_distances(
+    ids: str | None = None,
+    unite: str = "km",
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Matrice des distances entre les ports demandés (ids=1,2,3), ou tous les ports positionnés
+    if not port_index.loaded:
+        await db.run_sync(port_index.load)
+    if unite not in UNITES:
+        return JSONResponse({"detail": "Unité inconnue (km ou nm)"}, status_code=400)
+    port_ids = None
+    if ids:
+        try:
+            port_ids = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+        except ValueError:
+            return JSONResponse({"detail": "Liste d'identifiants invalide"}, status_code=400)
+    if len(port_ids if port_ids is not None else port_index) > MATRIX_MAX_PORTS:
+        return JSONResponse({"detail": f"Au plus {MATRIX_MAX_PORTS} ports par matrice"}, status_code=400)
+
+    ports, distances, sans_position = port_index.distance_matrix(port_ids)
+    return {
+        "unite": unite,
+        "ports": [{"id": pid, "nom": nom} for pid, nom in ports],
+        "distances": (distances * UNITES[unite]).round(1).tolist(),
+        "sans_coordonnees": sans_position,
+    }
 
 @app.post("/ports/add")
 def add_port(
@@ -191,8 +440,11 @@ def add_port(
         coordonnees=coordonnees,
         responsable=responsable,
     )
+    apply_coordinates(port)
     db.add(port)
     db.commit()
+    occupancy_board.set_port(nom, capacite)
+    port_index.set_port(port.id, nom, port.latitude, port.longitude)
     return RedirectResponse(url="/ports", status_code=303)
 
 @app.get("/ports/{port_id}/edit", response_class=HTMLResponse)
@@ -216,6 +468,7 @@ def update_port(
 ):
     port = db.query(models.Port).filter(models.Port.id == port_id).first()
     if port:
+        ancien_nom = port.nom
         port.nom = nom
         port.pays = pays
         port.ville = ville
@@ -223,7 +476,10 @@ def update_port(
         port.type = type
         port.coordonnees = coordonnees
         port.responsable = responsable
+        apply_coordinates(port)
         db.commit()
+        occupancy_board.set_port(nom, capacite, ancien_nom)
+        port_index.set_port(port.id, nom, port.latitude, port.longitude)
     return RedirectResponse(url="/ports", status_code=303)
 
 @app.post("/ports/{port_id}/delete")
@@ -232,6 +488,8 @@ def delete_port(port_id: int, db: Session = Depends(get_db)):
     if port:
         db.delete(port)
         db.commit()
+        occupancy_board.remove_port(port.nom)
+        port_index.remove_port(port_id)
     return RedirectResponse(url="/ports", status_code=303)
 
 # -------------------------
@@ -239,14 +497,73 @@ def delete_port(port_id: int, db: Session = Depends(get_db)):
 # MARCHANDISES
 # -------------------------
 
+def capacity_error(charge: float, tonnage: float) -> HTMLResponse:
+    return HTMLResponse(
+        content=f"<h3>Erreur : capacité du navire dépassée ({charge:g} t chargées pour un tonnage de {tonnage:g} t).</h3>",
+        status_code=400
+    )
+
 @app.get("/marchandises", response_class=HTMLResponse)
-def list_marchandises(request: Request, db: Session = Depends(get_db)):
-    marchandises = db.query(models.Marchandise).all()
-    navires = db.query(models.Navire).all()
-    return templates.TemplateResponse(
-        "marchandises.html",
-        {"request": request, "marchandises": marchandises, "navires": navires}
+async def list_marchandises(
+    request: Request,
+    navire_id: str | None = None,
+    type: str | None = None,
+    sort: str | None = None,
+    order: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    query = select(models.Marchandise).options(joinedload(models.Marchandise.navire))
+    if navire_id and navire_id.isdigit():
+        query = query.where(models.Marchandise.navire_id == int(navire_id))
+    if type:
+        query = query.where(models.Marchandise.type == type)
+    page = await paginate(
+        request, db, query,
+        {
+            "id": models.Marchandise.id,
+            "nom": models.Marchandise.nom,
+            "tracking": models.Marchandise.tracking_number,
+            "poids": models.Marchandise.poids,
+        },
+        models.Marchandise.id, "id", sort, order, cursor, limit,
     )
+    # Listes de sélection du formulaire : seules les colonnes affichées
+    N = models.Navire
+    navires = (await db.execute(select(N.id, N.nom, N.imo))).all()
+    return templates.TemplateResponse("marchandises.html", {
+        "request": request,
+        "marchandises": page.items,
+        "navires": navires,
+        "page": page,
+        "filtres": {"navire_id": navire_id or "", "type": type or ""},
+    })
+
+@app.get("/marchandises/track", response_class=HTMLResponse)
+def track_form(numero: str = ""):
+    # Formulaire de la page marchandises : le numéro passe dans le chemin
+    numero = numero.strip()
+    if not numero:
+        return RedirectResponse(url="/marchandises", status_code=303)
+    return RedirectResponse(url=f"/marchandises/track/{quote(numero)}", status_code=303)
+
+@app.get("/marchandises/track/{tracking_number:path}", response_class=HTMLResponse)
+async def track_marchandise(
+    tracking_number: str,
+    request: Request,
+    format: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    # JSON pour les clients (?format=json ou Accept: application/json), HTML sinon
+    result = await track(db, tracking_number)
+    if wants_json(request, format):
+        if result is None:
+            return JSONResponse({"detail": "Numéro de tracking inconnu"}, status_code=404)
+        return JSONResponse(result)
+    if result is None:
+        return HTMLResponse(content="<h1>Numéro de tracking inconnu</h1>", status_code=404)
+    return templates.TemplateResponse("tracking.html", {"request": request, "suivi": result})
 
 @app.post("/marchandises/add")
 def add_marchandise(
@@ -265,6 +582,9 @@ def add_marchandise(
             content=f"<h3>Erreur : le numéro de tracking {tracking_number} existe déjà.</h3>",
             status_code=400
         )
+    navire = db.query(models.Navire.id, models.Navire.tonnage).filter(models.Navire.id == navire_id).first()
+    if not navire:
+        return HTMLResponse(content="<h3>Erreur : navire introuvable.</h3>", status_code=400)
 
     marchandise = models.Marchandise(
         nom=nom,
@@ -275,9 +595,33 @@ def add_marchandise(
         navire_id=navire_id,
     )
     db.add(marchandise)
+    # Totaux du navire mis à jour dans la transaction, puis contrôle de capacité
+    charge = rollups.count_cargo(db, navire_id, poids, volume, +1)
+    if rollups.over_capacity(charge, navire.tonnage):
+        db.rollback()
+        return capacity_error(charge, navire.tonnage)
     db.commit()
+    dashboard_counters.invalidate(MARCHANDISES_TOTAL)
+    tracking_cache.invalidate(tracking_number)
     return RedirectResponse(url="/marchandises", status_code=303)
 
+@app.post("/marchandises/import")
+def import_marchandises_upload(
+    fichier: UploadFile = File(...),
+    format: str = Form(None),
+    db: Session = Depends(get_db),
+):
+    # Manifeste CSV / JSONL lu en flux, inséré par paquets ; rapport ligne à ligne
+    fmt = format or detect_format(fichier.filename)
+    if fmt not in FORMATS:
+        return HTMLResponse(
+            content="<h3>Erreur : format de fichier non reconnu (CSV ou JSONL).</h3>",
+            status_code=400
+        )
+    report = import_marchandises(db, fichier.file, fmt)
+    tracking_cache.clear()
+    return report.as_dict()
+
 @app.get("/marchandises/{marchandise_id}/edit", response_class=HTMLResponse)
 def edit_marchandise(marchandise_id: int, request: Request, db: Session = Depends(get_db)):
     marchandise = db.query(models.Marchandise).filter(models.Marchandise.id == marchandise_id).first()
@@ -312,7 +656,19 @@ def update_marchandise(
                 content=f"<h3>Erreur : le numéro de tracking {tracking_number} existe déjà.</h3>",
                 status_code=400
             )
-
+        navire = db.query(models.Navire.id, models.Navire.tonnage).filter(models.Navire.id == navire_id).first()
+        if not navire:
+            return HTMLResponse(content="<h3>Erreur : navire introuvable.</h3>", status_code=400)
+
+        # Totaux : retrait de l'ancienne version, ajout de la nouvelle. Refus
+        # seulement si la modification alourdit le navire au-delà de son tonnage
+        rollups.count_cargo(db, marchandise.navire_id, marchandise.poids, marchandise.volume, -1)
+        charge = rollups.count_cargo(db, navire_id, poids, volume, +1)
+        alourdi = navire_id != marchandise.navire_id or poids > marchandise.poids
+        if alourdi and rollups.over_capacity(charge, navire.tonnage):
+            db.rollback()
+            return capacity_error(charge, navire.tonnage)
+        ancien_tracking = marchandise.tracking_number
         marchandise.nom = nom
         marchandise.type = type
         marchandise.poids = poids
@@ -320,32 +676,35 @@ def update_marchandise(
         marchandise.tracking_number = tracking_number
         marchandise.navire_id = navire_id
         db.commit()
+        tracking_cache.invalidate(ancien_tracking, tracking_number)
     return RedirectResponse(url="/marchandises", status_code=303)
 
 @app.post("/marchandises/{marchandise_id}/delete")
 def delete_marchandise(marchandise_id: int, db: Session = Depends(get_db)):
     marchandise = db.query(models.Marchandise).filter(models.Marchandise.id == marchandise_id).first()
     if marchandise:
+        rollups.count_cargo(db, marchandise.navire_id, marchandise.poids, marchandise.volume, -1)
         db.delete(marchandise)
         db.commit()
+        dashboard_counters.invalidate(MARCHANDISES_TOTAL)
+        tracking_cache.invalidate(marchandise.tracking_number)
     return RedirectResponse(url="/marchandises", status_code=303)
 
 @app.get("/marchandises/{marchandise_id}/download")
 def download_marchandise(marchandise_id: int, db: Session = Depends(get_db)):
-    marchandise = db.query(models.Marchandise).filter(models.Marchandise.id == marchandise_id).first()
+    # 🔹 Marchandise et navire associé en une seule requête (jointure)
+    marchandise = db.query(models.Marchandise).options(
+        joinedload(models.Marchandise.navire)
+    ).filter(models.Marchandise.id == marchandise_id).first()
     if not marchandise:
         return HTMLResponse(content="<h1>Marchandise introuvable</h1>", status_code=404)
 
-    # 🔹 Récupérer le navire associé
     navire_nom = "N/A"
     navire_imo = "N/A"
-    if marchandise.navire_id:
-        navire = db.query(models.Navire).filter(models.Navire.id == marchandise.navire_id).first()
-        if navire:
-            navire_nom = navire.nom
-            navire_imo = navire.imo
+    if marchandise.navire:
+        navire_nom = marchandise.navire.nom
+        navire_imo = marchandise.navire.imo
 
-    file_path = f"marchandise_{marchandise.id}.pdf"
     data = [
         ["Nom", marchandise.nom],
         ["Type", marchandise.type or "N/A"],
@@ -354,15 +713,75 @@ def download_marchandise(marchandise_id: int, db: Session = Depends(get_db)):
         ["Numéro de tracking", marchandise.tracking_number],
         ["Navire associé", f"{navire_nom} — IMO: {navire_imo}" if navire_nom != "N/A" else "N/A"],
     ]
-    build_pdf(file_path, "MarineGab — Fiche marchandise", data)
-    return FileResponse(path=file_path, filename=file_path, media_type="application/pdf")
+    content = pdf_cache.get_or_render("MarineGab — Fiche marchandise", data, pdf_engine.render)
+    return pdf_response(content, f"marchandise_{marchandise.id}.pdf")
 
 # INSPECTIONS
 # -------------------------
 @app.get("/inspections", response_class=HTMLResponse)
-def list_inspections(request: Request, db: Session = Depends(get_db)):
-    inspections = db.query(models.Inspection).all()
-    return templates.TemplateResponse("inspections.html", {"request": request, "inspections": inspections})
+async def list_inspections(
+    request: Request,
+    port: str | None = None,
+    navire_imo: str | None = None,
+    inspecteur: str | None = None,
+    date_debut: str | None = None,
+    date_fin: str | None = None,
+    sort: str | None = None,
+    order: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        d1, d2 = parse_date(date_debut), parse_date(date_fin)
+    except ValueError:
+        return HTMLResponse(content="<h1>Format de date invalide (YYYY-MM-DD)</h1>", status_code=400)
+
+    query = select(models.Inspection).options(joinedload(models.Inspection.navire))
+    if port:
+        query = query.where(models.Inspection.port_nom == port)
+    if navire_imo:
+        query = query.where(models.Inspection.navire_imo == navire_imo)
+    if inspecteur:
+        query = query.where(models.Inspection.inspecteur == inspecteur)
+    if d1:
+        query = query.where(models.Inspection.date >= d1)
+    if d2:
+        query = query.where(models.Inspection.date <= d2)
+    page = await paginate(
+        request, db, query,
+        {"date": models.Inspection.date, "id": models.Inspection.id},
+        models.Inspection.id, "date", sort, order or "desc", cursor, limit,
+    )
+    return templates.TemplateResponse("inspections.html", {
+        "request": request,
+        "inspections": page.items,
+        "page": page,
+        "filtres": {
+            "port": port or "", "navire_imo": navire_imo or "", "inspecteur": inspecteur or "",
+            "date_debut": date_debut or "", "date_fin": date_fin or "",
+        },
+    })
+
+@app.get("/inspections/export.zip")
+def export_inspections_zip(
+    date_debut: str | None = None,
+    date_fin: str | None = None,
+    port: str | None = None,
+):
+    # Filtres optionnels : période et/ou port
+    try:
+        d1 = datetime.strptime(date_debut, "%Y-%m-%d").date() if date_debut else None
+        d2 = datetime.strptime(date_fin, "%Y-%m-%d").date() if date_fin else None
+    except ValueError:
+        return HTMLResponse(content="<h1>Format de date invalide (YYYY-MM-DD)</h1>", status_code=400)
+
+    filename = f"inspections_{d1 or 'debut'}_{d2 or 'fin'}.zip"
+    return StreamingResponse(
+        stream_inspections_zip(d1, d2, port),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 @app.post("/inspections/add")
 def add_inspection(
@@ -412,7 +831,9 @@ def add_inspection(
         observations=observations
     )
     db.add(inspection)
+    rollups.count_inspection(db, rollups.inspection_key(inspection), +1)
     db.commit()
+    dashboard_counters.invalidate(INSPECTIONS_MOIS)
     return RedirectResponse(url="/inspections", status_code=303)
 
 @app.get("/inspections/{inspection_id}/edit", response_class=HTMLResponse)
@@ -449,7 +870,8 @@ def update_inspection(
 ):
     inspection = db.query(models.Inspection).filter(models.Inspection.id == inspection_id).first()
     if inspection:
-        inspection.date = date
+        old_key = rollups.inspection_key(inspection)
+        inspection.date = datetime.strptime(date, "%Y-%m-%d").date()
         inspection.navire_imo = navire_imo
         inspection.port_nom = port_nom
         inspection.inspecteur = inspecteur
@@ -469,20 +891,27 @@ def update_inspection(
         inspection.normes_antipollution = normes_antipollution
         inspection.conditions_vie = conditions_vie
         inspection.observations = observations
+        new_key = rollups.inspection_key(inspection)
+        if new_key != old_key:
+            rollups.count_inspection(db, old_key, -1)
+            rollups.count_inspection(db, new_key, +1)
         db.commit()
+        dashboard_counters.invalidate(INSPECTIONS_MOIS)
     return RedirectResponse(url="/inspections", status_code=303)
 
 @app.post("/inspections/{inspection_id}/delete")
 def delete_inspection(inspection_id: int, db: Session = Depends(get_db)):
     inspection = db.query(models.Inspection).filter(models.Inspection.id == inspection_id).first()
     if inspection:
+        rollups.count_inspection(db, rollups.inspection_key(inspection), -1)
         db.delete(inspection)
         db.commit()
+        dashboard_counters.invalidate(INSPECTIONS_MOIS)
     return RedirectResponse(url="/inspections", status_code=303)
 
 @app.get("/inspections/{inspection_id}", response_class=HTMLResponse)
-def inspection_detail(inspection_id: int, request: Request, db: Session = Depends(get_db)):
-    inspection = db.query(models.Inspection).filter(models.Inspection.id == inspection_id).first()
+async def inspection_detail(inspection_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    inspection = await db.get(models.Inspection, inspection_id)
     if not inspection:
         return HTMLResponse(content="<h1>Inspection introuvable</h1>", status_code=404)
     return templates.TemplateResponse("inspection_detail.html", {"request": request, "inspection": inspection})
@@ -493,31 +922,48 @@ def download_inspection(inspection_id: int, db: Session = Depends(get_db)):
     if not inspection:
         return HTMLResponse(content="<h1>Inspection introuvable</h1>", status_code=404)
 
-    file_path = f"inspection_{inspection.id}.pdf"
-    data = [
-        ["Date", inspection.date],
-        ["Navire IMO", inspection.navire_imo],
-        ["Port", inspection.port_nom],
-        ["Inspecteur", inspection.inspecteur],
-        ["Rapport", inspection.rapport or "N/A"],
-        ["Certificat sécurité", inspection.certificat_securite],
-        ["Certificat de classe", inspection.certificat_classe],
-        ["Certificat pollution", inspection.certificat_pollution],
-        ["Brevets marins", inspection.brevets_marins],
-        ["Certificats médicaux", inspection.certificats_medicaux],
-        ["Journal de bord", inspection.journal_bord],
-        ["Papiers douaniers", inspection.papiers_douaniers],
-        ["Gilets & combinaisons", inspection.gilets_combinaisons],
-        ["Radeaux & canots", inspection.radeaux_canots],
-        ["Extincteurs", inspection.extincteurs],
-        ["Alarmes & détecteurs", inspection.alarmes_detecteurs],
-        ["Système anti-incendie", inspection.systeme_incendie],
-        ["Normes antipollution", inspection.normes_antipollution],
-        ["Conditions de vie", inspection.conditions_vie],
-        ["Observations", inspection.observations or "Aucune"],
-    ]
-    build_pdf(file_path, "MarineGab — Fiche inspection", data)
-    return FileResponse(path=file_path, filename=file_path, media_type="application/pdf")
+    data = inspection_fiche_data(inspection)
+    content = pdf_cache.get_or_render(INSPECTION_TITLE, data, pdf_engine.render)
+    return pdf_response(content, f"inspection_{inspection.id}.pdf")
+
+# -------------------------
+# RECHERCHE
+# -------------------------
+
+@app.get("/recherche", response_class=HTMLResponse)
+async def search_page(
+    request: Request,
+    q: str = "",
+    limit: int = SEARCH_DEFAULT_LIMIT,
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Plein texte (FTS5 / tsvector), résultats classés et surlignés
+    limit = min(max(limit, 1), SEARCH_MAX_LIMIT)
+    resultats = await db.run_sync(search_all, q, limit) if q.strip() else {}
+    return templates.TemplateResponse("recherche.html", {
+        "request": request,
+        "q": q,
+        "resultats": resultats,
+    })
+
+# -------------------------
+# EXPORT DES TABLES
+# -------------------------
+
+@app.get("/export/{table}.{fmt}")
+def export_table(table: str, fmt: str, request: Request):
+    # CSV / JSONL en flux (curseur côté serveur), filtres en paramètres d'URL
+    if table not in EXPORTS or fmt not in EXPORT_FORMATS:
+        return HTMLResponse(content="<h1>Export introuvable</h1>", status_code=404)
+    try:
+        query = build_export_query(table, request.query_params)
+    except ValueError:
+        return HTMLResponse(content="<h1>Filtre invalide (dates YYYY-MM-DD, identifiants numériques)</h1>", status_code=400)
+    return StreamingResponse(
+        stream_table(query, fmt),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{fmt}"'},
+    )
 
 # -------------------------
 # STATISTIQUES
@@ -527,9 +973,9 @@ from sqlalchemy import func
 from datetime import date, datetime
 
 @app.get("/stats", response_class=HTMLResponse)
-def stats_page(
+async def stats_page(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     date_debut: str | None = None,
     date_fin: str | None = None
 ):
@@ -545,20 +991,14 @@ def stats_page(
         d1 = date(year, 1, 1)
         d2 = date(year, 12, 31)
 
-    # Inspections filtrées par période
-    inspections_count = db.query(models.Inspection)\
-        .filter(models.Inspection.date.between(d1, d2)).count()
+    # Inspections filtrées par période (somme des agrégats journaliers)
+    inspections_count = await db.run_sync(rollups.inspections_count, d1, d2)
 
     # Navires
-    navires_total = db.query(models.Navire).count()
-    navires_a_quai = db.query(models.Navire)\
-        .filter(models.Navire.statut_actuel == "à quai").count()
+    navires_total, navires_a_quai = await db.run_sync(rollups.navires_counts)
 
     # Audits par inspecteur
-    audits_par_inspecteur = db.query(
-        models.Inspection.inspecteur,
-        func.count(models.Inspection.id)
-    ).group_by(models.Inspection.inspecteur).all()
+    audits_par_inspecteur = await db.run_sync(rollups.audits_par_inspecteur)
 
     # Global (année/période en cours) = inspections + navires
     global_total = inspections_count + navires_total
@@ -570,7 +1010,42 @@ def stats_page(
         "navires_total": navires_total,
         "navires_a_quai": navires_a_quai,
         "audits_par_inspecteur": audits_par_inspecteur,
-        "global_total": global_total
+        "global_total": global_total,
+        "date_debut": d1,
+        "date_fin": d2,
+    })
+
+@app.get("/stats/conformite")
+def compliance_stats(
+    request: Request,
+    db: Session = Depends(get_db),
+    date_debut: str | None = None,
+    date_fin: str | None = None,
+    format: str | None = None,
+):
+    # Taux de non-conformité par point de contrôle (calcul NumPy sur toutes les
+    # inspections de la période) : route synchrone, exécutée dans le pool de
+    # threads, hors de la boucle des routes async et du flux d'occupation.
+    # Page HTML (10 premiers groupes), détail complet en JSON
+    if date_debut and date_fin:
+        try:
+            d1 = datetime.strptime(date_debut, "%Y-%m-%d").date()
+            d2 = datetime.strptime(date_fin, "%Y-%m-%d").date()
+        except ValueError:
+            return HTMLResponse(content="<h1>Format de date invalide (YYYY-MM-DD)</h1>", status_code=400)
+    else:
+        year = date.today().year
+        d1 = date(year, 1, 1)
+        d2 = date(year, 12, 31)
+    conformite = compliance.analyse(db, d1, d2)
+    if wants_json(request, format):
+        return {"periode": [d1, d2], **conformite}
+    return templates.TemplateResponse("stats_conformite.html", {
+        "request": request,
+        "periode": f"{d1} → {d2}",
+        "conformite": conformite,
+        "date_debut": d1,
+        "date_fin": d2,
     })
 
 
@@ -595,33 +1070,26 @@ def download_stats(
 
     # Générer les données selon le type demandé
     if stat_type == "inspections":
-        count = db.query(models.Inspection)\
-            .filter(models.Inspection.date.between(d1, d2)).count()
+        count = rollups.inspections_count(db, d1, d2)
         data = [
             ["Période", f"{d1} → {d2}"],
             ["Nombre d’inspections", count]
         ]
 
     elif stat_type == "navires":
-        total = db.query(models.Navire).count()
-        a_quai = db.query(models.Navire)\
-            .filter(models.Navire.statut_actuel == "à quai").count()
+        total, a_quai = rollups.navires_counts(db)
         data = [
             ["Total navires", total],
             ["Navires à quai", a_quai]
         ]
 
     elif stat_type == "audits":
-        audits = db.query(
-            models.Inspection.inspecteur,
-            func.count(models.Inspection.id)
-        ).group_by(models.Inspection.inspecteur).all()
+        audits = rollups.audits_par_inspecteur(db)
         data = [["Inspecteur", "Nombre d’audits"]] + [[i or "N/A", c] for i, c in audits]
 
     elif stat_type == "global":
-        inspections_count = db.query(models.Inspection)\
-            .filter(models.Inspection.date.between(d1, d2)).count()
-        navires_total = db.query(models.Navire).count()
+        inspections_count = rollups.inspections_count(db, d1, d2)
+        navires_total, _ = rollups.navires_counts(db)
         global_total = inspections_count + navires_total
         data = [
             ["Période", f"{d1} → {d2}"],
@@ -631,10 +1099,24 @@ def download_stats(
     else:
         return HTMLResponse(content="<h1>Statistique inconnue</h1>", status_code=404)
 
-    # Génération du PDF
-    file_path = f"stats_{stat_type}.pdf"
-    build_pdf(file_path, f"MarineGab — Statistiques {stat_type}", data)
-    return FileResponse(path=file_path, filename=file_path, media_type="application/pdf")
+    # Génération du PDF (en mémoire, sans fichier intermédiaire)
+    content = pdf_engine.render(f"MarineGab — Statistiques {stat_type}", data)
+    return pdf_response(content, f"stats_{stat_type}.pdf")
+
+@app.get("/stats/cache-pdf")
+def pdf_cache_stats():
+    # Compteurs du cache des fiches PDF (hits / misses / évictions)
+    return pdf_cache.stats()
+
+@app.get("/stats/compteurs")
+def counters_stats():
+    # Compteurs de la page d'accueil (hits / misses)
+    return dashboard_counters.stats()
+
+@app.get("/stats/tracking")
+def tracking_stats():
+    # Cache du suivi par numéro de tracking
+    return tracking_cache.stats()
 
 # -------------------------
 # DECLARATIONS
@@ -644,19 +1126,30 @@ def download_stats(
 def declarations_page(request: Request):
     return templates.TemplateResponse("declarations.html", {"request": request})
 
+@app.get("/declarations/{declaration_id}/pdf")
+def declaration_pdf(declaration_id: int, db: Session = Depends(get_db)):
+    decl = db.query(models.Declaration).filter(models.Declaration.id == declaration_id).first()
+    content = load_declaration_pdf(decl.fichier_pdf) if decl else None
+    if content is None:
+        return HTMLResponse(content="<h1>Document introuvable</h1>", status_code=404)
+    return pdf_response(content, declaration_filename(decl))
+
 # --- Déclaration d’arrivée ---
 @app.get("/declarations/arrivee", response_class=HTMLResponse)
-def declaration_arrivee_form(request: Request, db: Session = Depends(get_db)):
-    navires = db.query(models.Navire).all()
+async def declaration_arrivee_form(request: Request, db: AsyncSession = Depends(get_async_db)):
+    navires = (await db.scalars(select(models.Navire))).all()
+    # Clé propre à cet affichage du formulaire : un double envoi ne crée qu'une déclaration
     return templates.TemplateResponse(
         "declaration_arrivee.html",
-        {"request": request, "navires": navires}
+        {"request": request, "navires": navires, "idempotency_key": uuid.uuid4().hex}
     )
 
 # ➜ Récupération des marchandises par navire_id
 @app.get("/declarations/marchandises/by-id/{navire_id}", response_class=HTMLResponse)
-def get_marchandises_by_navire_id(navire_id: int, db: Session = Depends(get_db)):
-    marchandises = db.query(models.Marchandise).filter(models.Marchandise.navire_id == navire_id).all()
+async def get_marchandises_by_navire_id(navire_id: int, db: AsyncSession = Depends(get_async_db)):
+    marchandises = (await db.scalars(
+        select(models.Marchandise).where(models.Marchandise.navire_id == navire_id)
+    )).all()
     if not marchandises:
         return HTMLResponse("<ul class='list'><li>Aucune marchandise enregistrée pour ce navire.</li></ul>")
     html = "".join([f"<li>{m.nom} — {m.poids} t</li>" for m in marchandises])
@@ -664,12 +1157,14 @@ def get_marchandises_by_navire_id(navire_id: int, db: Session = Depends(get_db))
 
 # ➜ Récupération des marchandises par IMO
 @app.get("/declarations/marchandises/{imo}", response_class=HTMLResponse)
-def get_marchandises_by_navire(imo: str, db: Session = Depends(get_db)):
-    navire = db.query(models.Navire).filter(models.Navire.imo == imo).first()
+async def get_marchandises_by_navire(imo: str, db: AsyncSession = Depends(get_async_db)):
+    navire = await db.scalar(select(models.Navire).options(
+        selectinload(models.Navire.marchandises)
+    ).where(models.Navire.imo == imo))
     if not navire:
         return HTMLResponse("<p class='error'>Navire introuvable pour cet IMO.</p>", status_code=404)
 
-    marchandises = db.query(models.Marchandise).filter(models.Marchandise.navire_id == navire.id).all()
+    marchandises = navire.marchandises
     if not marchandises:
         return HTMLResponse("<ul class='list'><li>Aucune marchandise enregistrée pour ce navire.</li></ul>")
 
@@ -681,174 +1176,198 @@ def get_marchandises_by_navire(imo: str, db: Session = Depends(get_db)):
 
 @app.post("/declarations/arrivee/download")
 def declaration_arrivee_download(
+    request: Request,
     navire_imo: str = Form(...),
     port: str = Form(...),
     date: str = Form(...),   # reçu comme string
     marchandises: str = Form(None),
+    idempotency_key: str = Form(None),
     db: Session = Depends(get_db)
 ):
-    # 🔹 Conversion de la chaîne en objet date
+    # 🔹 Vérification du format de la date
     try:
-        date_obj = datetime.strptime(date, "%Y-%m-%d").date()
+        datetime.strptime(date, "%Y-%m-%d")
     except ValueError:
         return HTMLResponse("<h3>Format de date invalide (YYYY-MM-DD)</h3>", status_code=400)
-
-    navire = db.query(models.Navire).filter(models.Navire.imo == navire_imo).first()
-    marchandises_list = db.query(models.Marchandise).filter(
-        models.Marchandise.navire_id == (navire.id if navire else None)
-    ).all()
-
-    data = [["Champ", "Valeur"]]
-    data.append(["Nom du navire", navire.nom if navire else navire_imo])
-    data.append(["Port d’arrivée", port])
-    data.append(["Date d’arrivée", date_obj.strftime("%Y-%m-%d")])
-
-    marchandises_text = None
-    if marchandises_list:
-        marchandises_text = "; ".join([f"{m.nom} ({m.poids}t)" for m in marchandises_list])
-        for m in marchandises_list:
-            data.append([f"Marchandise ({m.tracking_number})", f"{m.nom} — {m.poids}t / {m.volume}m³"])
-    elif marchandises:
-        marchandises_text = marchandises
-        data.append(["Marchandises (manuel)", marchandises])
-
-    filename = f"declaration_arrivee_{uuid.uuid4().hex}.pdf"
-    file_path = os.path.join("app", "static", filename)
-    build_pdf(file_path, "Déclaration d’arrivée", data)
-
-    # 🔹 Utiliser date_obj (objet Python) et non la chaîne
-    decl = models.Declaration(
-        type="Arrivée",
-        navire_nom=navire.nom if navire else navire_imo,
-        navire_imo=navire_imo,
-        port=port,
-        date=date_obj,   # ✅ objet date
-        marchandises=marchandises_text,
-        fichier_pdf=filename
-    )
-    db.add(decl)
-    db.commit()
-
-    return FileResponse(file_path, filename=filename, media_type="application/pdf")
+    return download_declaration_job(request, db, ARRIVEE, {
+        "navire_imo": navire_imo, "port": port, "date": date, "marchandises": marchandises,
+    }, idempotency_key)
 
 from datetime import datetime
 
 @app.post("/declarations/depart/download")
 def autorisation_depart_download(
+    request: Request,
     navire_imo: str = Form(...),
     port: str = Form(...),
     date: str = Form(...),   # reçu comme string
     destination: str = Form(None),
     securite: str = Form(...),
     sante: str = Form(None),
+    idempotency_key: str = Form(None),
     db: Session = Depends(get_db)
 ):
-    # 🔹 Conversion de la chaîne en objet date
+    # 🔹 Vérification du format de la date
     try:
-        date_obj = datetime.strptime(date, "%Y-%m-%d").date()
+        datetime.strptime(date, "%Y-%m-%d")
     except ValueError:
         return HTMLResponse("<h3>Format de date invalide (YYYY-MM-DD)</h3>", status_code=400)
+    return download_declaration_job(request, db, DEPART, {
+        "navire_imo": navire_imo, "port": port, "date": date,
+        "destination": destination, "securite": securite, "sante": sante,
+    }, idempotency_key)
+
+# --- Génération en arrière-plan ---
+def submit_declaration_job(request: Request, db: Session, type: str, parametres: dict,
+                           idempotency_key: str | None) -> Response:
+    # Clé d'idempotence : en-tête Idempotency-Key, sinon champ caché du formulaire
+    cle_client = request.headers.get("Idempotency-Key") or idempotency_key
+    job, created = submit_declaration(db, type, parametres, cle_client)
+
+    # 202 + identifiant pour les clients JSON ; le navigateur suit la page d'état.
+    # Soumission répétée : le travail existant (200), son PDF directement s'il est prêt
+    url = f"/declarations/jobs/{job.id}"
+    pdf = f"{url}/pdf" if job.statut == TERMINE else None
+    if wants_json(request, None):
+        return JSONResponse(
+            {"job_id": job.id, "statut": job.statut, "url": url, "pdf": pdf},
+            status_code=202 if created else 200,
+            headers={"Location": url, "Idempotent-Replayed": "false" if created else "true"},
+        )
+    return RedirectResponse(url=pdf or url, status_code=303)
+
+def download_declaration_job(request: Request, db: Session, type: str, parametres: dict,
+                             idempotency_key: str | None) -> Response:
+    # Routes /download : même file et même idempotence que /jobs, réponse = le PDF
+    cle_client = request.headers.get("Idempotency-Key") or idempotency_key
+    job, _ = submit_declaration(db, type, parametres, cle_client)
+    return declaration_job_document(db, wait_declaration(db, job.id))
+
+def declaration_job_document(db: Session, job: models.DeclarationJob | None) -> Response:
+    if job is None:
+        return HTMLResponse(content="<h1>Travail introuvable</h1>", status_code=404)
+    if job.statut == ECHEC:
+        return HTMLResponse(content=f"<h3>La génération a échoué : {escape(job.erreur or '')}</h3>", status_code=500)
+    if job.statut != TERMINE:
+        return HTMLResponse(
+            content="<h3>Document en cours de génération, réessayez dans quelques secondes.</h3>",
+            status_code=202, headers={"Retry-After": "2", "Location": f"/declarations/jobs/{job.id}"},
+        )
+    decl = db.get(models.Declaration, job.declaration_id) if job.declaration_id else None
+    content = load_declaration_pdf(decl.fichier_pdf) if decl else None
+    if content is None:
+        return HTMLResponse(content="<h1>Document introuvable</h1>", status_code=404)
+    return pdf_response(content, declaration_filename(decl))
+
+@app.post("/declarations/arrivee/jobs")
+def declaration_arrivee_job(
+    request: Request,
+    navire_imo: str = Form(...),
+    port: str = Form(...),
+    date: str = Form(...),
+    marchandises: str = Form(None),
+    idempotency_key: str = Form(None),
+    db: Session = Depends(get_db)
+):
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return HTMLResponse("<h3>Format de date invalide (YYYY-MM-DD)</h3>", status_code=400)
+    return submit_declaration_job(request, db, ARRIVEE, {
+        "navire_imo": navire_imo, "port": port, "date": date, "marchandises": marchandises,
+    }, idempotency_key)
 
-    navire = db.query(models.Navire).filter(models.Navire.imo == navire_imo).first()
-
-    data = [["Champ", "Valeur"]]
-    data.append(["Nom du navire", navire.nom if navire else navire_imo])
-    data.append(["Port de départ", port])
-    data.append(["Date de départ", date_obj.strftime("%Y-%m-%d")])
-    if destination:
-        data.append(["Destination", destination])
-    data.append(["Niveau de sécurité", securite])
-    if sante:
-        data.append(["Déclaration de santé", sante])
-
-    filename = f"autorisation_depart_{uuid.uuid4().hex}.pdf"
-    file_path = os.path.join("app", "static", filename)
-    build_pdf(file_path, "Autorisation de départ", data)
-
-    # 🔹 Utiliser date_obj (objet Python) et non la chaîne
-    decl = models.Declaration(
-        type="Départ",
-        navire_nom=navire.nom if navire else navire_imo,
-        navire_imo=navire_imo,
-        port=port,
-        date=date_obj,   # ✅ objet date
-        destination=destination,
-        securite=securite,
-        sante=sante,
-        fichier_pdf=filename
-    )
-    db.add(decl)
-    db.commit()
-
-    return FileResponse(file_path, filename=filename, media_type="application/pdf")
-
-# --- Liste des déclarations ---
-@app.get("/declarations/list", response_class=HTMLResponse)
-def declarations_list(request: Request, db: Session = Depends(get_db)):
-    declarations = db.query(models.Declaration).all()
-    return templates.TemplateResponse(
-        "declarations_list.html",
-        {"request": request, "declarations": declarations}
-    )
-
-# --- Autorisation de départ ---
-@app.get("/declarations/depart", response_class=HTMLResponse)
-def autorisation_depart_form(request: Request, db: Session = Depends(get_db)):
-    navires = db.query(models.Navire).all()
-    return templates.TemplateResponse(
-        "autorisation_depart.html",
-        {"request": request, "navires": navires}
-    )
-
-@app.post("/declarations/depart/download")
-def autorisation_depart_download(
+@app.post("/declarations/depart/jobs")
+def autorisation_depart_job(
+    request: Request,
     navire_imo: str = Form(...),
     port: str = Form(...),
     date: str = Form(...),
     destination: str = Form(None),
     securite: str = Form(...),
     sante: str = Form(None),
+    idempotency_key: str = Form(None),
     db: Session = Depends(get_db)
 ):
-    navire = db.query(models.Navire).filter(models.Navire.imo == navire_imo).first()
-
-    data = [["Champ", "Valeur"]]
-    data.append(["Nom du navire", navire.nom if navire else navire_imo])
-    data.append(["Port de départ", port])
-    data.append(["Date de départ", date])
-    if destination:
-        data.append(["Destination", destination])
-    data.append(["Niveau de sécurité", securite])
-    if sante:
-        data.append(["Déclaration de santé", sante])
-
-    filename = f"autorisation_depart_{uuid.uuid4().hex}.pdf"
-    file_path = os.path.join("app", "static", filename)
-    build_pdf(file_path, "Autorisation de départ", data)
-
-    # ➜ Insertion en base
-    decl = models.Declaration(
-        type="Départ",
-        navire_nom=navire.nom if navire else navire_imo,
-        navire_imo=navire_imo,
-        port=port,
-        date=date,
-        destination=destination,
-        securite=securite,
-        sante=sante,
-        fichier_pdf=filename
-    )
-    db.add(decl)
-    db.commit()
-
-    return FileResponse(file_path, filename=filename, media_type="application/pdf")
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return HTMLResponse("<h3>Format de date invalide (YYYY-MM-DD)</h3>", status_code=400)
+    return submit_declaration_job(request, db, DEPART, {
+        "navire_imo": navire_imo, "port": port, "date": date,
+        "destination": destination, "securite": securite, "sante": sante,
+    }, idempotency_key)
+
+@app.get("/declarations/jobs/{job_id}")
+async def declaration_job(
+    job_id: int,
+    request: Request,
+    format: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    # JSON pour les clients qui interrogent l'état, page rafraîchie sinon
+    job = await declaration_job_status(db, job_id)
+    if wants_json(request, format):
+        if job is None:
+            return JSONResponse({"detail": "Travail introuvable"}, status_code=404)
+        return JSONResponse(job)
+    if job is None:
+        return HTMLResponse(content="<h1>Travail introuvable</h1>", status_code=404)
+    return templates.TemplateResponse("declaration_job.html", {"request": request, "job": job})
+
+@app.get("/declarations/jobs/{job_id}/pdf")
+def declaration_job_pdf(job_id: int, db: Session = Depends(get_db)):
+    return declaration_job_document(db, db.get(models.DeclarationJob, job_id))
 
 # --- Liste des déclarations ---
 @app.get("/declarations/list", response_class=HTMLResponse)
-def declarations_list(request: Request, db: Session = Depends(get_db)):
-    declarations = db.query(models.Declaration).all()
-    return templates.TemplateResponse(
-        "declarations_list.html",
-        {"request": request, "declarations": declarations}
+async def declarations_list(
+    request: Request,
+    type: str | None = None,
+    navire_imo: str | None = None,
+    date_debut: str | None = None,
+    date_fin: str | None = None,
+    sort: str | None = None,
+    order: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        d1, d2 = parse_date(date_debut), parse_date(date_fin)
+    except ValueError:
+        return HTMLResponse(content="<h1>Format de date invalide (YYYY-MM-DD)</h1>", status_code=400)
+
+    query = select(models.Declaration)
+    if type:
+        query = query.where(models.Declaration.type == type)
+    if navire_imo:
+        query = query.where(models.Declaration.navire_imo == navire_imo)
+    if d1:
+        query = query.where(models.Declaration.date >= d1)
+    if d2:
+        query = query.where(models.Declaration.date <= d2)
+    page = await paginate(
+        request, db, query,
+        {"date": models.Declaration.date, "id": models.Declaration.id},
+        models.Declaration.id, "date", sort, order or "desc", cursor, limit,
     )
+    return templates.TemplateResponse("declarations_list.html", {
+        "request": request,
+        "declarations": page.items,
+        "page": page,
+        "filtres": {
+            "type": type or "", "navire_imo": navire_imo or "",
+            "date_debut": date_debut or "", "date_fin": date_fin or "",
+        },
+    })
 
+# --- Autorisation de départ ---
+@app.get("/declarations/depart", response_class=HTMLResponse)
+async def autorisation_depart_form(request: Request, db: AsyncSession = Depends(get_async_db)):
+    navires = (await db.scalars(select(models.Navire))).all()
+    # Clé propre à cet affichage du formulaire : un double envoi ne crée qu'une autorisation
+    return templates.TemplateResponse(
+        "autorisation_depart.html",
+        {"request": request, "navires": navires, "idempotency_key": uuid.uuid4().hex}
+    )
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, Date, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Text, Index, ForeignKey
+from sqlalchemy.orm import relationship, validates
 from app.database import Base
 
 
@@ -7,7 +8,7 @@ class Navire(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     imo = Column(String(50), unique=True, nullable=False)
-    nom = Column(String(255), nullable=False)
+    nom = Column(String(255), nullable=False, index=True)
     pavillon = Column(String(100), nullable=True)
     annee_construction = Column(Integer, nullable=True)
     tonnage = Column(Float, nullable=True)
@@ -16,9 +17,32 @@ class Navire(Base):
     # Champs supplémentaires
     dernier_port = Column(String(100), nullable=True)
     prochaine_destination = Column(String(100), nullable=True)
-    statut_actuel = Column(String(100), nullable=True)
+    statut_actuel = Column(String(100), nullable=True, index=True)
     autres = Column(Text, nullable=True)
 
+    # Cargaison : supprimée avec le navire (ON DELETE CASCADE côté base)
+    marchandises = relationship(
+        "Marchandise", back_populates="navire",
+        cascade="all, delete-orphan", passive_deletes=True,
+    )
+    # Totaux de cargaison (app/rollups.py), supprimés avec le navire
+    chargement = relationship("StatChargementNavire", uselist=False, viewonly=True)
+
+    # Inspections, manifests et déclarations référencent le navire par IMO,
+    # sans contrainte : ils peuvent concerner un navire non enregistré.
+    inspections = relationship(
+        "Inspection", primaryjoin="Navire.imo == foreign(Inspection.navire_imo)",
+        viewonly=True, order_by="Inspection.date.desc()",
+    )
+    manifests = relationship(
+        "Manifest", primaryjoin="Navire.imo == foreign(Manifest.navire_imo)",
+        viewonly=True, order_by="Manifest.date.desc()",
+    )
+    declarations = relationship(
+        "Declaration", primaryjoin="Navire.imo == foreign(Declaration.navire_imo)",
+        viewonly=True, order_by="Declaration.date.desc()",
+    )
+
 
 class Port(Base):
     __tablename__ = "ports"
@@ -32,41 +56,74 @@ class Port(Base):
     coordonnees = Column(String(255), nullable=True)
     responsable = Column(String(255), nullable=True)
 
+    # Position lue dans coordonnees (app.geo), en degrés décimaux
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+
 
 class Marchandise(Base):
     __tablename__ = "marchandises"
 
     id = Column(Integer, primary_key=True, index=True)
-    nom = Column(String(255), nullable=False)
-    type = Column(String(100), nullable=True)
-    poids = Column(Float, nullable=False)
+    nom = Column(String(255), nullable=False, index=True)
+    type = Column(String(100), nullable=True, index=True)
+    poids = Column(Float, nullable=False, index=True)
     volume = Column(Float, nullable=False)
 
     # Référence au navire
-    navire_id = Column(Integer, nullable=False)
+    navire_id = Column(
+        Integer,
+        ForeignKey("navires.id", ondelete="CASCADE", name="fk_marchandises_navire_id_navires"),
+        nullable=False, index=True,
+    )
+    navire = relationship("Navire", back_populates="marchandises")
 
     # Nouveau champ
     tracking_number = Column(String(100), unique=True, nullable=False)
 
 class Manifest(Base):
     __tablename__ = "manifests"
+    __table_args__ = (
+        Index("ix_manifests_navire_imo", "navire_imo"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     numero_manifest = Column(String(255), unique=True, nullable=False)
     date = Column(Date, nullable=False)
     navire_imo = Column(String(50), nullable=False)
+    navire = relationship("Navire", primaryjoin="foreign(Manifest.navire_imo) == Navire.imo", viewonly=True)
     port_depart_nom = Column(String(100), nullable=False)
     port_arrivee_nom = Column(String(100), nullable=False)
 
 
+# Points de contrôle d'une inspection, dans l'ordre des bits de
+# Inspection.non_conformites (bit i à 1 : point i "Non conforme")
+CONTROLES = (
+    "certificat_securite", "certificat_classe", "certificat_pollution",
+    "brevets_marins", "certificats_medicaux", "journal_bord", "papiers_douaniers",
+    "gilets_combinaisons", "radeaux_canots", "extincteurs", "alarmes_detecteurs",
+    "systeme_incendie", "normes_antipollution", "conditions_vie",
+)
+CONFORME = "Conforme"
+TOUT_NON_CONFORME = (1 << len(CONTROLES)) - 1   # valeur par défaut des colonnes
+
+
 class Inspection(Base):
     __tablename__ = "inspections"
+    __table_args__ = (
+        # Historique d'un navire / export par port, triés par date
+        Index("ix_inspections_navire_imo_date", "navire_imo", "date"),
+        Index("ix_inspections_port_nom_date", "port_nom", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(Date, nullable=False)
+    date = Column(Date, nullable=False, index=True)
     navire_imo = Column(String(50), nullable=False)
     port_nom = Column(String(100), nullable=False)
-    inspecteur = Column(String(255), nullable=False)
+    inspecteur = Column(String(255), nullable=False, index=True)
+
+    navire = relationship("Navire", primaryjoin="foreign(Inspection.navire_imo) == Navire.imo", viewonly=True)
+    port = relationship("Port", primaryjoin="foreign(Inspection.port_nom) == Port.nom", viewonly=True)
     rapport = Column(Text, nullable=True)
 
     # Nouveaux champs audit
@@ -90,20 +147,99 @@ class Inspection(Base):
 
     observations = Column(Text, nullable=True)
 
-from sqlalchemy import Column, Integer, String, Date
-from app.database import Base
+    # Les 14 points ci-dessus en un entier (masque de bits, voir CONTROLES),
+    # tenu à jour à chaque affectation ; sert aux statistiques de conformité
+    non_conformites = Column(
+        Integer, nullable=False, default=TOUT_NON_CONFORME, server_default=str(TOUT_NON_CONFORME)
+    )
+
+    @validates(*CONTROLES)
+    def _update_non_conformites(self, key, value):
+        bit = 1 << CONTROLES.index(key)
+        mask = TOUT_NON_CONFORME if self.non_conformites is None else self.non_conformites
+        self.non_conformites = mask & ~bit if value == CONFORME else mask | bit
+        return value
 
 class Declaration(Base):
     __tablename__ = "declarations"
+    __table_args__ = (
+        Index("ix_declarations_navire_imo_date", "navire_imo", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     type = Column(String, nullable=False)          # "Arrivée" ou "Départ"
     navire_nom = Column(String, nullable=False)
     navire_imo = Column(String, nullable=False)
     port = Column(String, nullable=False)
-    date = Column(Date, nullable=False)
+    date = Column(Date, nullable=False, index=True)
     destination = Column(String, nullable=True)
     marchandises = Column(String, nullable=True)
     securite = Column(String, nullable=True)
     sante = Column(String, nullable=True)
     fichier_pdf = Column(String, nullable=False)   # chemin du PDF généré
+
+    navire = relationship("Navire", primaryjoin="foreign(Declaration.navire_imo) == Navire.imo", viewonly=True)
+
+
+class DeclarationJob(Base):
+    """Génération d'une déclaration en arrière-plan (app/declaration_jobs.py)."""
+    __tablename__ = "declaration_jobs"
+    __table_args__ = (
+        # Prise du prochain travail : statut = 'en attente' ORDER BY id
+        Index("ix_declaration_jobs_statut_id", "statut", "id"),
+        # Une seule génération par clé d'idempotence (NULL : clé libérée)
+        Index("uq_declaration_jobs_cle", "cle", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    type = Column(String(20), nullable=False)        # "Arrivée" ou "Départ"
+    statut = Column(String(20), nullable=False)      # en attente, en cours, terminé, échec
+    parametres = Column(Text, nullable=False)        # champs du formulaire (JSON)
+    cle = Column(String(64), nullable=True)          # empreinte SHA-256 de la clé d'idempotence
+    tentatives = Column(Integer, nullable=False, default=0, server_default="0")
+    erreur = Column(Text, nullable=True)
+    declaration_id = Column(
+        Integer,
+        ForeignKey("declarations.id", ondelete="SET NULL",
+                   name="fk_declaration_jobs_declaration_id_declarations"),
+        nullable=True,
+    )
+    cree_le = Column(DateTime, nullable=False)
+    demarre_le = Column(DateTime, nullable=True)
+    termine_le = Column(DateTime, nullable=True)
+
+
+# -------------------------
+# Agrégats statistiques (tenus à jour par app/rollups.py)
+# -------------------------
+
+class StatInspectionJour(Base):
+    __tablename__ = "stats_inspections_jour"
+    __table_args__ = (
+        Index("ix_stats_inspections_jour_inspecteur", "inspecteur", "nombre"),
+    )
+
+    date = Column(Date, primary_key=True)
+    port_nom = Column(String(100), primary_key=True)
+    inspecteur = Column(String(255), primary_key=True)
+    nombre = Column(Integer, nullable=False, default=0)
+
+
+class StatNavireStatut(Base):
+    __tablename__ = "stats_navires_statut"
+
+    statut = Column(String(100), primary_key=True)   # "" pour un statut non renseigné
+    nombre = Column(Integer, nullable=False, default=0)
+
+
+class StatChargementNavire(Base):
+    __tablename__ = "stats_chargement_navire"
+
+    navire_id = Column(
+        Integer,
+        ForeignKey("navires.id", ondelete="CASCADE", name="fk_stats_chargement_navire_navire_id_navires"),
+        primary_key=True,
+    )
+    poids = Column(Float, nullable=False, default=0)     # tonnes
+    volume = Column(Float, nullable=False, default=0)    # m³
+    nombre = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,185 @@
+"""
+Occupation des ports en direct : /ports/occupation (page) et
+/ports/occupation/flux (Server-Sent Events).
+
+Un navire est compté dans le port de son dernier_port quand son statut est
+"à quai". Le tableau est chargé en mémoire au démarrage puis tenu à jour
+par les routes d'écriture (navires, ports, déclarations d'arrivée et de
+départ). Chaque changement produit une nouvelle version, sérialisée une
+seule fois et poussée à tous les navigateurs abonnés : des centaines de
+tableaux de bord ouverts coûtent une diffusion, pas des centaines de
+requêtes. Un client lent saute les versions intermédiaires et reçoit
+toujours l'état le plus récent.
+
+Le tableau est propre au processus : avec plusieurs workers, ou après une
+écriture faite hors de l'application, il est resynchronisé depuis la base
+toutes les OCCUPANCY_RESYNC secondes (une requête par worker, quel que
+soit le nombre de navigateurs connectés).
+"""
+import asyncio
+import json
+import os
+import threading
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models
+
+# Configuration (surchargeable par variables d'environnement)
+OCCUPANCY_RESYNC = float(os.getenv("OCCUPANCY_RESYNC", "30"))
+OCCUPANCY_KEEPALIVE = float(os.getenv("OCCUPANCY_KEEPALIVE", "15"))
+
+STATUT_A_QUAI = "à quai"
+STATUT_EN_MER = "en mer"
+
+
+class OccupancyBoard:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._capacites = {}   # nom du port -> capacité (None si non renseignée)
+        self._navires = {}     # id des navires à quai -> (port, nom, imo)
+        self._version = 0
+        self._payload = None   # JSON de la version courante, calculé à la demande
+        self.loaded = False
+
+        # Diffusion : événement remplacé à chaque version (boucle asyncio du serveur)
+        self._loop = None
+        self._event = None
+
+    # -------------------------
+    # Mises à jour (appelées après commit, depuis n'importe quel thread)
+    # -------------------------
+
+    def load(self, db: Session):
+        """(Re)charge tout le tableau depuis la base ; ne publie que s'il a changé."""
+        N = models.Navire
+        capacites = dict(db.execute(select(models.Port.nom, models.Port.capacite)).all())
+        navires = {
+            navire_id: (port, nom, imo)
+            for navire_id, nom, imo, port in db.execute(
+                select(N.id, N.nom, N.imo, N.dernier_port).where(N.statut_actuel == STATUT_A_QUAI)
+            )
+            if port
+        }
+        with self._lock:
+            self.loaded = True
+            if capacites != self._capacites or navires != self._navires:
+                self._capacites, self._navires = capacites, navires
+                self._publish()
+
+    def set_navire(self, navire_id: int, nom: str | None, imo: str | None,
+                   statut: str | None, port: str | None):
+        entry = (port, nom, imo) if statut == STATUT_A_QUAI and port else None
+        with self._lock:
+            if self._navires.get(navire_id) == entry:
+                return
+            if entry is None:
+                self._navires.pop(navire_id, None)
+            else:
+                self._navires[navire_id] = entry
+            self._publish()
+
+    def remove_navire(self, navire_id: int):
+        self.set_navire(navire_id, None, None, None, None)
+
+    def set_port(self, nom: str, capacite: float | None, ancien_nom: str | None = None):
+        with self._lock:
+            if ancien_nom is not None and ancien_nom != nom:
+                self._capacites.pop(ancien_nom, None)
+            elif self._capacites.get(nom, ()) == capacite:
+                return
+            self._capacites[nom] = capacite
+            self._publish()
+
+    def remove_port(self, nom: str):
+        with self._lock:
+            if self._capacites.pop(nom, ()) != ():
+                self._publish()
+
+    def _publish(self):
+        # Sous verrou : nouvelle version, réveil des abonnés dans la boucle du serveur
+        self._version += 1
+        self._payload = None
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._notify)
+            except RuntimeError:
+                self._loop = None   # boucle arrêtée
+
+    # -------------------------
+    # Lecture
+    # -------------------------
+
+    def snapshot(self) -> tuple:
+        """(version, JSON de l'état courant) ; le JSON est partagé par tous les abonnés."""
+        with self._lock:
+            if self._payload is None:
+                self._payload = json.dumps(self._build(), ensure_ascii=False)
+            return self._version, self._payload
+
+    def _build(self) -> dict:
+        ports = {
+            nom: {"port": nom, "capacite": capacite, "navires": []}
+            for nom, capacite in self._capacites.items()
+        }
+        for navire_id, (port, nom, imo) in self._navires.items():
+            # Port d'escale absent de la table des ports : capacité inconnue
+            ports.setdefault(port, {"port": port, "capacite": None, "navires": []})["navires"].append(
+                {"id": navire_id, "nom": nom, "imo": imo}
+            )
+        rows = sorted(ports.values(), key=lambda p: p["port"])
+        for row in rows:
+            row["navires"].sort(key=lambda n: n["nom"] or "")
+            row["a_quai"] = len(row["navires"])
+            row["taux"] = round(row["a_quai"] / row["capacite"], 3) if row["capacite"] else None
+        return {"version": self._version, "ports": rows}
+
+    # -------------------------
+    # Diffusion (boucle asyncio)
+    # -------------------------
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        with self._lock:
+            self._loop = loop
+            self._event = asyncio.Event()
+
+    def _notify(self):
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    async def events(self):
+        """Flux SSE : l'état courant à la connexion, puis chaque nouvelle version."""
+        if self._loop is not asyncio.get_running_loop():
+            self.attach(asyncio.get_running_loop())
+        sent = None
+        while True:
+            # Événement pris avant la lecture : une version publiée entre les deux le déclenche
+            event = self._event
+            version, payload = self.snapshot()
+            if version != sent:
+                sent = version
+                yield f"id: {version}\nevent: occupation\ndata: {payload}\n\n"
+                continue
+            try:
+                await asyncio.wait_for(event.wait(), OCCUPANCY_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"   # garde la connexion ouverte derrière les proxys
+
+    async def resync_forever(self, session_factory):
+        while True:
+            await asyncio.sleep(OCCUPANCY_RESYNC)
+            try:
+                await asyncio.to_thread(self.reload, session_factory)
+            except Exception:
+                pass   # base indisponible : nouvel essai au prochain cycle
+
+    def reload(self, session_factory):
+        db = session_factory()
+        try:
+            self.load(db)
+        finally:
+            db.close()
+
+
+occupancy_board = OccupancyBoard()
@@ -0,0 +1,108 @@
+import base64
+import json
+from datetime import date
+
+from fastapi import Request
+from sqlalchemy import Select, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class Page:
+    """Une page de résultats et les liens vers les pages voisines."""
+
+    def __init__(self, items: list, sort: str, order: str, next_url: str | None,
+                 prev_url: str | None, first_url: str | None):
+        self.items = items
+        self.sort = sort
+        self.order = order
+        self.next_url = next_url
+        self.prev_url = prev_url
+        self.first_url = first_url
+
+
+def _encode_cursor(direction: str, value, row_id: int) -> str:
+    if isinstance(value, date):
+        value = value.isoformat()
+    raw = json.dumps([value, row_id], separators=(",", ":")).encode("utf-8")
+    return f"{direction}{base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')}"
+
+
+def _decode_cursor(cursor: str, column):
+    """Renvoie (direction, valeur, id) ou None si le curseur est invalide."""
+    try:
+        direction, raw = cursor[0], cursor[1:]
+        if direction not in "np":
+            return None
+        value, row_id = json.loads(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)))
+        if column.type.python_type is date:
+            value = date.fromisoformat(value)
+        return direction, value, int(row_id)
+    except (ValueError, TypeError, IndexError):
+        return None
+
+
+async def paginate(request: Request, db: AsyncSession, query: Select, sort_columns: dict,
+                   id_column, default_sort: str, sort: str | None = None,
+                   order: str | None = None, cursor: str | None = None,
+                   limit: int | None = None) -> Page:
+    """
+    Pagination par curseur (keyset) : WHERE (tri, id) > (dernière valeur vue)
+    ORDER BY tri, id LIMIT n. Le coût d'une page ne dépend pas de sa position,
+    contrairement à OFFSET. Les colonnes de tri doivent être non nulles.
+    :param query: select(Modèle) déjà filtré, exécuté sur la session asynchrone
+    :param sort_columns: {nom dans l'URL: colonne} des tris autorisés
+    :param cursor: "n…" page suivante / "p…" page précédente
+    """
+    if sort not in sort_columns:
+        sort = default_sort
+    order = "desc" if order == "desc" else "asc"
+    limit = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    column = sort_columns[sort]
+
+    decoded = _decode_cursor(cursor, column) if cursor else None
+    direction = decoded[0] if decoded else None
+
+    # Vers l'arrière : on parcourt à l'envers puis on remet dans l'ordre
+    forward = (order == "asc") != (direction == "p")
+    if decoded:
+        _, value, row_id = decoded
+        if forward:
+            query = query.filter(or_(column > value, and_(column == value, id_column > row_id)))
+        else:
+            query = query.filter(or_(column < value, and_(column == value, id_column < row_id)))
+    if forward:
+        query = query.order_by(column.asc(), id_column.asc())
+    else:
+        query = query.order_by(column.desc(), id_column.desc())
+
+    items = list((await db.execute(query.limit(limit + 1))).scalars())
+    has_more = len(items) > limit
+    items = items[:limit]
+    if direction == "p":
+        items.reverse()
+
+    def url(c):
+        return str(request.url.include_query_params(cursor=c))
+
+    def key(item):
+        return getattr(item, column.key), getattr(item, id_column.key)
+
+    next_url = prev_url = None
+    if items:
+        if has_more or direction == "p":
+            next_url = url(_encode_cursor("n", *key(items[-1])))
+        if direction == "n" or (direction == "p" and has_more):
+            prev_url = url(_encode_cursor("p", *key(items[0])))
+    first_url = str(request.url.remove_query_params("cursor")) if decoded else None
+
+    return Page(items, sort, order, next_url, prev_url, first_url)
+
+
+def parse_date(value: str | None):
+    """Date optionnelle d'un filtre (YYYY-MM-DD) ; lève ValueError si invalide."""
+    if not value:
+        return None
+    return date.fromisoformat(value)
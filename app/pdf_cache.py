@@ -0,0 +1,191 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from app.pdf_utils import PDF_TEMPLATE_VERSION
+
+# Configuration du cache (surchargeable par variables d'environnement)
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join("app", "cache", "pdf"))
+PDF_CACHE_MEMORY_BYTES = int(os.getenv("PDF_CACHE_MEMORY_BYTES", str(16 * 1024 * 1024)))
+PDF_CACHE_DISK_BYTES = int(os.getenv("PDF_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+
+
+class PdfCache:
+    """
+    Cache LRU à deux niveaux (mémoire + disque) pour les fiches PDF.
+    La clé est un hash du contenu (titre + lignes + version du gabarit) :
+    toute modification de la fiche produit une nouvelle clé, l'ancienne
+    entrée finit simplement évincée.
+    """
+
+    def __init__(self, directory: str, memory_limit: int, disk_limit: int):
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()   # clé -> octets du PDF
+        self._memory_size = 0
+        self._disk = OrderedDict()     # clé -> taille du fichier
+        self._disk_size = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_disk_index()
+
+    # -------------------------
+    # Clés
+    # -------------------------
+
+    @staticmethod
+    def key(title: str, data: list) -> str:
+        payload = json.dumps(
+            [PDF_TEMPLATE_VERSION, title, data],
+            default=str, ensure_ascii=False, separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    # -------------------------
+    # Lecture / écriture
+    # -------------------------
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            content = self._memory.get(key)
+            if content is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return content
+
+            if key not in self._disk:
+                self.misses += 1
+                return None
+            self._disk.move_to_end(key)
+
+        try:
+            with open(self._path(key), "rb") as f:
+                content = f.read()
+        except OSError:
+            # Fichier supprimé par un autre worker : on le considère absent
+            with self._lock:
+                self._forget_disk(key)
+                self.misses += 1
+            return None
+
+        # Contenu déjà lu : un fichier évincé entre-temps par un autre worker reste un succès
+        with contextlib.suppress(OSError):
+            os.utime(self._path(key))
+        with self._lock:
+            self.disk_hits += 1
+            self._store_memory(key, content)
+        return content
+
+    def put(self, key: str, content: bytes):
+        tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, self._path(key))
+
+        with self._lock:
+            self._forget_disk(key)
+            self._disk[key] = len(content)
+            self._disk_size += len(content)
+            self._evict_disk()
+            self._store_memory(key, content)
+
+    def get_or_render(self, title: str, data: list, render) -> bytes:
+        """
+        Renvoie le PDF en cache ou le génère via render(title, data) -> bytes.
+        """
+        key = self.key(title, data)
+        content = self.get(key)
+        if content is not None:
+            return content
+
+        content = render(title, data)
+        self.put(key, content)
+        return content
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_size,
+            }
+
+    # -------------------------
+    # Interne (appelé sous verrou)
+    # -------------------------
+
+    def _store_memory(self, key: str, content: bytes):
+        if len(content) > self.memory_limit:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= len(previous)
+        self._memory[key] = content
+        self._memory_size += len(content)
+        while self._memory_size > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+            self.evictions += 1
+
+    def _forget_disk(self, key: str):
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_size -= size
+
+    def _evict_disk(self):
+        while self._disk_size > self.disk_limit and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _load_disk_index(self):
+        # Reconstruire l'ordre LRU à partir des dates de dernier accès (mtime)
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith(".pdf"):
+                # Restes d'un rendu interrompu
+                if name.endswith(".tmp"):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name[:-len(".pdf")], st.st_size))
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+        self._evict_disk()
+
+
+pdf_cache = PdfCache(PDF_CACHE_DIR, PDF_CACHE_MEMORY_BYTES, PDF_CACHE_DISK_BYTES)
@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from app.pdf_utils import get_renderer, render_pdf
+
+# Configuration du moteur de rendu (surchargeable par variables d'environnement)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))          # 0 = rendu dans le thread appelant
+PDF_QUEUE_SIZE = int(os.getenv("PDF_QUEUE_SIZE", "16"))   # rendus en cours + en attente
+PDF_JOB_TIMEOUT = float(os.getenv("PDF_JOB_TIMEOUT", "30"))
+PDF_RETRY_AFTER = int(os.getenv("PDF_RETRY_AFTER", "5"))
+
+
+class PdfEngineBusy(Exception):
+    """File de rendu pleine : le client doit réessayer plus tard."""
+
+
+class PdfEngineTimeout(Exception):
+    """Le rendu a dépassé PDF_JOB_TIMEOUT secondes."""
+
+
+class PdfEngine:
+    """
+    Exécute render_pdf dans un pool de processus dédié, pour que le rendu
+    reportlab (CPU) ne monopolise pas les threads d'Uvicorn.
+    Le nombre de rendus admis est borné : au-delà, PdfEngineBusy est levée
+    immédiatement au lieu de laisser les requêtes s'empiler.
+    """
+
+    def __init__(self, workers: int, queue_size: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(queue_size, 1))
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # "spawn" : les workers ne réimportent que pdf_utils, sans hériter
+                # des connexions SQLite ni des threads du serveur
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=get_renderer,
+                )
+            return self._executor
+
+    def _reset_executor(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def render(self, title: str, data: list) -> bytes:
+        """
+        Même signature que render_pdf ; bloque jusqu'à la fin du rendu.
+        :raises PdfEngineBusy: si la file est pleine
+        :raises PdfEngineTimeout: si le rendu dépasse le délai
+        """
+        return self.run(render_pdf, title, data)
+
+    def run(self, fn, *args):
+        """
+        Exécute fn(*args) dans le pool (fn doit être une fonction de module,
+        importable par les workers) et renvoie son résultat.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise PdfEngineBusy()
+
+        if self.workers <= 0:
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._reset_executor(executor)
+            raise
+        # Le créneau n'est libéré qu'à la fin réelle du rendu, même après un
+        # timeout : un worker bloqué continue de compter dans la file.
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeout:
+            future.cancel()
+            raise PdfEngineTimeout()
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+pdf_engine = PdfEngine(PDF_WORKERS, PDF_QUEUE_SIZE, PDF_JOB_TIMEOUT)
@@ -1,10 +1,14 @@
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
 from reportlab.platypus import (
-    SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+    SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Flowable
 )
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from PIL import Image as PILImage
+from io import BytesIO
 import os
+import threading
 
 # Palette MarineGab
 MARINE_BLUE = colors.HexColor("#003366")
@@ -12,78 +16,234 @@ MARINE_GREEN = colors.HexColor("#007A3D")
 MARINE_GOLD = colors.HexColor("#FFD700")
 MARINE_LIGHT = colors.HexColor("#F5F5F5")
 
-def build_pdf(file_path: str, title: str, data: list, logo_path: str = "app/static/logo.png"):
+# Version du gabarit : à incrémenter à chaque changement de mise en page
+# (invalide automatiquement les PDF mis en cache)
+PDF_TEMPLATE_VERSION = "2"
+
+LOGO_PATH = os.path.join("app", "static", "Logo.png")
+LOGO_HEIGHT = 80        # hauteur affichée (points)
+LOGO_RESOLUTION = 3     # pixels par point conservés après réduction
+
+LONG_REPORT_CHUNK_ROWS = 50   # lignes par tableau en mode rapport long
+
+
+class LogoFlowable(Flowable):
+    """
+    Dessine une image déjà décodée (ImageReader) : contrairement à
+    platypus.Image, aucune relecture du fichier à chaque document.
+    """
+
+    def __init__(self, image: ImageReader, width: float, height: float):
+        super().__init__()
+        self.image = image
+        self.width = width
+        self.height = height
+        self.hAlign = "CENTER"
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.drawImage(self.image, 0, 0, self.width, self.height, mask="auto")
+
+
+class _FlowableStream(list):
+    """
+    Liste de flowables alimentée à la demande : reportlab consomme la liste
+    par la tête (while len(flowables)), on ne garde donc en mémoire que
+    quelques tableaux à la fois.
+    """
+
+    def __init__(self, iterator, lookahead: int = 2):
+        super().__init__()
+        self._iterator = iterator
+        self._lookahead = lookahead
+
+    def __len__(self):
+        while self._iterator is not None and list.__len__(self) < self._lookahead:
+            try:
+                self.append(next(self._iterator))
+            except StopIteration:
+                self._iterator = None
+        return list.__len__(self)
+
+
+class PdfRenderer:
+    """
+    Styles, tableau et logo MarineGab construits une seule fois et
+    réutilisés pour chaque document (un renderer par processus).
+    Rendu invariant (date et identifiant PDF fixes) : même contenu, mêmes octets.
+    """
+
+    def __init__(self, logo_path: str = LOGO_PATH):
+        styles = getSampleStyleSheet()
+
+        # Styles personnalisés
+        self.title_style = ParagraphStyle(
+            'MarineTitle',
+            parent=styles['Title'],
+            fontName="Helvetica-Bold",
+            fontSize=18,
+            textColor=MARINE_BLUE,
+            alignment=1,  # centré
+            spaceAfter=20
+        )
+
+        self.footer_style = ParagraphStyle(
+            'MarineFooter',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=MARINE_BLUE,
+            alignment=1  # centré
+        )
+
+        self.table_style = TableStyle([
+            # En-tête
+            ('BACKGROUND', (0, 0), (-1, 0), MARINE_GREEN),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+
+            # Corps du tableau
+            ('BACKGROUND', (0, 1), (-1, -1), MARINE_LIGHT),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 11),
+            ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
+
+            # Bordures
+            ('GRID', (0, 0), (-1, -1), 0.5, MARINE_BLUE),
+        ])
+
+        # Pied de page valorisant OLOUOMO LAB
+        self.footer_text = (
+            f"MarineGab — Par "
+            f"<font color='{MARINE_GOLD}'><b>OLOUOMO LAB</b></font> © 2025"
+        )
+
+        # Logo décodé et réduit une fois pour toutes
+        self.logo = None
+        self.logo_size = (0, 0)
+        if os.path.exists(logo_path):
+            with PILImage.open(logo_path) as img:
+                width = round(LOGO_HEIGHT * img.width / img.height)
+                img = img.resize((width * LOGO_RESOLUTION, LOGO_HEIGHT * LOGO_RESOLUTION), PILImage.LANCZOS)
+            self.logo = ImageReader(img)
+            self.logo.getRGBData()   # force le décodage maintenant
+            self.logo_size = (width, LOGO_HEIGHT)
+
+    def _heading(self, title: str) -> list:
+        elements = []
+
+        # Logo
+        if self.logo is not None:
+            elements.append(LogoFlowable(self.logo, *self.logo_size))
+            elements.append(Spacer(1, 12))
+
+        # Titre
+        elements.append(Paragraph(f"{title}", self.title_style))
+        elements.append(Spacer(1, 20))
+        return elements
+
+    def build(self, file_path, title: str, data: list):
+        doc = SimpleDocTemplate(file_path, pagesize=A4, invariant=True)
+        elements = self._heading(title)
+
+        # Tableau stylisé
+        table = Table(data, colWidths=[200, 300])
+        table.setStyle(self.table_style)
+        elements.append(table)
+        elements.append(Spacer(1, 20))
+
+        elements.append(Paragraph(self.footer_text, self.footer_style))
+
+        # Génération
+        doc.build(elements)
+
+    def build_long(self, file_path, title: str, header: list, rows, col_widths: list,
+                   summary=None, chunk_rows: int = LONG_REPORT_CHUNK_ROWS):
+        """
+        Rapport multipage pour de grands volumes : les lignes sont lues depuis
+        un itérateur et découpées en tableaux de chunk_rows lignes, chacun avec
+        son en-tête (répété aussi en cas de coupure de page), pages numérotées.
+        :param header: ligne d'en-tête des tableaux
+        :param rows: itérateur de lignes (jamais matérialisé en liste)
+        :param col_widths: largeurs des colonnes
+        :param summary: fonction appelée après la dernière ligne, renvoyant des
+                        lignes [label, valeur] de synthèse (totaux...)
+        """
+        doc = SimpleDocTemplate(file_path, pagesize=A4, invariant=True)
+
+        def number_page(canvas, doc):
+            canvas.saveState()
+            canvas.setFont("Helvetica", 9)
+            canvas.setFillColor(MARINE_BLUE)
+            canvas.drawCentredString(A4[0] / 2, 20, f"{title} — Page {canvas.getPageNumber()}")
+            canvas.restoreState()
+
+        def flowables():
+            yield from self._heading(title)
+
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_rows:
+                    yield self._chunk_table(header, chunk, col_widths)
+                    chunk = []
+            if chunk:
+                yield self._chunk_table(header, chunk, col_widths)
+            yield Spacer(1, 20)
+
+            if summary is not None:
+                table = Table(summary(), colWidths=[200, 300])
+                table.setStyle(self.table_style)
+                yield table
+                yield Spacer(1, 20)
+
+            yield Paragraph(self.footer_text, self.footer_style)
+
+        doc.build(_FlowableStream(flowables()), onFirstPage=number_page, onLaterPages=number_page)
+
+    def _chunk_table(self, header: list, chunk: list, col_widths: list) -> Table:
+        table = Table([header] + chunk, colWidths=col_widths, repeatRows=1)
+        table.setStyle(self.table_style)
+        return table
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer() -> PdfRenderer:
+    """
+    Renderer partagé du processus courant, créé au premier appel
+    (au démarrage de l'application et de chaque worker de rendu).
+    """
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = PdfRenderer()
+    return _renderer
+
+
+def build_pdf(file_path, title: str, data: list):
     """
     Génère un PDF stylisé avec logo, titre, tableau et pied de page.
-    :param file_path: chemin du fichier PDF à générer
+    :param file_path: chemin du fichier PDF à générer, ou objet fichier (BytesIO...)
     :param title: titre du document
     :param data: liste de listes [[label, valeur], ...]
-    :param logo_path: chemin du logo MarineGab
     """
-    doc = SimpleDocTemplate(file_path, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-
-    # Styles personnalisés
-    title_style = ParagraphStyle(
-        'MarineTitle',
-        parent=styles['Title'],
-        fontName="Helvetica-Bold",
-        fontSize=18,
-        textColor=MARINE_BLUE,
-        alignment=1,  # centré
-        spaceAfter=20
-    )
-
-    footer_style = ParagraphStyle(
-        'MarineFooter',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=MARINE_BLUE,
-        alignment=1  # centré
-    )
-
-    # Logo
-    if os.path.exists(logo_path):
-        elements.append(Image(logo_path, width=80, height=80))
-        elements.append(Spacer(1, 12))
-
-    # Titre
-    elements.append(Paragraph(f"{title}", title_style))
-    elements.append(Spacer(1, 20))
-
-    # Tableau stylisé
-    table = Table(data, colWidths=[200, 300])
-    table.setStyle(TableStyle([
-        # En-tête
-        ('BACKGROUND', (0, 0), (-1, 0), MARINE_GREEN),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-
-        # Corps du tableau
-        ('BACKGROUND', (0, 1), (-1, -1), MARINE_LIGHT),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 11),
-        ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-
-        # Bordures
-        ('GRID', (0, 0), (-1, -1), 0.5, MARINE_BLUE),
-    ]))
-    elements.append(table)
-    elements.append(Spacer(1, 20))
-
-    # Pied de page valorisant OLOUOMO LAB
-    footer_text = (
-        f"MarineGab — Par "
-        f"<font color='{MARINE_GOLD}'><b>OLOUOMO LAB</b></font> © 2025"
-    )
-    footer = Paragraph(footer_text, footer_style)
-    elements.append(footer)
-
-    # Génération
-    doc.build(elements)
+    get_renderer().build(file_path, title, data)
+
+
+def render_pdf(title: str, data: list) -> bytes:
+    """
+    Génère le PDF entièrement en mémoire et renvoie son contenu.
+    """
+    buffer = BytesIO()
+    build_pdf(buffer, title, data)
+    return buffer.getvalue()
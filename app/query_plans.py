@@ -0,0 +1,123 @@
+"""
+Contrôle de non-régression des plans de requête (SQLite).
+
+Crée une base temporaire via la chaîne de migrations Alembic, puis vérifie
+avec EXPLAIN QUERY PLAN que chaque requête « chaude » utilise un index.
+Seuls les accès SEARCH (recherche dans un index) sont acceptés ; un SCAN,
+même d'un index, parcourt toute la table ou tout l'index. Exception : les
+requêtes de FULL_SCAN_EXPECTED (agrégats GROUP BY sur toute la table), pour
+lesquelles seul le parcours d'un index couvrant est admis. Sort en erreur
+(code 1) si l'une des requêtes retombe sur un parcours :
+
+    python -m app.query_plans
+"""
+import os
+import sys
+import tempfile
+from datetime import date
+
+from sqlalchemy import create_engine, func, select
+
+from app import models
+from app.database import run_migrations
+
+
+def hot_queries() -> dict:
+    d1, d2 = date(2025, 1, 1), date(2025, 3, 31)
+    return {
+        "marchandises d'un navire": select(models.Marchandise).where(models.Marchandise.navire_id == 1),
+        "navire par IMO": select(models.Navire).where(models.Navire.imo == "1234567"),
+        "navires à quai": select(func.count(models.Navire.id)).where(models.Navire.statut_actuel == "à quai"),
+        "inspections de la période": select(func.count(models.Inspection.id))
+            .where(models.Inspection.date.between(d1, d2)),
+        "inspections du mois": select(func.count(models.Inspection.id)).where(models.Inspection.date >= d1),
+        "audits par inspecteur": select(models.Inspection.inspecteur, func.count(models.Inspection.id))
+            .group_by(models.Inspection.inspecteur),
+        "historique d'un navire": select(models.Inspection)
+            .where(models.Inspection.navire_imo == "1234567").order_by(models.Inspection.date),
+        "inspections d'un port sur une période": select(models.Inspection)
+            .where(models.Inspection.port_nom == "Owendo", models.Inspection.date.between(d1, d2)),
+        "déclarations d'un navire": select(models.Declaration)
+            .where(models.Declaration.navire_imo == "1234567").order_by(models.Declaration.date),
+        "déclarations de la période": select(models.Declaration)
+            .where(models.Declaration.date.between(d1, d2)),
+        "marchandise par tracking": select(models.Marchandise)
+            .where(models.Marchandise.tracking_number == "TRK-1"),
+        # Pages de liste (pagination par curseur)
+        "page des navires par nom": select(models.Navire)
+            .where(models.Navire.nom > "M").order_by(models.Navire.nom, models.Navire.id).limit(51),
+        "page des marchandises par poids": select(models.Marchandise)
+            .where(models.Marchandise.poids > 10).order_by(models.Marchandise.poids, models.Marchandise.id).limit(51),
+        "page des inspections par date": select(models.Inspection)
+            .where(models.Inspection.date < d2)
+            .order_by(models.Inspection.date.desc(), models.Inspection.id.desc()).limit(51),
+        "page des déclarations par date": select(models.Declaration)
+            .where(models.Declaration.date < d2)
+            .order_by(models.Declaration.date.desc(), models.Declaration.id.desc()).limit(51),
+        # Agrégats statistiques (pages /stats)
+        "agrégat inspections de la période": select(func.sum(models.StatInspectionJour.nombre))
+            .where(models.StatInspectionJour.date.between(d1, d2)),
+        "agrégat audits par inspecteur": select(models.StatInspectionJour.inspecteur,
+                                                func.sum(models.StatInspectionJour.nombre))
+            .group_by(models.StatInspectionJour.inspecteur),
+        "agrégat navires à quai": select(models.StatNavireStatut.nombre)
+            .where(models.StatNavireStatut.statut == "à quai"),
+        "chargement d'un navire": select(models.StatChargementNavire.poids)
+            .where(models.StatChargementNavire.navire_id == 1),
+        "prochaine déclaration en attente": select(models.DeclarationJob.id)
+            .where(models.DeclarationJob.statut == "en attente")
+            .order_by(models.DeclarationJob.id).limit(1),
+    }
+
+
+# Requêtes qui lisent par nature toutes les lignes (GROUP BY sans filtre) :
+# un parcours d'index couvrant y est attendu, jamais un parcours de la table.
+FULL_SCAN_EXPECTED = {
+    "audits par inspecteur",
+    "agrégat audits par inspecteur",
+}
+
+
+def full_scans(plan_rows, covering_scan_allowed: bool = False) -> list:
+    """
+    Lignes du plan qui parcourent une table ou un index (« SCAN … »), y
+    compris « SCAN … USING INDEX ». Avec covering_scan_allowed, le parcours
+    d'un index couvrant (« SCAN … USING COVERING INDEX ») est toléré.
+    """
+    return [
+        detail for detail in plan_rows
+        if detail.startswith("SCAN ")
+        and not (covering_scan_allowed and " USING COVERING INDEX " in detail)
+    ]
+
+
+def check(url: str) -> list:
+    engine = create_engine(url)
+    failures = []
+    with engine.connect() as conn:
+        for label, stmt in hot_queries().items():
+            compiled = stmt.compile(dialect=engine.dialect)
+            params = tuple(compiled.params[name] for name in compiled.positiontup)
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+            details = [row[-1] for row in rows]
+            scans = full_scans(details, covering_scan_allowed=label in FULL_SCAN_EXPECTED)
+            status = "SCAN" if scans else "ok"
+            print(f"[{status:>4}] {label}: {' | '.join(details)}")
+            if scans:
+                failures.append(label)
+    engine.dispose()
+    return failures
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'plans.db')}"
+        run_migrations(url)
+        failures = check(url)
+    if failures:
+        print(f"{len(failures)} requête(s) en parcours complet : {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+from io import BytesIO
+
+from app import models
+from app.database import SessionLocal
+from app.pdf_utils import get_renderer
+
+CARGO_MANIFEST_HEADER = ["Tracking", "Marchandise", "Type", "Poids (t)", "Volume (m³)"]
+CARGO_MANIFEST_COL_WIDTHS = [110, 140, 90, 80, 80]
+CARGO_MANIFEST_FETCH_SIZE = 500
+
+
+def render_cargo_manifest(navire_id: int) -> bytes | None:
+    """
+    Manifeste de cargaison d'un navire (mode rapport long).
+    Exécuté dans un worker de rendu : les marchandises sont lues par paquets
+    directement depuis la base, sans jamais charger toute la cargaison.
+    Renvoie None si le navire n'existe pas.
+    """
+    db = SessionLocal()
+    try:
+        navire = db.query(models.Navire).filter(models.Navire.id == navire_id).first()
+        if not navire:
+            return None
+
+        totals = {"count": 0, "poids": 0.0, "volume": 0.0}
+
+        def rows():
+            query = db.query(
+                models.Marchandise.tracking_number,
+                models.Marchandise.nom,
+                models.Marchandise.type,
+                models.Marchandise.poids,
+                models.Marchandise.volume,
+            ).filter(
+                models.Marchandise.navire_id == navire_id
+            ).order_by(models.Marchandise.id).yield_per(CARGO_MANIFEST_FETCH_SIZE)
+
+            for tracking, nom, type_, poids, volume in query:
+                totals["count"] += 1
+                totals["poids"] += poids or 0
+                totals["volume"] += volume or 0
+                yield [tracking, nom, type_ or "N/A", poids, volume]
+
+        def summary():
+            return [
+                ["Synthèse", "Valeur"],
+                ["Navire", f"{navire.nom} — IMO: {navire.imo}"],
+                ["Nombre de marchandises", totals["count"]],
+                ["Poids total (tonnes)", round(totals["poids"], 2)],
+                ["Volume total (m³)", round(totals["volume"], 2)],
+            ]
+
+        buffer = BytesIO()
+        get_renderer().build_long(
+            buffer,
+            f"MarineGab — Manifeste de cargaison {navire.nom}",
+            CARGO_MANIFEST_HEADER,
+            rows(),
+            CARGO_MANIFEST_COL_WIDTHS,
+            summary=summary,
+        )
+        return buffer.getvalue()
+    finally:
+        db.close()
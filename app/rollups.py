@@ -0,0 +1,185 @@
+"""
+Agrégats statistiques tenus à jour à chaque écriture :
+  - stats_inspections_jour  : inspections par jour / port / inspecteur ;
+  - stats_navires_statut    : navires par statut ;
+  - stats_chargement_navire : poids, volume et nombre de marchandises par navire.
+
+Les pages /stats n'interrogent plus les grandes tables : une période se
+résume à une somme sur quelques lignes pré-agrégées. Le chargement d'un
+navire se lit sur une seule ligne (contrôle de capacité, vue de la flotte).
+
+Recalcul complet (après import direct en base, par exemple) :
+    python -m app.rollups backfill
+"""
+import argparse
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import dialect_insert
+
+
+def _upsert(db: Session, model, keys: dict, deltas: dict, returning=None):
+    """INSERT … ON CONFLICT DO UPDATE colonne = colonne + delta (atomique)."""
+    columns = model.__table__.c
+    stmt = dialect_insert(db, model).values(**keys, **deltas).on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: columns[name] + delta for name, delta in deltas.items()},
+    )
+    if returning is not None:
+        return db.execute(stmt.returning(returning)).scalar_one()
+    db.execute(stmt)
+
+
+# -------------------------
+# Inspections
+# -------------------------
+
+def inspection_key(inspection: models.Inspection) -> tuple:
+    return inspection.date, inspection.port_nom, inspection.inspecteur
+
+
+def count_inspection(db: Session, key: tuple, delta: int):
+    """À appeler dans la même transaction que l'écriture de l'inspection."""
+    day, port_nom, inspecteur = key
+    _upsert(db, models.StatInspectionJour,
+            {"date": day, "port_nom": port_nom, "inspecteur": inspecteur}, {"nombre": delta})
+
+
+# -------------------------
+# Navires
+# -------------------------
+
+def count_navire(db: Session, statut: str | None, delta: int):
+    _upsert(db, models.StatNavireStatut, {"statut": statut or ""}, {"nombre": delta})
+
+
+def move_navire(db: Session, old_statut: str | None, new_statut: str | None):
+    if (old_statut or "") != (new_statut or ""):
+        count_navire(db, old_statut, -1)
+        count_navire(db, new_statut, +1)
+
+
+# -------------------------
+# Chargement des navires
+# -------------------------
+
+def add_cargo(db: Session, navire_id: int, poids: float, volume: float, nombre: int) -> float:
+    """
+    Ajoute des totaux (négatifs pour un retrait) au chargement du navire.
+    Renvoie le poids total après l'écriture : la ligne est verrouillée par
+    l'upsert, le contrôle de capacité qui suit ne peut pas être doublé par
+    une écriture concurrente.
+    """
+    S = models.StatChargementNavire
+    return _upsert(db, S, {"navire_id": navire_id},
+                   {"poids": poids, "volume": volume, "nombre": nombre}, returning=S.poids)
+
+
+def count_cargo(db: Session, navire_id: int, poids: float, volume: float, delta: int) -> float:
+    """Ajoute (delta=+1) ou retire (delta=-1) une marchandise du chargement du navire."""
+    return add_cargo(db, navire_id, delta * poids, delta * volume, delta)
+
+
+def over_capacity(charge: float, tonnage: float | None) -> bool:
+    # Tonnage non renseigné : pas de contrôle ; marge pour les cumuls de flottants
+    return tonnage is not None and charge > tonnage + 1e-6
+
+
+# -------------------------
+# Lecture
+# -------------------------
+
+def inspections_count(db: Session, d1, d2) -> int:
+    S = models.StatInspectionJour
+    return db.query(func.coalesce(func.sum(S.nombre), 0)).filter(S.date.between(d1, d2)).scalar()
+
+
+def navires_counts(db: Session) -> tuple:
+    """(total, à quai)"""
+    S = models.StatNavireStatut
+    total = db.query(func.coalesce(func.sum(S.nombre), 0)).scalar()
+    a_quai = db.query(S.nombre).filter(S.statut == "à quai").scalar() or 0
+    return total, a_quai
+
+
+def marchandises_count(db: Session) -> int:
+    """Nombre total de marchandises (somme des totaux par navire)."""
+    S = models.StatChargementNavire
+    return db.query(func.coalesce(func.sum(S.nombre), 0)).scalar()
+
+
+def audits_par_inspecteur(db: Session) -> list:
+    S = models.StatInspectionJour
+    return db.query(S.inspecteur, func.sum(S.nombre)).group_by(S.inspecteur)\
+        .having(func.sum(S.nombre) > 0).all()
+
+
+def chargement_flotte(db: Session) -> list:
+    """Navires avec leurs totaux de cargaison, les plus chargés (en % du tonnage) d'abord."""
+    N, S = models.Navire, models.StatChargementNavire
+    rows = db.execute(
+        select(N.id, N.nom, N.imo, N.tonnage,
+               func.coalesce(S.poids, 0).label("poids"),
+               func.coalesce(S.volume, 0).label("volume"),
+               func.coalesce(S.nombre, 0).label("nombre"))
+        .outerjoin(S, S.navire_id == N.id)
+    ).all()
+    flotte = [
+        {**row._asdict(), "taux": row.poids / row.tonnage if row.tonnage else None}
+        for row in rows
+    ]
+    flotte.sort(key=lambda n: (n["taux"] is None, -(n["taux"] or 0), -n["poids"]))
+    return flotte
+
+
+# -------------------------
+# Recalcul complet
+# -------------------------
+
+def backfill(db: Session):
+    I, SI = models.Inspection, models.StatInspectionJour
+    N, SN = models.Navire, models.StatNavireStatut
+
+    db.execute(delete(SI))
+    db.execute(insert(SI).from_select(
+        ["date", "port_nom", "inspecteur", "nombre"],
+        select(I.date, I.port_nom, I.inspecteur, func.count())
+        .group_by(I.date, I.port_nom, I.inspecteur),
+    ))
+
+    statut = func.coalesce(N.statut_actuel, "")
+    db.execute(delete(SN))
+    db.execute(insert(SN).from_select(
+        ["statut", "nombre"],
+        select(statut, func.count()).group_by(statut),
+    ))
+
+    M, SC = models.Marchandise, models.StatChargementNavire
+    db.execute(delete(SC))
+    db.execute(insert(SC).from_select(
+        ["navire_id", "poids", "volume", "nombre"],
+        select(M.navire_id, func.sum(M.poids), func.sum(M.volume), func.count())
+        .group_by(M.navire_id),
+    ))
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agrégats statistiques MarineGab")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("backfill", help="recalcule tous les agrégats depuis les tables sources")
+    parser.parse_args()
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        backfill(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Recherche plein texte : rapports / observations des inspections,
+nom / autres informations des navires.
+
+  - SQLite : tables FTS5 (inspections_fts, navires_fts) tenues à jour par
+    des triggers. Seules les SEARCH_RANK_WINDOW correspondances les plus
+    récentes sont classées par bm25 : un terme présent dans la moitié des
+    rapports ne force pas le classement d'un million de lignes. Les extraits
+    sont construits ici, sur les seules lignes renvoyées ;
+  - PostgreSQL : index GIN sur to_tsvector('french', …), classement
+    ts_rank, extraits via ts_headline.
+
+Les index sont créés par la migration 0006. Les extraits sont échappés ici :
+seules les balises <mark> des termes trouvés sont insérées.
+"""
+import os
+import re
+import unicodedata
+
+from markupsafe import Markup, escape
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+SEARCH_RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "1000"))
+SNIPPET_WORDS = 16
+
+# Objets créés par la migration 0006, hors des modèles (ignorés par alembic check)
+SEARCH_TABLES = ("inspections_fts", "navires_fts")
+SEARCH_PG_INDEXES = ("ix_inspections_recherche", "ix_navires_recherche")
+
+# Documents indexés sous PostgreSQL : identiques aux expressions des index GIN
+INSPECTION_DOCUMENT_PG = "coalesce(rapport, '') || ' ' || coalesce(observations, '')"
+NAVIRE_DOCUMENT_PG = "coalesce(nom, '') || ' ' || coalesce(autres, '')"
+
+# Délimiteurs des termes trouvés, remplacés par <mark> après échappement
+_START, _STOP = "\x02", "\x03"
+
+
+def is_search_object(name: str) -> bool:
+    return name in SEARCH_PG_INDEXES or any(
+        name == table or name.startswith(f"{table}_") for table in SEARCH_TABLES
+    )
+
+
+def terms(q: str) -> list:
+    """Mots de la saisie (la ponctuation et les opérateurs sont ignorés)."""
+    return re.findall(r"\w+", q or "")[:10]
+
+
+def _fts5_query(words: list) -> str:
+    # Chaque mot entre guillemets ; le dernier en préfixe (saisie en cours)
+    return " ".join(f'"{w}"' for w in words[:-1]) + f' "{words[-1]}"*'
+
+
+def _tsquery(words: list) -> str:
+    return " & ".join(words[:-1] + [f"{words[-1]}:*"])
+
+
+def _highlight(fragment: str | None) -> Markup:
+    safe = str(escape(fragment or ""))
+    return Markup(safe.replace(_START, "<mark>").replace(_STOP, "</mark>"))
+
+
+def _fold(word: str) -> str:
+    """Minuscules sans accents, comme le tokenizer FTS5 (remove_diacritics)."""
+    decomposed = unicodedata.normalize("NFKD", word.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _excerpt(texts: tuple, words: list) -> Markup:
+    """Extrait du premier texte qui contient un terme, termes surlignés."""
+    exact = {_fold(w) for w in words[:-1]}
+    prefix = _fold(words[-1])
+
+    def hit(token: str) -> bool:
+        folded = _fold(token)
+        return folded in exact or folded.startswith(prefix)
+
+    for text_value in texts:
+        tokens = list(re.finditer(r"\w+", text_value or ""))
+        hits = [i for i, m in enumerate(tokens) if hit(m.group())]
+        if not hits:
+            continue
+        first = max(hits[0] - SNIPPET_WORDS // 4, 0)
+        last = min(first + SNIPPET_WORDS, len(tokens))
+        start, end = tokens[first].start(), tokens[last - 1].end()
+        parts, pos = ["…" if start else ""], start
+        for m in tokens[first:last]:
+            if hit(m.group()):
+                parts += [escape(text_value[pos:m.start()]), Markup("<mark>%s</mark>") % m.group()]
+                pos = m.end()
+        parts += [escape(text_value[pos:end]), "…" if end < len(text_value) else ""]
+        return Markup("").join(parts)
+    return Markup("")
+
+
+def _fts5_search(db: Session, fts: str, table: str, columns: str, indexed: tuple,
+                 words: list, limit: int, weights: str = "") -> list:
+    # Les plus récentes correspondances (rowid décroissant, lu dans l'ordre de
+    # l'index) sont classées par bm25, puis les textes sont relus pour l'extrait
+    stmt = text(f"""
+        SELECT {columns}, {", ".join(f"t.{c} AS texte_{i}" for i, c in enumerate(indexed))}
+        FROM (
+            SELECT rowid AS id, bm25({fts}{weights}) AS rang
+            FROM {fts}
+            WHERE {fts} MATCH :q
+            ORDER BY rowid DESC
+            LIMIT :window
+        ) AS candidats
+        JOIN {table} AS t ON t.id = candidats.id
+        ORDER BY candidats.rang
+        LIMIT :limit
+    """)
+    params = {"q": _fts5_query(words), "window": max(SEARCH_RANK_WINDOW, limit), "limit": limit}
+    results = []
+    for row in db.execute(stmt, params):
+        values = row._asdict()
+        texts = tuple(values.pop(f"texte_{i}") for i in range(len(indexed)))
+        results.append({**values, "extrait": _excerpt(texts, words)})
+    return results
+
+
+def search_inspections(db: Session, q: str, limit: int = SEARCH_DEFAULT_LIMIT) -> list:
+    words = terms(q)
+    if not words:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        stmt = text(f"""
+            SELECT i.id, i.date, i.navire_imo, i.port_nom, i.inspecteur,
+                   ts_headline('french', {INSPECTION_DOCUMENT_PG}, query,
+                               'StartSel=' || chr(2) || ', StopSel=' || chr(3)
+                               || ', MaxFragments=2, MaxWords=20, MinWords=8') AS extrait
+            FROM (
+                SELECT inspections.*, query,
+                       ts_rank(to_tsvector('french', {INSPECTION_DOCUMENT_PG}), query) AS rang
+                FROM inspections, to_tsquery('french', :q) AS query
+                WHERE to_tsvector('french', {INSPECTION_DOCUMENT_PG}) @@ query
+                ORDER BY rang DESC
+                LIMIT :limit
+            ) AS i
+            ORDER BY i.rang DESC
+        """)
+        params = {"q": _tsquery(words), "limit": limit}
+    else:
+        return _fts5_search(db, "inspections_fts", "inspections",
+                            "t.id, t.date, t.navire_imo, t.port_nom, t.inspecteur",
+                            ("rapport", "observations"), words, limit)
+    return [
+        {**row._asdict(), "extrait": _highlight(row.extrait)}
+        for row in db.execute(stmt, params)
+    ]
+
+
+def search_navires(db: Session, q: str, limit: int = SEARCH_DEFAULT_LIMIT) -> list:
+    words = terms(q)
+    if not words:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        stmt = text(f"""
+            SELECT n.id, n.imo, n.nom, n.statut_actuel,
+                   ts_headline('french', {NAVIRE_DOCUMENT_PG}, query,
+                               'StartSel=' || chr(2) || ', StopSel=' || chr(3)) AS extrait
+            FROM (
+                SELECT navires.*, query,
+                       ts_rank(to_tsvector('french', {NAVIRE_DOCUMENT_PG}), query) AS rang
+                FROM navires, to_tsquery('french', :q) AS query
+                WHERE to_tsvector('french', {NAVIRE_DOCUMENT_PG}) @@ query
+                ORDER BY rang DESC
+                LIMIT :limit
+            ) AS n
+            ORDER BY n.rang DESC
+        """)
+        params = {"q": _tsquery(words), "limit": limit}
+    else:
+        # Le nom pèse double dans le classement
+        return _fts5_search(db, "navires_fts", "navires", "t.id, t.imo, t.nom, t.statut_actuel",
+                            ("nom", "autres"), words, limit, weights=", 2.0, 1.0")
+    return [
+        {**row._asdict(), "extrait": _highlight(row.extrait)}
+        for row in db.execute(stmt, params)
+    ]
+
+
+def search_all(db: Session, q: str, limit: int = SEARCH_DEFAULT_LIMIT) -> dict:
+    return {
+        "inspections": search_inspections(db, q, limit),
+        "navires": search_navires(db, q, limit),
+    }
@@ -0,0 +1,220 @@
+"""
+Stockage des PDF de déclaration.
+
+Les documents sont adressés par leur contenu (sha256) : deux déclarations
+identiques partagent le même fichier. Deux backends :
+  - "local" : arborescence répartie en sous-dossiers (ab/cd/<hash>.pdf) ;
+  - "s3"    : tout service compatible S3 (AWS, MinIO local...), via boto3
+              (dépendance optionnelle, chargée uniquement pour ce backend :
+              pip install -r requirements-s3.txt).
+
+Nettoyage (à planifier, ex. cron) :
+    python -m app.storage gc [--retention-days N] [--grace-hours H] [--dry-run]
+"""
+import argparse
+import hashlib
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+# Configuration (surchargeable par variables d'environnement)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+STORAGE_LOCAL_DIR = os.getenv("STORAGE_LOCAL_DIR", os.path.join("app", "data", "documents"))
+S3_BUCKET = os.getenv("S3_BUCKET", "marinegab-documents")
+S3_PREFIX = os.getenv("S3_PREFIX", "declarations/")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")   # ex. http://localhost:9000 pour MinIO
+DECLARATION_RETENTION_DAYS = int(os.getenv("DECLARATION_RETENTION_DAYS", "0"))   # 0 = illimitée
+STORAGE_GC_GRACE_HOURS = float(os.getenv("STORAGE_GC_GRACE_HOURS", "24"))
+
+# Anciennes déclarations : PDF écrits directement dans app/static
+LEGACY_DIR = os.path.join("app", "static")
+
+
+def content_key(content: bytes) -> str:
+    return f"{hashlib.sha256(content).hexdigest()}.pdf"
+
+
+def is_content_key(key: str) -> bool:
+    digest = key[:-len(".pdf")] if key.endswith(".pdf") else ""
+    return len(digest) == 64 and all(c in "0123456789abcdef" for c in digest)
+
+
+class LocalStorage:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, content: bytes) -> str:
+        key = content_key(content)
+        path = self._path(key)
+        if os.path.exists(path):
+            # Doublon : on rafraîchit la date pour le protéger du GC
+            os.utime(path)
+            return key
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        return key
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self):
+        """Itère sur (clé, date de modification UTC)."""
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if is_content_key(name):
+                    mtime = os.stat(os.path.join(dirpath, name)).st_mtime
+                    yield name, datetime.fromtimestamp(mtime, tz=timezone.utc)
+
+
+class S3Storage:
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str | None = None):
+        import boto3   # dépendance optionnelle
+
+        self.bucket = bucket
+        self.prefix = prefix
+        # Identifiants : variables AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY habituelles
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        self._missing = (self.client.exceptions.NoSuchKey,)
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def put(self, content: bytes) -> str:
+        from botocore.exceptions import ClientError
+
+        key = content_key(content)
+        object_key = self._object_key(key)
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=object_key)
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey", "NotFound"):
+                raise
+            self.client.put_object(
+                Bucket=self.bucket, Key=object_key, Body=content, ContentType="application/pdf"
+            )
+        else:
+            # Doublon : copie sur place pour rafraîchir LastModified (protection GC)
+            self.client.copy_object(
+                Bucket=self.bucket, Key=object_key,
+                CopySource={"Bucket": self.bucket, "Key": object_key},
+                MetadataDirective="REPLACE", ContentType="application/pdf",
+            )
+        return key
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        except self._missing:
+            return None
+        return obj["Body"].read()
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def list(self):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                key = obj["Key"][len(self.prefix):]
+                if is_content_key(key):
+                    yield key, obj["LastModified"]
+
+
+def create_storage():
+    if STORAGE_BACKEND == "local":
+        return LocalStorage(STORAGE_LOCAL_DIR)
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL)
+    raise ValueError(f"STORAGE_BACKEND inconnu : {STORAGE_BACKEND}")
+
+
+document_storage = create_storage()
+
+
+def load_declaration_pdf(fichier_pdf: str) -> bytes | None:
+    """
+    Contenu du PDF d'une déclaration : stockage courant, ou ancien fichier
+    de app/static pour les déclarations antérieures au stockage par contenu.
+    """
+    if is_content_key(fichier_pdf):
+        return document_storage.get(fichier_pdf)
+    path = os.path.join(LEGACY_DIR, os.path.basename(fichier_pdf))
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    return None
+
+
+# -------------------------
+# Rétention / GC
+# -------------------------
+
+def collect_garbage(db, retention_days: int = DECLARATION_RETENTION_DAYS,
+                    grace_hours: float = STORAGE_GC_GRACE_HOURS, dry_run: bool = False) -> dict:
+    """
+    1. Rétention : supprime les déclarations plus anciennes que retention_days (0 = jamais).
+    2. GC : supprime les documents qui ne sont plus référencés par aucune déclaration.
+       Les documents récents (< grace_hours) sont épargnés : leur déclaration
+       est peut-être en cours d'enregistrement.
+    """
+    from app import models
+
+    expired = 0
+    if retention_days > 0:
+        limit = date.today() - timedelta(days=retention_days)
+        query = db.query(models.Declaration).filter(models.Declaration.date < limit)
+        expired = query.count()
+        if not dry_run:
+            query.delete(synchronize_session=False)
+            db.commit()
+
+    referenced = {key for (key,) in db.query(models.Declaration.fichier_pdf).distinct()}
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=grace_hours)
+    removed = 0
+    for key, modified in document_storage.list():
+        if key in referenced or modified > cutoff:
+            continue
+        removed += 1
+        if not dry_run:
+            document_storage.delete(key)
+
+    return {"declarations_expirees": expired, "documents_supprimes": removed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stockage des documents MarineGab")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gc = sub.add_parser("gc", help="rétention des déclarations et suppression des documents orphelins")
+    gc.add_argument("--retention-days", type=int, default=DECLARATION_RETENTION_DAYS)
+    gc.add_argument("--grace-hours", type=float, default=STORAGE_GC_GRACE_HOURS)
+    gc.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(collect_garbage(db, args.retention_days, args.grace_hours, args.dry_run))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
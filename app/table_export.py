@@ -0,0 +1,129 @@
+"""
+Export des tables en CSV ou JSONL : /export/{table}.csv|.jsonl
+
+Les lignes sont lues par paquets avec un curseur côté serveur (yield_per :
+curseur nommé sous PostgreSQL, lecture progressive sous SQLite) et envoyées
+au fil de l'eau : la mémoire reste constante quel que soit le volume.
+Filtres optionnels en paramètres d'URL, comme sur les pages de liste.
+"""
+import csv
+import io
+import json
+from datetime import date
+
+from sqlalchemy import select
+
+from app import models
+from app.database import SessionLocal
+from app.pagination import parse_date
+
+EXPORT_FETCH_SIZE = 1000      # lignes lues par aller-retour base
+EXPORT_CHUNK_ROWS = 500       # lignes par morceau envoyé au client
+
+FORMATS = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+
+
+def _equals(column):
+    return lambda value: column == value
+
+
+def _since(column):
+    return lambda value: column >= parse_date(value)
+
+
+def _until(column):
+    return lambda value: column <= parse_date(value)
+
+
+def _integer(column):
+    def clause(value):
+        if not value.isdigit():
+            raise ValueError(f"entier attendu : {value!r}")
+        return column == int(value)
+    return clause
+
+
+# {table: (modèle, {paramètre d'URL: fabrique de condition})}
+EXPORTS = {
+    "navires": (models.Navire, {
+        "statut": _equals(models.Navire.statut_actuel),
+        "pavillon": _equals(models.Navire.pavillon),
+        "type": _equals(models.Navire.type),
+    }),
+    "ports": (models.Port, {
+        "pays": _equals(models.Port.pays),
+        "type": _equals(models.Port.type),
+    }),
+    "marchandises": (models.Marchandise, {
+        "navire_id": _integer(models.Marchandise.navire_id),
+        "type": _equals(models.Marchandise.type),
+    }),
+    "inspections": (models.Inspection, {
+        "port": _equals(models.Inspection.port_nom),
+        "navire_imo": _equals(models.Inspection.navire_imo),
+        "inspecteur": _equals(models.Inspection.inspecteur),
+        "date_debut": _since(models.Inspection.date),
+        "date_fin": _until(models.Inspection.date),
+    }),
+    "declarations": (models.Declaration, {
+        "type": _equals(models.Declaration.type),
+        "navire_imo": _equals(models.Declaration.navire_imo),
+        "date_debut": _since(models.Declaration.date),
+        "date_fin": _until(models.Declaration.date),
+    }),
+    "manifests": (models.Manifest, {
+        "navire_imo": _equals(models.Manifest.navire_imo),
+        "port_depart": _equals(models.Manifest.port_depart_nom),
+        "port_arrivee": _equals(models.Manifest.port_arrivee_nom),
+        "date_debut": _since(models.Manifest.date),
+        "date_fin": _until(models.Manifest.date),
+    }),
+}
+
+
+def build_export_query(table: str, params):
+    """
+    Requête d'export filtrée (colonnes brutes, pas d'objets ORM).
+    Lève ValueError si un filtre est invalide ; les paramètres inconnus sont ignorés.
+    """
+    model, filters = EXPORTS[table]
+    query = select(*model.__table__.columns).order_by(model.id)
+    for name, clause in filters.items():
+        value = params.get(name)
+        if value:
+            query = query.where(clause(value))
+    return query
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Type non sérialisable : {type(value).__name__}")
+
+
+def stream_table(query, fmt: str):
+    """Générateur d'octets ; session dédiée, le flux survit à la requête HTTP."""
+    db = SessionLocal()
+    try:
+        result = db.execute(query.execution_options(yield_per=EXPORT_FETCH_SIZE))
+        columns = list(result.keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if fmt == "csv" else None
+        if writer:
+            writer.writerow(columns)
+
+        for partition in result.partitions(EXPORT_CHUNK_ROWS):
+            for row in partition:
+                if writer:
+                    writer.writerow(row)
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False,
+                                            default=_json_default))
+                    buffer.write("\n")
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if writer and buffer.tell():
+            yield buffer.getvalue().encode("utf-8")   # en-tête d'un export vide
+    finally:
+        db.close()
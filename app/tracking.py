@@ -0,0 +1,162 @@
+"""
+Suivi d'une marchandise par numéro de tracking : /marchandises/track/{numéro}
+
+Une seule requête par l'index unique de marchandises.tracking_number :
+marchandise, navire porteur et dernière déclaration de ce navire (index
+declarations(navire_imo, date)). Les réponses passent par un cache LRU à
+durée de vie limitée : les numéros suivis en boucle par les clients ne
+touchent plus la base.
+
+Invalidation :
+  - ajout / modification / suppression d'une marchandise : ses numéros ;
+  - écritures qui touchent le navire ou ses déclarations (navire modifié ou
+    supprimé, import, nouvelle déclaration) : tout le cache.
+Les numéros inconnus sont aussi mis en cache (réponse 404), d'où
+l'invalidation à l'ajout. Le TTL rattrape les écritures faites hors de
+l'application. Cache propre à chaque processus.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+
+# Configuration (surchargeable par variables d'environnement)
+TRACKING_CACHE_SIZE = int(os.getenv("TRACKING_CACHE_SIZE", "10000"))
+TRACKING_CACHE_TTL = float(os.getenv("TRACKING_CACHE_TTL", "60"))
+
+_MISSING = object()
+
+
+class TrackingCache:
+    """
+    LRU + TTL. Toute invalidation incrémente une génération : une réponse lue
+    en base pendant une écriture concurrente n'est pas mise en cache.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # numéro -> (expiration, réponse ou None)
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        """Renvoie (réponse, None ou _MISSING, génération)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], self._generation
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return _MISSING, self._generation
+
+    def put(self, key: str, value, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys: str):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+
+def tracking_query(tracking_number: str):
+    # Dernière déclaration du navire : sous-requête corrélée, servie par l'index
+    derniere_declaration = (
+        select(models.Declaration.id)
+        .where(models.Declaration.navire_imo == models.Navire.imo)
+        .order_by(models.Declaration.date.desc(), models.Declaration.id.desc())
+        .limit(1)
+        .correlate(models.Navire)
+        .scalar_subquery()
+    )
+    return (
+        select(
+            models.Marchandise.id, models.Marchandise.nom, models.Marchandise.type,
+            models.Marchandise.poids, models.Marchandise.volume,
+            models.Marchandise.tracking_number,
+            models.Navire.id.label("navire_id"), models.Navire.nom.label("navire_nom"),
+            models.Navire.imo.label("navire_imo"), models.Navire.statut_actuel,
+            models.Navire.dernier_port, models.Navire.prochaine_destination,
+            models.Declaration.type.label("declaration_type"),
+            models.Declaration.port.label("declaration_port"),
+            models.Declaration.date.label("declaration_date"),
+            models.Declaration.destination.label("declaration_destination"),
+        )
+        .join(models.Navire, models.Navire.id == models.Marchandise.navire_id)
+        .outerjoin(models.Declaration, models.Declaration.id == derniere_declaration)
+        .where(models.Marchandise.tracking_number == tracking_number)
+    )
+
+
+def _as_dict(row) -> dict:
+    declaration = None
+    if row.declaration_type is not None:
+        declaration = {
+            "type": row.declaration_type,
+            "port": row.declaration_port,
+            "date": row.declaration_date.isoformat(),
+            "destination": row.declaration_destination,
+        }
+    return {
+        "tracking_number": row.tracking_number,
+        "marchandise": {
+            "id": row.id, "nom": row.nom, "type": row.type,
+            "poids": row.poids, "volume": row.volume,
+        },
+        "navire": {
+            "id": row.navire_id, "nom": row.navire_nom, "imo": row.navire_imo,
+            "statut": row.statut_actuel, "dernier_port": row.dernier_port,
+            "prochaine_destination": row.prochaine_destination,
+        },
+        "derniere_declaration": declaration,
+    }
+
+
+async def track(db: AsyncSession, tracking_number: str) -> dict | None:
+    """Réponse de suivi (dict sérialisable en JSON), None si le numéro est inconnu."""
+    cached, generation = tracking_cache.get(tracking_number)
+    if cached is not _MISSING:
+        return cached
+    row = (await db.execute(tracking_query(tracking_number))).first()
+    result = _as_dict(row) if row is not None else None
+    tracking_cache.put(tracking_number, result, generation)
+    return result
+
+
+tracking_cache = TrackingCache(TRACKING_CACHE_SIZE, TRACKING_CACHE_TTL)
@@ -0,0 +1,105 @@
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from app import models
+from app.database import SessionLocal
+from app.fiches import INSPECTION_TITLE, inspection_fiche_data
+from app.pdf_cache import pdf_cache
+from app.pdf_engine import pdf_engine, PdfEngineBusy, PDF_WORKERS
+
+EXPORT_BATCH_SIZE = 100                     # inspections lues par requête SQL
+EXPORT_IN_FLIGHT = max(PDF_WORKERS, 1) * 2  # rendus en parallèle par export
+EXPORT_BUSY_WAIT = 0.5                      # pause (s) quand le pool de rendu est plein
+
+
+class _ZipChunks:
+    """
+    Flux en écriture seule pour zipfile : les octets produits sont
+    récupérés après chaque entrée puis envoyés au client.
+    (Sans tell(), zipfile passe en mode non seekable avec descripteurs de données.)
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _iter_inspections(d1=None, d2=None, port=None):
+    """
+    Parcourt les inspections par lots (pagination par id) avec une session dédiée :
+    le flux survit à la fin de la requête HTTP.
+    """
+    db = SessionLocal()
+    try:
+        last_id = 0
+        while True:
+            query = db.query(models.Inspection).filter(models.Inspection.id > last_id)
+            if d1:
+                query = query.filter(models.Inspection.date >= d1)
+            if d2:
+                query = query.filter(models.Inspection.date <= d2)
+            if port:
+                query = query.filter(models.Inspection.port_nom == port)
+            batch = query.order_by(models.Inspection.id).limit(EXPORT_BATCH_SIZE).all()
+            if not batch:
+                return
+            for inspection in batch:
+                yield inspection.id, inspection.date, inspection_fiche_data(inspection)
+            last_id = batch[-1].id
+            db.expunge_all()
+    finally:
+        db.close()
+
+
+def _render(data: list) -> bytes:
+    # Un export attend son tour plutôt que d'échouer en plein flux
+    while True:
+        try:
+            return pdf_cache.get_or_render(INSPECTION_TITLE, data, pdf_engine.render)
+        except PdfEngineBusy:
+            time.sleep(EXPORT_BUSY_WAIT)
+
+
+def stream_inspections_zip(d1=None, d2=None, port=None):
+    """
+    Générateur d'une archive ZIP des fiches inspection filtrées.
+    Les fiches sont rendues en parallèle ; chaque entrée est émise dès
+    qu'elle est prête. Mémoire bornée par EXPORT_BATCH_SIZE + EXPORT_IN_FLIGHT.
+    """
+    out = _ZipChunks()
+    with ThreadPoolExecutor(max_workers=EXPORT_IN_FLIGHT) as pool:
+        with zipfile.ZipFile(out, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            pending = {}
+
+            def write_done(done):
+                for future in done:
+                    name = pending.pop(future)
+                    archive.writestr(name, future.result())
+
+            for inspection_id, inspection_date, data in _iter_inspections(d1, d2, port):
+                if len(pending) >= EXPORT_IN_FLIGHT:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    write_done(done)
+                    yield out.drain()
+                name = f"inspection_{inspection_id}_{inspection_date}.pdf"
+                pending[pool.submit(_render, data)] = name
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                write_done(done)
+                yield out.drain()
+
+        # Répertoire central de l'archive
+        yield out.drain()
@@ -0,0 +1,164 @@
+"""
+Benchmark base de données : la même charge mixte (pages de liste et
+statistiques en lecture, ajouts d'inspections avec agrégats en écriture)
+exécutée par plusieurs threads contre chaque profil :
+  - SQLite d'origine (journal rollback, aucun busy_timeout) ;
+  - SQLite réglé (create_db_engine : WAL, synchronous=NORMAL, mmap...) ;
+  - PostgreSQL si BENCH_POSTGRES_URL est défini (base jetable : le schéma
+    y est migré et des lignes de test y sont ajoutées).
+
+    python -m benchmarks.bench_database [threads] [secondes]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import models, rollups
+from app.database import create_db_engine, run_migrations
+
+WRITE_RATIO = 0.2
+PORTS = ["Owendo", "Libreville", "Port-Gentil"]
+INSPECTEURS = [f"Inspecteur {i}" for i in range(10)]
+NAVIRES = 200
+INSPECTIONS = 5000
+START = date(2025, 1, 1)
+
+
+def baseline_engine(url: str):
+    """Moteur tel qu'avant le réglage : seules les clés étrangères sont activées."""
+    db_engine = create_engine(url, connect_args={"check_same_thread": False})
+
+    @event.listens_for(db_engine, "connect")
+    def _foreign_keys(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    return db_engine
+
+
+def random_inspection(rnd: random.Random) -> models.Inspection:
+    return models.Inspection(
+        date=START + timedelta(days=rnd.randrange(365)),
+        navire_imo=f"9{rnd.randrange(NAVIRES):06d}",
+        port_nom=rnd.choice(PORTS),
+        inspecteur=rnd.choice(INSPECTEURS),
+    )
+
+
+def seed(Session):
+    rnd = random.Random(0)
+    db = Session()
+    try:
+        db.add_all(
+            models.Navire(nom=f"Navire {i}", imo=f"9{i:06d}",
+                          statut_actuel=rnd.choice(["à quai", "en mer"]))
+            for i in range(NAVIRES)
+        )
+        db.add_all(random_inspection(rnd) for _ in range(INSPECTIONS))
+        db.commit()
+        rollups.backfill(db)
+    finally:
+        db.close()
+
+
+def read(db, rnd: random.Random):
+    # Page d'inspections (curseur) + chiffres de /stats
+    before = START + timedelta(days=rnd.randrange(365))
+    db.query(models.Inspection).filter(models.Inspection.date < before)\
+        .order_by(models.Inspection.date.desc(), models.Inspection.id.desc()).limit(51).all()
+    rollups.inspections_count(db, START, before)
+    rollups.navires_counts(db)
+
+
+def write(db, rnd: random.Random):
+    inspection = random_inspection(rnd)
+    db.add(inspection)
+    rollups.count_inspection(db, rollups.inspection_key(inspection), +1)
+    db.commit()
+
+
+def worker(Session, stop_at: float, seed_value: int, results: dict, lock: threading.Lock):
+    rnd = random.Random(seed_value)
+    latencies = {"read": [], "write": []}
+    errors = 0
+    while time.perf_counter() < stop_at:
+        kind = "write" if rnd.random() < WRITE_RATIO else "read"
+        db = Session()
+        start = time.perf_counter()
+        try:
+            (write if kind == "write" else read)(db, rnd)
+            latencies[kind].append(time.perf_counter() - start)
+        except OperationalError:   # « database is locked », timeout...
+            db.rollback()
+            errors += 1
+        finally:
+            db.close()
+    with lock:
+        for kind, values in latencies.items():
+            results[kind].extend(values)
+        results["errors"] += errors
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)] * 1000
+
+
+def bench(label: str, db_engine, threads: int, seconds: float):
+    Session = sessionmaker(bind=db_engine, autoflush=False)
+    seed(Session)
+    results = {"read": [], "write": [], "errors": 0}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+    pool = [
+        threading.Thread(target=worker, args=(Session, stop_at, i, results, lock))
+        for i in range(threads)
+    ]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    db_engine.dispose()
+
+    ops = len(results["read"]) + len(results["write"])
+    print(
+        f"{label:<22} {ops / seconds:8.0f} op/s"
+        f" | lecture p50 {percentile(results['read'], 0.5):6.1f} ms"
+        f" p95 {percentile(results['read'], 0.95):6.1f} ms"
+        f" | écriture p50 {percentile(results['write'], 0.5):6.1f} ms"
+        f" p95 {percentile(results['write'], 0.95):6.1f} ms"
+        f" | erreurs {results['errors']}"
+    )
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"{threads} threads, {seconds:g} s, {WRITE_RATIO:.0%} d'écritures")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, name, make_engine in [("SQLite d'origine", "origine", baseline_engine),
+                                         ("SQLite WAL réglé", "wal", create_db_engine)]:
+            url = f"sqlite:///{os.path.join(tmp, name + '.db')}"
+            run_migrations(url)
+            bench(label, make_engine(url), threads, seconds)
+
+    postgres_url = os.getenv("BENCH_POSTGRES_URL")
+    if postgres_url:
+        run_migrations(postgres_url)
+        bench("PostgreSQL", create_db_engine(postgres_url), threads, seconds)
+    else:
+        print("PostgreSQL : définir BENCH_POSTGRES_URL pour l'inclure")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark index des positions des ports : temps d'une requête « k plus
+proches » et d'une matrice de distances sur N ports répartis sur le globe.
+
+    python -m benchmarks.bench_geo [nombre_de_ports]
+"""
+import sys
+import time
+
+import numpy as np
+
+from app.geo import PortIndex, haversine_km
+
+QUERIES = 2000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rnd = np.random.default_rng(0)
+    lats = np.degrees(np.arcsin(rnd.uniform(-1, 1, n)))   # uniforme sur la sphère
+    lons = rnd.uniform(-180, 180, n)
+
+    index = PortIndex()
+    start = time.perf_counter()
+    for i in range(n):
+        index.set_port(i + 1, f"Port {i + 1}", lats[i], lons[i])
+    print(f"{n} ports indexés en {(time.perf_counter() - start) * 1000:.1f} ms (ajouts un par un)")
+
+    points = list(zip(np.degrees(np.arcsin(rnd.uniform(-1, 1, QUERIES))), rnd.uniform(-180, 180, QUERIES)))
+    for k in (1, 5, 20):
+        start = time.perf_counter()
+        for lat, lon in points:
+            result = index.nearest(lat, lon, k)
+        per_query = (time.perf_counter() - start) / QUERIES * 1e6
+        print(f"k={k:<3} {per_query:8.1f} µs / requête")
+
+    # Contrôle : même résultat qu'un tri complet
+    lat, lon = points[0]
+    expected = np.argsort(haversine_km(lat, lon, lats, lons))[:20] + 1
+    assert [pid for pid, _, _ in index.nearest(lat, lon, 20)] == expected.tolist()
+
+    ids = list(range(1, min(n, 500) + 1))
+    start = time.perf_counter()
+    ports, distances, _ = index.distance_matrix(ids)
+    print(f"matrice {len(ports)} × {len(ports)} : {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    for i in range(1, n + 1, 2):
+        index.remove_port(i)
+    print(f"{n // 2} suppressions en {(time.perf_counter() - start) * 1000:.1f} ms, {len(index)} ports restants")
+
+
+if __name__ == "__main__":
+    main()
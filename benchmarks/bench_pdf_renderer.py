@@ -0,0 +1,35 @@
+"""
+Micro-benchmark : coût par document d'un PdfRenderer recréé à chaque
+rendu (styles + logo reconstruits) contre le renderer partagé.
+
+    python -m benchmarks.bench_pdf_renderer [nombre_de_documents]
+"""
+import sys
+import time
+from io import BytesIO
+
+from app.pdf_utils import PdfRenderer, get_renderer
+
+DATA = [["Champ", "Valeur"]] + [[f"Champ {i}", f"Valeur {i}"] for i in range(20)]
+
+
+def bench(label: str, make_renderer, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        make_renderer().build(BytesIO(), "MarineGab — Benchmark", DATA)
+    per_doc = (time.perf_counter() - start) / n * 1000
+    print(f"{label:<32} {per_doc:8.2f} ms / document")
+    return per_doc
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    get_renderer()   # préchauffage (imports, polices)
+
+    fresh = bench("Renderer recréé à chaque rendu", PdfRenderer, n)
+    shared = bench("Renderer partagé", get_renderer, n)
+    print(f"Gain : {fresh - shared:.2f} ms / document ({fresh / shared:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark recherche plein texte : temps de réponse de search_inspections
+sur une base SQLite migrée (FTS5 + triggers) remplie de N inspections.
+
+    python -m benchmarks.bench_search [nombre_d_inspections]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import create_db_engine, run_migrations
+from app.search import search_inspections
+
+VOCABULAIRE = (
+    "coque pont machine moteur pompe cale ballast soute radeau canot gilet alarme "
+    "détecteur incendie extincteur certificat journal équipage cabine cuisine "
+    "corrosion rouille fissure vanne tuyau câble batterie générateur hélice "
+    "propre conforme usé endommagé manquant périmé contrôlé remplacé réparé"
+).split()
+QUERIES = ["extincteur périmé", "fuite", "fuite huile", "corrosion coque", "gilet manquant", "hél"]
+BATCH = 20000
+
+
+def random_text(rnd: random.Random, words: int) -> str:
+    text = " ".join(rnd.choice(VOCABULAIRE) for _ in range(words))
+    # Termes rares : quelques rapports seulement
+    if rnd.random() < 0.001:
+        text += " fuite d'huile en salle machine"
+    return text
+
+
+def populate(Session, n: int):
+    rnd = random.Random(0)
+    start = date(2020, 1, 1)
+    db = Session()
+    try:
+        for offset in range(0, n, BATCH):
+            db.execute(insert(models.Inspection), [
+                {
+                    "date": start + timedelta(days=rnd.randrange(2000)),
+                    "navire_imo": f"9{rnd.randrange(5000):06d}",
+                    "port_nom": rnd.choice(["Owendo", "Libreville", "Port-Gentil"]),
+                    "inspecteur": f"Inspecteur {rnd.randrange(40)}",
+                    "rapport": random_text(rnd, 25),
+                    "observations": random_text(rnd, 8),
+                }
+                for _ in range(min(BATCH, n - offset))
+            ])
+            db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'search.db')}"
+        run_migrations(url)
+        engine = create_db_engine(url)
+        Session = sessionmaker(bind=engine)
+
+        start = time.perf_counter()
+        populate(Session, n)
+        print(f"{n} inspections indexées en {time.perf_counter() - start:.1f} s (triggers FTS5)")
+
+        db = Session()
+        try:
+            for q in QUERIES:
+                search_inspections(db, q)   # préchauffage du cache de pages
+                runs = 20
+                start = time.perf_counter()
+                for _ in range(runs):
+                    results = search_inspections(db, q)
+                per_query = (time.perf_counter() - start) / runs * 1000
+                print(f"{q!r:<22} {per_query:8.2f} ms  ({len(results)} résultats)")
+        finally:
+            db.close()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
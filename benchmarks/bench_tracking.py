@@ -0,0 +1,96 @@
+"""
+Benchmark suivi par numéro de tracking : requête seule (cache vidé à
+chaque appel) puis lecture en cache, sur une base SQLite migrée remplie de
+N marchandises réparties sur 1000 navires avec leurs déclarations.
+
+    python -m benchmarks.bench_tracking [nombre_de_marchandises]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import create_async_db_engine, create_db_engine, run_migrations
+from app.tracking import track, tracking_cache
+
+NAVIRES = 1000
+BATCH = 20000
+LOOKUPS = 20000
+
+
+def populate(Session, n: int):
+    rnd = random.Random(0)
+    db = Session()
+    try:
+        db.execute(insert(models.Navire), [
+            {"imo": f"9{i:06d}", "nom": f"Navire {i}", "statut_actuel": "en Mer"}
+            for i in range(NAVIRES)
+        ])
+        db.execute(insert(models.Declaration), [
+            {
+                "type": rnd.choice(["Arrivée", "Départ"]), "navire_nom": f"Navire {i % NAVIRES}",
+                "navire_imo": f"9{i % NAVIRES:06d}", "port": "Owendo",
+                "date": date(2024, 1, 1) + timedelta(days=rnd.randrange(700)), "fichier_pdf": "-",
+            }
+            for i in range(NAVIRES * 20)
+        ])
+        for offset in range(0, n, BATCH):
+            db.execute(insert(models.Marchandise), [
+                {"nom": "conteneur", "poids": 10.0, "volume": 30.0,
+                 "tracking_number": f"TRK{i:09d}", "navire_id": 1 + i % NAVIRES}
+                for i in range(offset, min(offset + BATCH, n))
+            ])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def measure(AsyncSession, numbers: list, cached: bool) -> float:
+    async with AsyncSession() as db:
+        start = time.perf_counter()
+        for number in numbers:
+            if not cached:
+                tracking_cache.clear()
+            await track(db, number)
+        return len(numbers) / (time.perf_counter() - start)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'tracking.db')}"
+        run_migrations(url)
+        engine = create_db_engine(url)
+        populate(sessionmaker(bind=engine), n)
+        engine.dispose()
+
+        async_engine = create_async_db_engine(url)
+        AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+        rnd = random.Random(1)
+        # Trafic concentré : 1 % des numéros reçoit l'essentiel des requêtes
+        hot = [f"TRK{rnd.randrange(n):09d}" for _ in range(max(n // 100, 1))]
+        numbers = [rnd.choice(hot) for _ in range(LOOKUPS)]
+
+        async def run():
+            try:
+                base = await measure(AsyncSession, numbers[:2000], cached=False)
+                print(f"requête seule      {base:10.0f} recherches/s")
+                tracking_cache.clear()
+                hits = await measure(AsyncSession, numbers, cached=True)
+                print(f"avec cache LRU     {hits:10.0f} recherches/s  {tracking_cache.stats()}")
+            finally:
+                await async_engine.dispose()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""File des déclarations : prise des travaux (claim)."""
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import declaration_jobs, models
+from app.database import run_migrations
+from app.declaration_jobs import ECHEC, EN_ATTENTE, EN_COURS, claim
+
+
+@pytest.fixture
+def db(tmp_path):
+    url = f"sqlite:///{tmp_path / 'jobs.db'}"
+    run_migrations(url)
+    engine = create_engine(url)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def add_job(db, statut, tentatives=0, demarre_le=None):
+    job = models.DeclarationJob(type="Arrivée", statut=statut, parametres="{}", tentatives=tentatives,
+                                cree_le=declaration_jobs._now(), demarre_le=demarre_le)
+    db.add(job)
+    db.commit()
+    return job.id
+
+
+def test_claim_takes_oldest_pending_job(db):
+    first = add_job(db, EN_ATTENTE)
+    add_job(db, EN_ATTENTE)
+    assert claim(db) == (first, 1)
+    assert db.get(models.DeclarationJob, first).statut == EN_COURS
+
+
+def test_claim_recovers_abandoned_job_after_exhausted_pending_job(db):
+    exhausted = add_job(db, EN_ATTENTE, tentatives=declaration_jobs.DECLARATION_JOB_ATTEMPTS)
+    lease = timedelta(seconds=declaration_jobs.DECLARATION_JOB_LEASE + 60)
+    abandoned = add_job(db, EN_COURS, tentatives=1, demarre_le=declaration_jobs._now() - lease)
+
+    assert claim(db) == (abandoned, 2)
+    assert db.get(models.DeclarationJob, exhausted).statut == ECHEC
+
+
+def test_claim_targets_requested_job(db):
+    add_job(db, EN_ATTENTE)
+    wanted = add_job(db, EN_ATTENTE)
+    assert claim(db, wanted) == (wanted, 1)
+    assert claim(db, wanted) is None
@@ -0,0 +1,45 @@
+"""Lecture des coordonnées saisies et index des positions des ports."""
+import pytest
+
+from app.geo import PortIndex, haversine_km, parse_coordinates
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("0.3924, 9.4536", (0.3924, 9.4536)),
+    ("-0.7193 8.7815", (-0.7193, 8.7815)),
+    ("0,3924 ; 9,4536", (0.3924, 9.4536)),
+    ("0°23'33\"N 9°27'13\"E", (0.3925, 9.453611)),
+    ("N 0°23.5' E 9°27'", (0.391667, 9.45)),
+    ("9.45E 0.39N", (0.39, 9.45)),
+    ("0.39S 9.45O", (-0.39, -9.45)),
+    ("0.39s 9.45w", (-0.39, -9.45)),
+])
+def test_parse_coordinates(text, expected):
+    assert parse_coordinates(text) == pytest.approx(expected, abs=1e-6)
+
+
+@pytest.mark.parametrize("text", [
+    None, "", "Libreville", "0.39", "91, 9.45", "0.39, 181",
+    "0.39N 9.45N",   # deux latitudes : pas d'inversion silencieuse
+    "9.45E 8.1W",
+    "0.39N 9.45",    # une seule lettre d'hémisphère
+])
+def test_parse_coordinates_rejects(text):
+    assert parse_coordinates(text) is None
+
+
+def test_nearest_and_removal():
+    index = PortIndex(capacity=2)
+    index.set_port(1, "Libreville", 0.3924, 9.4536)
+    index.set_port(2, "Owendo", 0.2833, 9.5)
+    index.set_port(3, "Port-Gentil", -0.7193, 8.7815)
+
+    nearest = index.nearest(0.39, 9.45, k=2)
+    assert [port_id for port_id, _, _ in nearest] == [1, 2]
+    assert nearest[0][2] == pytest.approx(haversine_km(0.39, 9.45, 0.3924, 9.4536))
+    assert [port_id for port_id, _, _ in index.nearest(0.39, 9.45, k=5, exclude=1)] == [2, 3]
+
+    index.remove_port(1)
+    assert len(index) == 2
+    assert index.position(1) is None
+    assert index.position(3) == pytest.approx((-0.7193, 8.7815))
@@ -0,0 +1,22 @@
+"""Plans des requêtes chaudes sur une base migrée (voir app/query_plans.py)."""
+from app.database import run_migrations
+from app.query_plans import FULL_SCAN_EXPECTED, check, full_scans, hot_queries
+
+
+def test_hot_queries_use_an_index(tmp_path):
+    url = f"sqlite:///{tmp_path / 'plans.db'}"
+    run_migrations(url)
+    assert check(url) == []
+
+
+def test_full_scan_allow_list_matches_hot_queries():
+    assert FULL_SCAN_EXPECTED <= hot_queries().keys()
+
+
+def test_full_scans_rejects_index_scans():
+    assert full_scans(["SEARCH t USING INDEX ix_t_a (a=?)"]) == []
+    assert full_scans(["SCAN t"]) == ["SCAN t"]
+    assert full_scans(["SCAN t USING INDEX ix_t_a"]) == ["SCAN t USING INDEX ix_t_a"]
+    assert full_scans(["SCAN t USING COVERING INDEX ix_t_a"]) == ["SCAN t USING COVERING INDEX ix_t_a"]
+    assert full_scans(["SCAN t USING COVERING INDEX ix_t_a"], covering_scan_allowed=True) == []
+    assert full_scans(["SCAN t USING INDEX ix_t_a"], covering_scan_allowed=True) == ["SCAN t USING INDEX ix_t_a"]
@@ -0,0 +1,116 @@
+"""Backend S3 du stockage des documents, contre un S3 simulé par moto."""
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+from app import models, storage
+from app.database import run_migrations
+
+BUCKET = "marinegab-test"
+PREFIX = "declarations/"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        backend = storage.S3Storage(BUCKET, PREFIX)
+        backend.client.create_bucket(Bucket=BUCKET)
+        monkeypatch.setattr(storage, "document_storage", backend)
+        yield backend
+
+
+@pytest.fixture
+def db(tmp_path):
+    url = f"sqlite:///{tmp_path / 'storage.db'}"
+    run_migrations(url)
+    engine = create_engine(url)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def object_keys(backend):
+    response = backend.client.list_objects_v2(Bucket=BUCKET)
+    return [obj["Key"] for obj in response.get("Contents", [])]
+
+
+def test_put_get_delete(s3):
+    key = s3.put(b"%PDF-1.4 arrivee")
+    assert key == storage.content_key(b"%PDF-1.4 arrivee")
+    assert object_keys(s3) == [f"{PREFIX}{key}"]
+    assert s3.get(key) == b"%PDF-1.4 arrivee"
+    head = s3.client.head_object(Bucket=BUCKET, Key=f"{PREFIX}{key}")
+    assert head["ContentType"] == "application/pdf"
+
+    s3.delete(key)
+    assert s3.get(key) is None
+    assert object_keys(s3) == []
+    s3.delete(key)   # déjà supprimé : sans erreur
+
+
+def test_put_deduplicates_by_content(s3):
+    first = s3.put(b"%PDF-1.4 depart")
+    (_, stored), = s3.list()
+    time.sleep(1.1)   # LastModified est à la seconde
+    second = s3.put(b"%PDF-1.4 depart")
+    assert first == second
+    assert object_keys(s3) == [f"{PREFIX}{first}"]
+    assert s3.get(first) == b"%PDF-1.4 depart"
+    # Doublon : date rafraîchie, le document échappe au GC
+    (_, refreshed), = s3.list()
+    assert refreshed > stored
+
+
+def test_list_ignores_foreign_objects(s3):
+    key = s3.put(b"%PDF-1.4 liste")
+    s3.client.put_object(Bucket=BUCKET, Key=f"{PREFIX}notes.txt", Body=b"x")
+    s3.client.put_object(Bucket=BUCKET, Key=f"autre/{key}", Body=b"x")
+
+    listed = list(s3.list())
+    assert [k for k, _ in listed] == [key]
+    modified = listed[0][1]
+    assert modified.tzinfo is not None
+    assert abs(datetime.now(timezone.utc) - modified) < timedelta(minutes=5)
+
+
+def test_collect_garbage(s3, db):
+    kept = s3.put(b"%PDF-1.4 referencee")
+    orphan = s3.put(b"%PDF-1.4 orpheline")
+    db.add(models.Declaration(type="Arrivée", navire_nom="Test", navire_imo="1234567",
+                              port="Owendo", date=date.today(), fichier_pdf=kept))
+    db.commit()
+
+    # Documents récents : épargnés pendant le délai de grâce
+    assert storage.collect_garbage(db, retention_days=0, grace_hours=24)["documents_supprimes"] == 0
+    assert storage.collect_garbage(db, retention_days=0, grace_hours=0, dry_run=True)["documents_supprimes"] == 1
+    assert s3.get(orphan) is not None
+
+    result = storage.collect_garbage(db, retention_days=0, grace_hours=0)
+    assert result == {"declarations_expirees": 0, "documents_supprimes": 1}
+    assert s3.get(orphan) is None
+    assert s3.get(kept) == b"%PDF-1.4 referencee"
+
+
+def test_collect_garbage_retention(s3, db):
+    recent = s3.put(b"%PDF-1.4 recente")
+    old = s3.put(b"%PDF-1.4 ancienne")
+    for jour, key in ((date.today(), recent), (date.today() - timedelta(days=400), old)):
+        db.add(models.Declaration(type="Départ", navire_nom="Test", navire_imo="1234567",
+                                  port="Owendo", date=jour, fichier_pdf=key))
+    db.commit()
+
+    result = storage.collect_garbage(db, retention_days=365, grace_hours=0)
+    assert result == {"declarations_expirees": 1, "documents_supprimes": 1}
+    assert db.query(models.Declaration).count() == 1
+    assert s3.get(old) is None
+    assert s3.get(recent) == b"%PDF-1.4 recente"